@@ -0,0 +1,77 @@
+import argparse
+from collections import Counter
+import tracemalloc
+
+from bench.generate import add_shape_arguments, generate_guide, shape_from_args
+from src.parse_document import (
+    ChecklistParagraphChild,
+    ImageParagraphChild,
+    LinkParagraphChild,
+    NumberedList,
+    Paragraph,
+    SectionHeading,
+    Spoiler,
+    TextParagraphChild,
+    UnnumberedList,
+    WalkthroughDocument,
+    parse_document,
+)
+
+
+def count_nodes(doc: WalkthroughDocument) -> Counter[str]:
+    counts: Counter[str] = Counter()
+    for section in doc.checklist_sections:
+        for item in section.items:
+            counts[type(item).__name__] += 1
+            for child in getattr(item, "items", []):
+                if not isinstance(child, str):
+                    counts[type(child).__name__] += 1
+    return counts
+
+
+def bytes_per_instance(make, n: int = 20_000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [make() for _ in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del nodes
+    return (after - before) / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collectibles", type=int, default=40_000)
+    add_shape_arguments(parser)
+    args = parser.parse_args()
+
+    text = generate_guide(shape_from_args(args.collectibles, args))
+    tracemalloc.start()
+    doc = parse_document(text)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    counts = count_nodes(doc)
+    nodes = sum(counts.values())
+    print(f"Parsed {nodes} nodes, {retained} bytes retained")
+    print(f"{retained / nodes:.1f} bytes per node (including strings and lists)")
+
+    content = "Item content"
+    makers = {
+        "TextParagraphChild": lambda: TextParagraphChild(content),
+        "ChecklistParagraphChild": lambda: ChecklistParagraphChild(
+            content, content, "map", content
+        ),
+        "LinkParagraphChild": lambda: LinkParagraphChild(content),
+        "ImageParagraphChild": lambda: ImageParagraphChild(content),
+        "Paragraph": Paragraph,
+        "SectionHeading": lambda: SectionHeading(content, None),
+        "Spoiler": Spoiler,
+        "UnnumberedList": UnnumberedList,
+        "NumberedList": NumberedList,
+    }
+    for name, make in makers.items():
+        print(f"{name:>24}: {bytes_per_instance(make):6.1f} bytes per instance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+from dataclasses import dataclass
+import hashlib
+from pathlib import Path
+
+TYPE_NAMES = [
+    ("map", "Map", "Maps"),
+    ("lunchbox", "Lunch Box", "Lunch Boxes"),
+    ("manpage", "Manuscript Page", "Manuscript Pages"),
+    ("key", "Key", "Keys"),
+    ("charm", "Charm", "Charms"),
+    ("stash", "Cult Stash", "Cult Stashes"),
+]
+
+
+# The shape of a synthetic walkthrough. Spoilers and lists are per section,
+# links are per paragraph, and every spoiler shows one image.
+@dataclass
+class GuideShape:
+    sections: int = 100
+    paragraphs: int = 25
+    items_per_paragraph: int = 4
+    types: int = 4
+    spoilers: int = 1
+    lists: int = 1
+    links: int = 1
+
+    @property
+    def collectibles(self) -> int:
+        return self.sections * self.paragraphs * self.items_per_paragraph
+
+
+def shape_for(collectibles: int, **fields) -> GuideShape:
+    # Grows the number of sections, keeping the sections themselves the same
+    shape = GuideShape(**fields)
+    per_section = shape.paragraphs * shape.items_per_paragraph
+    shape.sections = max(1, -(-collectibles // per_section))
+    return shape
+
+
+def type_tags(shape: GuideShape) -> list[tuple[str, str, str]]:
+    tags = []
+    for i in range(shape.types):
+        tag, name, plural = TYPE_NAMES[i % len(TYPE_NAMES)]
+        if i >= len(TYPE_NAMES):
+            tag, name, plural = f"{tag}{i}", f"{name} {i}", f"{plural} {i}"
+        tags.append((tag, name, plural))
+    return tags
+
+
+def image_name(section: int, spoiler: int) -> str:
+    return f"images/section_{section}_{spoiler}.png"
+
+
+def generate_guide(shape: GuideShape) -> str:
+    tags = type_tags(shape)
+    lines = [r"\game_short_name{bench}", r"\version{1}"]
+    lines += [f"\\declare{{{tag}}}{{{name}}}{{{plural}}}" for tag, name, plural in tags]
+    lines.append(r"\title{Synthetic benchmark guide}")
+    item = 0
+    for s in range(shape.sections):
+        if s % 2:
+            lines.append(f"\\section{{Chapter {s}: The Long Way Round}}{{Chapter {s}}}")
+        else:
+            lines.append(f"\\section{{Chapter {s}}}")
+        for p in range(shape.paragraphs):
+            parts = [f"Head through room {p} of chapter {s}."]
+            for _ in range(shape.items_per_paragraph):
+                tag = tags[item % len(tags)][0]
+                if item % 3:
+                    parts.append(f"Pick up the [{tag}|Item {item}].")
+                else:
+                    parts.append(
+                        f"Behind the crate is [{tag}|Item {item}|Crate {item}]."
+                    )
+                item += 1
+            for link in range(shape.links):
+                parts.append(f"See \\link{{https://example.com/{s}/{p}/{link}}}.")
+            lines.append(" ".join(parts))
+        for i in range(shape.lists):
+            kind = "ol" if i % 2 else "ul"
+            lines += [f"\\begin{{{kind}}}", r"\item First step", r"\item Second step"]
+            lines.append(f"\\end{{{kind}}}")
+        for i in range(shape.spoilers):
+            lines += [r"\begin{spoiler}", "Turn the dials to 3, 1 and 4."]
+            lines += [f"\\img{{{image_name(s, i)}}}", r"\end{spoiler}"]
+        lines.append(r"\checklist")
+    return "\n".join(lines) + "\n"
+
+
+def write_guide(folder: Path, shape: GuideShape, image_size: int = 4096) -> Path:
+    # Writes the guide and the images its spoilers show. Images are filled
+    # with hash output so they don't compress to nothing.
+    infile = folder / "guide.txt"
+    infile.write_text(generate_guide(shape), encoding="utf-8")
+    (folder / "images").mkdir(exist_ok=True)
+    for s in range(shape.sections):
+        for i in range(shape.spoilers):
+            seed = image_name(s, i).encode("utf-8")
+            blocks = -(-image_size // 64)
+            data = b"".join(
+                hashlib.sha512(seed + n.to_bytes(4, "big")).digest()
+                for n in range(blocks)
+            )
+            (folder / image_name(s, i)).write_bytes(data[:image_size])
+    return infile
+
+
+def add_shape_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = GuideShape()
+    parser.add_argument("--paragraphs", type=int, default=defaults.paragraphs)
+    parser.add_argument("--items", type=int, default=defaults.items_per_paragraph)
+    parser.add_argument("--types", type=int, default=defaults.types)
+    parser.add_argument("--spoilers", type=int, default=defaults.spoilers)
+    parser.add_argument("--lists", type=int, default=defaults.lists)
+    parser.add_argument("--links", type=int, default=defaults.links)
+
+
+def shape_from_args(collectibles: int, args: argparse.Namespace) -> GuideShape:
+    return shape_for(
+        collectibles,
+        paragraphs=args.paragraphs,
+        items_per_paragraph=args.items,
+        types=args.types,
+        spoilers=args.spoilers,
+        lists=args.lists,
+        links=args.links,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("outfolder")
+    parser.add_argument("--collectibles", type=int, default=10_000)
+    add_shape_arguments(parser)
+    args = parser.parse_args()
+
+    outfolder = Path(args.outfolder)
+    outfolder.mkdir(parents=True, exist_ok=True)
+    shape = shape_from_args(args.collectibles, args)
+    infile = write_guide(outfolder, shape)
+    print(
+        f"Wrote {infile}: {shape.sections} sections, {shape.collectibles} collectibles"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import time
+
+from bench.generate import add_shape_arguments, generate_guide, shape_from_args
+from src.parse_document import parse_document
+from src.render_html import render_html_from_doc
+
+
+def time_render(doc, max_workers: int, repeat: int) -> tuple[float, str]:
+    best = float("inf")
+    html = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        html = render_html_from_doc(doc, max_workers)
+        best = min(best, time.perf_counter() - start)
+    return best, html
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--collectibles", type=int, default=160_000)
+    add_shape_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        nargs="+",
+        help="Worker counts to try (default: powers of two up to the core count)",
+    )
+    args = parser.parse_args()
+
+    jobs = args.jobs
+    if jobs is None:
+        cores = os.cpu_count() or 1
+        jobs = [1]
+        while jobs[-1] * 2 <= cores:
+            jobs.append(jobs[-1] * 2)
+        if jobs[-1] != cores:
+            jobs.append(cores)
+
+    doc = parse_document(generate_guide(shape_from_args(args.collectibles, args)))
+    print(f"{len(doc.checklist_sections)} checklist sections, {os.cpu_count()} cores")
+    if (os.cpu_count() or 1) < 2:
+        print("Only one core: the workers share it, so this can't show a speedup.")
+    serial, expected = time_render(doc, 1, args.repeat)
+    print(f"{'jobs':>6} {'seconds':>10} {'speedup':>8}")
+    for max_workers in jobs:
+        elapsed, html = time_render(doc, max_workers, args.repeat)
+        assert html == expected, f"output with {max_workers} workers differs"
+        print(f"{max_workers:>6} {elapsed:>10.3f} {serial / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
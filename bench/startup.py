@@ -0,0 +1,192 @@
+import argparse
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import signal
+import subprocess
+import sys
+import tempfile
+
+from bench.generate import shape_for, write_guide
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Milliseconds of imports each command may spend, on top of what the
+# interpreter imports by itself. About one and a half times what they take on
+# a developer machine; BeautifulSoup alone would take compile over.
+BUDGETS_MS = {
+    "init": 40,
+    "check": 75,
+    "compile": 80,
+    "build": 95,
+    "watch": 130,
+    "serve": 160,
+}
+
+# Modules that must not be imported by a command that doesn't use them
+HEAVY_MODULES = [
+    "bs4",
+    "watchfiles",
+    "PIL",
+    "zipfile",
+    "http.server",
+    "multiprocessing",
+]
+ALLOWED_HEAVY_MODULES = {
+    "init": set(),
+    "check": set(),
+    "compile": set(),
+    "build": {"zipfile"},
+    # watchfiles imports multiprocessing itself
+    "watch": {"watchfiles", "multiprocessing"},
+    "serve": {"watchfiles", "multiprocessing", "http.server"},
+}
+
+
+@dataclass
+class ImportTime:
+    name: str
+    cumulative_us: int
+    top_level: bool
+
+
+def parse_importtime(stderr: str) -> list[ImportTime]:
+    # Lines look like "import time:  self | cumulative | name", where the
+    # name is indented by two spaces for every level of nesting
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        name = name.removeprefix(" ")
+        imports.append(ImportTime(name.strip(), int(cumulative), name[0] != " "))
+    return imports
+
+
+def command_imports(imports: list[ImportTime], startup: set[str]) -> list[ImportTime]:
+    return [i for i in imports if i.name not in startup]
+
+
+def import_ms(imports: list[ImportTime]) -> float:
+    return sum(i.cumulative_us for i in imports if i.top_level) / 1000
+
+
+def interpreter_startup_modules() -> set[str]:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    return {i.name for i in parse_importtime(stderr)}
+
+
+def command_args(command: str, folder: Path, infile: Path) -> list[str]:
+    match command:
+        case "init":
+            return ["init", "game", str(folder / "init")]
+        case "check":
+            return ["check", str(infile)]
+        case "compile" | "build":
+            return [command, str(infile), "--no-cache"]
+        case "watch":
+            return ["watch", str(infile), "--no-cache"]
+        case "serve":
+            return ["serve", str(infile), "--no-cache", "--port", "0"]
+    raise ValueError(command)
+
+
+def run_command(command: str, folder: Path, infile: Path) -> str:
+    # Returns the -X importtime output of one run. watch and serve are
+    # stopped with Ctrl+C once they are up.
+    argv = [sys.executable, "-X", "importtime", str(ROOT / "walkthrough.py")]
+    argv += command_args(command, folder, infile)
+    env = {**os.environ, "WALKTHROUGH_CACHE_DIR": str(folder / "cache")}
+    (folder / "init").mkdir(exist_ok=True)
+    (folder / "init" / "game.txt").unlink(missing_ok=True)
+    if command not in ("watch", "serve"):
+        return subprocess.run(
+            argv, capture_output=True, text=True, env=env, check=True
+        ).stderr
+    process = subprocess.Popen(
+        argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env
+    )
+    assert process.stdout is not None
+    for line in process.stdout:
+        if "Press Ctrl+C to stop." in line:
+            break
+    process.send_signal(signal.SIGINT)
+    _, stderr = process.communicate(timeout=30)
+    return stderr
+
+
+def heavy_modules(command: str, imports: list[ImportTime]) -> list[str]:
+    names = {i.name for i in imports}
+    return [
+        module
+        for module in HEAVY_MODULES
+        if module in names and module not in ALLOWED_HEAVY_MODULES[command]
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "commands", nargs="*", metavar="command", help="Commands to time (default: all)"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply the budgets by this, for slow machines",
+    )
+    args = parser.parse_args()
+    for command in args.commands:
+        if command not in BUDGETS_MS:
+            parser.error(
+                f"unknown command {command}, pick from {', '.join(BUDGETS_MS)}"
+            )
+
+    startup = interpreter_startup_modules()
+    failed = False
+    print(f"{'command':<8} {'imports ms':>10} {'budget ms':>9}")
+    with tempfile.TemporaryDirectory() as name:
+        folder = Path(name)
+        infile = write_guide(folder, shape_for(100))
+        for command in args.commands or list(BUDGETS_MS):
+            runs = [
+                command_imports(
+                    parse_importtime(run_command(command, folder, infile)), startup
+                )
+                for _ in range(args.repeat)
+            ]
+            best = min(runs, key=import_ms)
+            budget = BUDGETS_MS[command] * args.scale
+            problems = []
+            if import_ms(best) > budget:
+                problems.append("over budget")
+            heavy = heavy_modules(command, best)
+            if heavy:
+                problems.append(f"imports {', '.join(heavy)}")
+            failed = failed or bool(problems)
+            print(
+                f"{command:<8} {import_ms(best):>10.1f} {budget:>9.0f}  "
+                + "; ".join(problems)
+            )
+            slowest = sorted(
+                (i for i in best if i.top_level),
+                key=lambda i: i.cumulative_us,
+                reverse=True,
+            )[:3]
+            print(
+                "         slowest: "
+                + ", ".join(f"{i.name} {i.cumulative_us / 1000:.1f}" for i in slowest)
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
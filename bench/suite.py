@@ -0,0 +1,190 @@
+import argparse
+import json
+from pathlib import Path
+import platform
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from bench.generate import add_shape_arguments, shape_from_args, write_guide
+from src.compose_html import make_html_from_doc
+from src.package import write_package
+from src.parse_document import parse_document
+from src.render_html import render_html_from_doc
+
+# parse is parse_document, render the string renderer, compose the bs4
+# renderer (make_html_from_doc), and package the zip that build writes.
+STAGES = ["parse", "render", "compose", "package"]
+DEFAULT_SIZES = [1_000, 10_000]
+DEFAULT_THRESHOLD = 0.2
+# Time differences below this are noise, whatever the percentage
+MIN_SECONDS_DIFFERENCE = 0.005
+
+
+def best_time(run: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(run: Callable[[], Any]) -> int:
+    # Measured in a separate run, since tracing slows everything down. If the
+    # caller is already tracing, its trace is left running.
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        run()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+
+def measure_guide(
+    infile: Path, stages: list[str], repeat: int
+) -> dict[str, dict[str, float]]:
+    text = infile.read_text(encoding="utf-8")
+    doc = parse_document(text)
+    html = render_html_from_doc(doc)
+    zip_path = infile.with_suffix(".zip")
+    runs = {
+        "parse": lambda: parse_document(text),
+        "render": lambda: render_html_from_doc(doc),
+        "compose": lambda: make_html_from_doc(doc),
+        "package": lambda: write_package(
+            zip_path, "guide.html", html, infile.parent, doc.images
+        ),
+    }
+    results = {}
+    for stage in stages:
+        run = runs[stage]
+        results[stage] = {
+            "seconds": best_time(run, repeat),
+            "peak_bytes": peak_memory(run),
+        }
+    return results
+
+
+def run_suite(
+    sizes: list[int], stages: list[str], repeat: int, args: argparse.Namespace
+) -> dict[str, dict[str, dict[str, float]]]:
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            infile = write_guide(Path(folder), shape_from_args(size, args))
+            results[str(size)] = measure_guide(infile, stages, repeat)
+    return results
+
+
+def find_regressions(
+    baseline: dict[str, dict[str, dict[str, float]]],
+    current: dict[str, dict[str, dict[str, float]]],
+    threshold: float,
+) -> list[str]:
+    regressions = []
+    for size, stages in current.items():
+        for stage, result in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if base is None:
+                continue
+            seconds, base_seconds = result["seconds"], base["seconds"]
+            if (
+                seconds > base_seconds * (1 + threshold)
+                and seconds - base_seconds > MIN_SECONDS_DIFFERENCE
+            ):
+                regressions.append(
+                    f"{stage} at {size} collectibles took {seconds:.3f}s, "
+                    f"{seconds / base_seconds - 1:+.0%} over {base_seconds:.3f}s"
+                )
+            peak, base_peak = result["peak_bytes"], base["peak_bytes"]
+            if peak > base_peak * (1 + threshold):
+                regressions.append(
+                    f"{stage} at {size} collectibles peaked at {peak / 2**20:.1f} MB, "
+                    f"{peak / base_peak - 1:+.0%} over {base_peak / 2**20:.1f} MB"
+                )
+    return regressions
+
+
+def format_results(
+    current: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]] | None = None,
+) -> str:
+    lines = [f"{'collectibles':>12} {'stage':>8} {'seconds':>9} {'peak MB':>9}"]
+    for size, stages in current.items():
+        for stage, result in stages.items():
+            line = (
+                f"{size:>12} {stage:>8} {result['seconds']:>9.3f} "
+                f"{result['peak_bytes'] / 2**20:>9.1f}"
+            )
+            base = (baseline or {}).get(size, {}).get(stage)
+            if base is not None:
+                line += (
+                    f"  time {result['seconds'] / base['seconds'] - 1:+.0%}, "
+                    f"memory {result['peak_bytes'] / base['peak_bytes'] - 1:+.0%}"
+                )
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        help="Collectible counts to generate guides with "
+        "(default: 1000 and 10000, or those of the baseline when comparing)",
+    )
+    parser.add_argument("--stages", nargs="+", choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    add_shape_arguments(parser)
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument(
+        "--compare", help="Compare with a saved JSON file, failing on regressions"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown or memory growth as a fraction (default: 0.2)",
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    sizes, stages = args.sizes, args.stages
+    if args.compare is not None:
+        baseline = json.loads(Path(args.compare).read_text())["results"]
+        if sizes is None:
+            sizes = [int(size) for size in baseline]
+        if stages is None:
+            stages = [s for s in STAGES if any(s in r for r in baseline.values())]
+    results = run_suite(sizes or DEFAULT_SIZES, stages or STAGES, args.repeat, args)
+    print(format_results(results, baseline))
+
+    if args.save is not None:
+        record = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }
+        Path(args.save).write_text(json.dumps(record, indent=2) + "\n")
+        print(f"Saved results to {args.save}")
+    if baseline is not None:
+        regressions = find_regressions(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+        print(f"No stage regressed by more than {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+import glob
+import io
+from pathlib import Path
+import time
+import traceback
+from typing import Any, Callable
+
+from src.parse_document import find_included_paths
+
+OK = "ok"
+UP_TO_DATE = "up to date"
+FAILED = "failed"
+
+GLOB_CHARS = set("*?[")
+
+
+def included_by(paths: list[Path]) -> set[Path]:
+    included = set()
+    for path in paths:
+        try:
+            included.update(p.resolve() for p in find_included_paths(path))
+        except (OSError, UnicodeDecodeError):
+            pass
+    return included
+
+
+def expand_inputs(patterns: list[str]) -> list[Path]:
+    # Files are taken as they are, directories give every .txt file below
+    # them except those another one \inputs, and anything else with glob
+    # characters is expanded. A name that matches nothing is kept, so it is
+    # reported as missing.
+    found: list[Path] = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = sorted(path.rglob("*.txt"))
+            included = included_by(candidates)
+            found.extend(c for c in candidates if c.resolve() not in included)
+        elif not path.exists() and GLOB_CHARS & set(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if matches:
+                found.extend(Path(m) for m in matches)
+            else:
+                found.append(path)
+        else:
+            found.append(path)
+    return list(dict.fromkeys(found))
+
+
+@dataclass
+class BatchResult:
+    infile: Path
+    status: str
+    seconds: float
+    output: str
+
+    def detail(self) -> str:
+        if self.status != FAILED:
+            return ""
+        lines = [line for line in self.output.splitlines() if line.strip()]
+        return lines[-1] if lines else ""
+
+
+def run_one(
+    task: Callable[[Any, Path], str], options: Any, infile: Path
+) -> BatchResult:
+    # Runs one file with its output captured, so the output of parallel
+    # files doesn't interleave, and so an error in one file is reported
+    # instead of stopping the others.
+    out = io.StringIO()
+    start = time.perf_counter()
+    with redirect_stdout(out):
+        try:
+            status = task(options, infile)
+        except Exception:
+            traceback.print_exc(file=out)
+            status = FAILED
+    return BatchResult(infile, status, time.perf_counter() - start, out.getvalue())
+
+
+def run_batch(
+    task: Callable[[Any, Path], str],
+    options: Any,
+    infiles: list[Path],
+    max_workers: int = 1,
+) -> list[BatchResult]:
+    if max_workers <= 1 or len(infiles) < 2:
+        return [run_one(task, options, infile) for infile in infiles]
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(infiles))) as executor:
+        futures = [
+            executor.submit(run_one, task, options, infile) for infile in infiles
+        ]
+        results = []
+        for future, infile in zip(futures, infiles):
+            # run_one catches errors in the task itself. A worker that dies
+            # breaks the pool, which fails every file still running in it.
+            try:
+                results.append(future.result())
+            except Exception as e:
+                output = f"{type(e).__name__}: {e}\n"
+                results.append(BatchResult(infile, FAILED, 0.0, output))
+        return results
+
+
+def format_status_table(results: list[BatchResult]) -> str:
+    names = [str(result.infile) for result in results]
+    width = max([len("file"), *map(len, names)])
+    lines = [f"{'file':<{width}}  {'status':<10}  {'seconds':>7}"]
+    for name, result in zip(names, results):
+        line = f"{name:<{width}}  {result.status:<10}  {result.seconds:>7.2f}"
+        detail = result.detail()
+        lines.append(f"{line}  {detail}" if detail else line)
+    counts = {
+        status: sum(result.status == status for result in results)
+        for status in (OK, UP_TO_DATE, FAILED)
+    }
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+    lines.append(f"{len(results)} files: {summary}")
+    return "\n".join(lines)
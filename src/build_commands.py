@@ -0,0 +1,274 @@
+import argparse
+import cProfile
+from pathlib import Path
+from typing import Callable
+
+from src.batch import (
+    FAILED,
+    OK,
+    UP_TO_DATE,
+    expand_inputs,
+    format_status_table,
+    run_batch,
+)
+from src.fragment_cache import FragmentCache
+from src.manifest import (
+    ManifestStore,
+    input_paths,
+    replace_if_changed,
+    temporary_path,
+    write_if_changed,
+)
+from src.parse_cache import ParseCache, default_cache_dir, load_document
+from src.parse_document import WalkthroughDocument
+from src.stages import StageRecorder, count_document, profiling
+
+# The compile and build commands. BeautifulSoup, Pillow, zipfile and the
+# offline and minify support are imported only when an option needs them.
+
+
+def make_parse_cache(no_cache: bool) -> ParseCache | None:
+    return None if no_cache else ParseCache(default_cache_dir())
+
+
+# Options that don't change what gets written
+NOT_OUTPUT_SETTINGS = {
+    "infiles",
+    "jobs",
+    "no_cache",
+    "profile",
+    "profile_output",
+    "memory_report",
+    "subparser_name",
+}
+
+
+def make_manifest_store(no_cache: bool) -> ManifestStore | None:
+    return None if no_cache else ManifestStore(default_cache_dir())
+
+
+def output_settings(args: argparse.Namespace) -> dict:
+    settings = vars(args).items()
+    return {k: v for k, v in sorted(settings) if k not in NOT_OUTPUT_SETTINGS}
+
+
+def report_write(outfile: Path, changed: bool) -> None:
+    if not changed:
+        print(f"{outfile} did not change.")
+
+
+def print_diagnostics(doc: WalkthroughDocument) -> None:
+    for diagnostic in doc.diagnostics:
+        print(diagnostic)
+
+
+def render_bs4(doc: WalkthroughDocument, stages: StageRecorder) -> str:
+    from src.compose_html import build_html_tree, serialize_html
+
+    with stages.stage("build tree"):
+        tree = build_html_tree(doc)
+    with stages.stage("serialize"):
+        html = serialize_html(tree)
+        # The tree is full of reference cycles, so it would otherwise stay
+        # around until the garbage collector next runs
+        del tree
+    return html
+
+
+def render_document(
+    args: argparse.Namespace,
+    cache: ParseCache | None,
+    infile: Path,
+    doc: WalkthroughDocument,
+    stages: StageRecorder,
+) -> str:
+    if args.renderer == "bs4":
+        return render_bs4(doc, stages)
+    fragments = FragmentCache(cache, infile, args.jobs, args.lazy_rollups)
+    with stages.stage("render"):
+        return fragments.render(doc)
+
+
+def print_profile(stages: StageRecorder, output_bytes: int) -> None:
+    stages.count("output bytes", output_bytes)
+    print(stages.format_report())
+
+
+def minify_output(html: str) -> str:
+    from src.minify import minify_html
+
+    minified = minify_html(html)
+    before = len(html.encode("utf-8"))
+    after = len(minified.encode("utf-8"))
+    print(
+        f"Minified {before} bytes to {after} bytes ({1 - after / before:.0%} smaller)."
+    )
+    return minified
+
+
+def make_offline(html: str) -> str | None:
+    from src.offline import alpine_path, load_alpine, make_offline_html
+
+    try:
+        alpine = load_alpine()
+    except OSError as e:
+        print(f"Could not load Alpine.js from {alpine_path()}: {e}")
+        return None
+    html, missing = make_offline_html(html, alpine)
+    # A class without a style would silently change how the page looks
+    for class_name in missing:
+        print(f"No offline style for class {class_name}")
+    return None if missing else html
+
+
+def optimize_build_images(
+    html: str,
+    infile: Path,
+    doc: WalkthroughDocument,
+    args: argparse.Namespace,
+    cache: ParseCache | None,
+) -> tuple[str, dict[str, bytes]]:
+    from src.images import ImageOptions, add_image_attributes, optimize_images
+
+    options = ImageOptions(args.max_image_width, args.image_quality)
+    result = optimize_images(infile.parent, doc.images, options, cache, args.jobs)
+    print(
+        f"Optimized {result.encoded_count} images and reused {result.reused_count}: "
+        f"{result.bytes_before} bytes to {result.bytes_after} bytes."
+    )
+    html = add_image_attributes(html, doc.images, result.images)
+    return html, {name: image.data for name, image in result.images.items()}
+
+
+def compile_file(args: argparse.Namespace, infile: Path) -> str:
+    if not infile.exists():
+        print(f"Cannot find file {infile}")
+        return FAILED
+    if args.outfile is not None:
+        outfile = Path(args.outfile)
+    else:
+        outfile = infile.parent / f"{infile.stem}.html"
+    manifests = make_manifest_store(args.no_cache)
+    settings = output_settings(args)
+    if manifests is not None and manifests.is_up_to_date(outfile, settings):
+        print(f"{outfile} is up to date.")
+        return UP_TO_DATE
+    print(f"Compiling {infile} to {outfile}")
+    stages = StageRecorder(args.memory_report)
+    cache = make_parse_cache(args.no_cache)
+    with stages.stage("parse"):
+        doc = load_document(infile, cache)
+    print_diagnostics(doc)
+    html = render_document(args, cache, infile, doc, stages)
+    if args.minify:
+        with stages.stage("minify"):
+            html = minify_output(html)
+    with stages.stage("write"):
+        data = html.encode("utf-8")
+        report_write(outfile, write_if_changed(outfile, data))
+    if manifests is not None:
+        with stages.stage("manifest"):
+            manifests.record(outfile, settings, input_paths(infile, doc))
+    if args.profile:
+        count_document(doc, stages)
+        print_profile(stages, len(data))
+    if args.memory_report:
+        print(stages.format_memory_report())
+    return OK
+
+
+def build_file(args: argparse.Namespace, infile: Path) -> str:
+    from src.package import write_package
+
+    if not infile.exists():
+        print(f"Cannot find file {infile}")
+        return FAILED
+    if args.outfile is not None:
+        outfile_zip = Path(args.outfile)
+    else:
+        outfile_zip = infile.parent / f"{infile.stem}.zip"
+    manifests = make_manifest_store(args.no_cache)
+    settings = output_settings(args)
+    if manifests is not None and manifests.is_up_to_date(outfile_zip, settings):
+        print(f"{outfile_zip} is up to date.")
+        return UP_TO_DATE
+    print(f"Compiling {infile} to {outfile_zip}")
+    stages = StageRecorder(args.memory_report)
+    cache = make_parse_cache(args.no_cache)
+    with stages.stage("parse"):
+        doc = load_document(infile, cache)
+    print_diagnostics(doc)
+    for img in doc.images:
+        if not (infile.parent / img).exists():
+            print(f"Referenced image {infile.parent / img} does not exist")
+            return FAILED
+    html = render_document(args, cache, infile, doc, stages)
+    image_data = {}
+    if args.optimize_images:
+        with stages.stage("optimize images"):
+            html, image_data = optimize_build_images(html, infile, doc, args, cache)
+    if args.minify:
+        with stages.stage("minify"):
+            html = minify_output(html)
+    if args.offline:
+        with stages.stage("offline"):
+            html = make_offline(html)
+        if html is None:
+            return FAILED
+    tmp_zip = temporary_path(outfile_zip)
+    try:
+        with stages.stage("package"):
+            package = write_package(
+                tmp_zip,
+                f"{infile.stem}.html",
+                html,
+                infile.parent,
+                doc.images,
+                image_data=image_data,
+            )
+        for duplicate, image in package.duplicates.items():
+            print(f"Image {duplicate} is the same as {image}, packaging it once")
+        with stages.stage("write"):
+            zip_size = tmp_zip.stat().st_size
+            report_write(outfile_zip, replace_if_changed(tmp_zip, outfile_zip))
+    finally:
+        tmp_zip.unlink(missing_ok=True)
+    if manifests is not None:
+        with stages.stage("manifest"):
+            inputs = input_paths(infile, doc)
+            if args.offline:
+                from src.offline import alpine_path
+
+                inputs.append(alpine_path())
+            manifests.record(outfile_zip, settings, inputs)
+    if args.profile:
+        count_document(doc, stages)
+        stages.count("page bytes", package.html_size)
+        print_profile(stages, zip_size)
+    if args.memory_report:
+        print(stages.format_memory_report())
+    return OK
+
+
+def run_files(
+    task: Callable[[argparse.Namespace, Path], str],
+    args: argparse.Namespace,
+    profiler: cProfile.Profile | None = None,
+) -> int:
+    infiles = expand_inputs(args.infiles)
+    if len(infiles) == 1:
+        with profiling(profiler):
+            return 1 if task(args, infiles[0]) == FAILED else 0
+    if args.outfile is not None:
+        print("-o/--outfile can only be used with a single input file")
+        return 1
+    # Each file renders its sections serially; the workers are spent on files
+    batch_args = argparse.Namespace(**{**vars(args), "jobs": 1})
+    with profiling(profiler):
+        results = run_batch(task, batch_args, infiles, args.jobs)
+    for result in results:
+        if result.status == FAILED or args.profile or args.memory_report:
+            print(f"== {result.infile} ==")
+            print(result.output.rstrip())
+    print(format_status_table(results))
+    return 1 if any(result.status == FAILED for result in results) else 0
@@ -0,0 +1,24 @@
+from pathlib import Path
+
+from src.parse_document import ERROR, Diagnostic, IncludeResolver, iter_document
+
+
+def check_file(path: Path) -> list[Diagnostic]:
+    includes = IncludeResolver(path.parent, image_dir=path.parent)
+    with open(path, encoding="utf-8") as f:
+        includes.prefetch(f)
+    return [
+        event
+        for event in iter_document(path, includes)
+        if isinstance(event, Diagnostic)
+    ]
+
+
+def has_errors(diagnostics: list[Diagnostic]) -> bool:
+    return any(d.severity == ERROR for d in diagnostics)
+
+
+def format_diagnostic(path: Path, diagnostic: Diagnostic) -> str:
+    if diagnostic.source is not None:
+        path = path.parent / diagnostic.source
+    return f"{path}:{diagnostic.line_no}: {diagnostic.severity}: {diagnostic.message}"
@@ -1,5 +1,3 @@
-from dataclasses import dataclass
-import re
 from bs4 import BeautifulSoup, Tag
 
 from src.parse_document import (
@@ -15,24 +13,26 @@ from src.parse_document import (
     LinkParagraphChild,
     NumberedList,
 )
+from src.render_html import (
+    ChecklistItem,
+    generate_safe_html_tag_name,
+    get_collectibles_by_type,
+    make_counter_groups,
+    make_store_script_text,
+    section_counter,
+    type_counter,
+)
 
 
-@dataclass
-class ChecklistItem:
-    content: str
-    item_id: str
-
-
-def generate_safe_html_tag_name(string: str) -> str:
-    tag_name = string.replace(" ", "_")
-    tag_name = re.sub(r"[^a-zA-Z0-9_]", "", tag_name.lower())
-    return tag_name
+def make_html_from_doc(doc: WalkthroughDocument) -> str:
+    return serialize_html(build_html_tree(doc))
 
 
-def make_html_from_doc(doc: WalkthroughDocument) -> str:
+def build_html_tree(doc: WalkthroughDocument) -> BeautifulSoup:
     checklist_items: dict[str, list[ChecklistItem]] = {}
     all_checklist_items: list[tuple[str, dict[str, list[ChecklistItem]]]] = []
-    store_lines = []
+    item_ids = []
+    item_labels = []
 
     html = BeautifulSoup()
     head_tag, main_container = make_preamble(html, doc.title)
@@ -111,7 +111,14 @@ def make_html_from_doc(doc: WalkthroughDocument) -> str:
                                 tag.string = se.s
                                 spoiler_element.append(tag)
                             case ImageParagraphChild():
-                                tag = html.new_tag("img", attrs={"src": se.image_loc})
+                                tag = html.new_tag(
+                                    "img",
+                                    attrs={
+                                        "src": se.image_loc,
+                                        "loading": "lazy",
+                                        "decoding": "async",
+                                    },
+                                )
                                 spoiler_element.append(tag)
                             case UlParagraphChild():
                                 ul_element = html.new_tag(
@@ -155,7 +162,7 @@ def make_html_from_doc(doc: WalkthroughDocument) -> str:
                                         "id": f"{paragraph_child.item_id}_in_paragraph",
                                         "x-model": paragraph_child.item_id,
                                         "class": "h-4 w-4 rounded focus:ring-indigo-600",
-                                        "@change": "storeStatuses()",
+                                        "@change": "storeStatuses($el)",
                                     },
                                 )
                                 label_tag.string = paragraph_child.content
@@ -164,8 +171,9 @@ def make_html_from_doc(doc: WalkthroughDocument) -> str:
                                 element.append(" ")
                                 element.append(label_tag)
                                 element.append(" ")
-                                store_lines.append(
-                                    f"'{paragraph_child.item_id}': false"
+                                item_ids.append(paragraph_child.item_id)
+                                item_labels.append(
+                                    (paragraph_child.tag_name, paragraph_child.content)
                                 )
                                 citem = ChecklistItem(
                                     paragraph_child.list_content,
@@ -225,50 +233,15 @@ def make_html_from_doc(doc: WalkthroughDocument) -> str:
     )
 
     store_script = html.new_tag("script")
-    store_script_text = """tailwind.config = {
-        darkMode: "class"
-      };\n"""
-    store_script_text += f'const currentVersion = "{doc.version}";'
-    store_script_text += """
-    const storedVersion = localStorage.getItem("game_short_name_checked_storage_version");
-    console.log("stored version:", storedVersion);
-    let shouldInitialize = false;
-    if (storedVersion !== currentVersion) {
-    localStorage.removeItem('game_short_name_checked_statuses');
-    localStorage.setItem('game_short_name_checked_storage_version', currentVersion);
-    shouldInitialize = true;
-    }
-    else {
-    console.log("Up to date!")
-    }
-    let checklistItems;
-    if (localStorage.getItem('game_short_name_checked_statuses') == null)
-    {
-    shouldInitialize = true;
-    }
-    if (shouldInitialize) {
-    checklistItems = {
-""".replace(
-        "game_short_name", doc.game_short_name
+    counter_groups = make_counter_groups(all_checklist_items)
+    store_script.append(
+        make_store_script_text(doc, item_ids, item_labels, counter_groups)
     )
-    store_script_text += ",\n".join(store_lines)
-    store_script_text += """};
-    localStorage.setItem('game_short_name_checked_statuses', JSON.stringify(checklistItems));
-    console.log("Initialized storage");
-    }
-    else {
-    checklistItems = JSON.parse(localStorage.getItem('game_short_name_checked_statuses'));
-    console.log("Loaded from storage.")
-    }
-
-    function storeStatuses() {
-    localStorage.setItem('game_short_name_checked_statuses', JSON.stringify(checklistItems));
-    }""".replace(
-        "game_short_name", doc.game_short_name
-    )
-    store_script.append(store_script_text)
     head_tag.append(store_script)
+    return html
+
 
+def serialize_html(html: BeautifulSoup) -> str:
     return str(html).replace("val =&gt; localStorage", "val => localStorage")
 
 
@@ -304,7 +277,7 @@ def add_all_collectibles_by_type(
         )
         main_container.append(
             make_rollup_checklist_container(
-                html, doc.decl_map[item_type].plural, items_of_that_type
+                html, item_type, doc.decl_map[item_type].plural, items_of_that_type
             )
         )
         all_collectibles_by_type_ul_li = html.new_tag("li")
@@ -414,20 +387,6 @@ def make_preamble(html: BeautifulSoup, title: str) -> tuple[Tag, Tag]:
     return head_tag, main_container
 
 
-def get_collectibles_by_type(
-    all_checklist_items: list[tuple[str, dict[str, list[ChecklistItem]]]],
-) -> dict[str, list[tuple[str, ChecklistItem]]]:
-    all_collectibles_by_type: dict[str, list[tuple[str, ChecklistItem]]] = {}
-    for checklist_item_section_name, foo_checklist_items in all_checklist_items:
-        for item_type, item_list in foo_checklist_items.items():
-            for item in item_list:
-                all_collectibles_by_type.setdefault(item_type, []).append(
-                    (checklist_item_section_name, item)
-                )
-
-    return all_collectibles_by_type
-
-
 def make_checklist_container(
     doc: WalkthroughDocument,
     html: BeautifulSoup,
@@ -446,12 +405,7 @@ def make_checklist_container(
         )
         section_header.append(f"{decl.plural} (")
         section_header.append(
-            html.new_tag(
-                "span",
-                attrs={
-                    "x-text": f"[{','.join([t.item_id for t in tags])}].filter(Boolean).length"
-                },
-            )
+            html.new_tag("span", attrs={"x-text": section_counter(tags)})
         )
         section_header.append(f"/{len(tags)})")
         section_ol.append(section_header)
@@ -469,6 +423,7 @@ def make_checklist_container(
 
 def make_rollup_checklist_container(
     html: BeautifulSoup,
+    item_type: str,
     item_name_plural: str,
     checklist_items: list[tuple[str, ChecklistItem]],
 ) -> Tag:
@@ -481,12 +436,7 @@ def make_rollup_checklist_container(
     )
     section_header.append(f"{item_name_plural} (")
     section_header.append(
-        html.new_tag(
-            "span",
-            attrs={
-                "x-text": f"[{','.join([t[1].item_id for t in checklist_items])}].filter(Boolean).length"
-            },
-        )
+        html.new_tag("span", attrs={"x-text": type_counter(item_type)})
     )
     section_header.append(f"/{len(checklist_items)})")
     section_header.append(make_go_to_top_link("text-md font-normal"))
@@ -521,7 +471,7 @@ def make_checklist_tag(html: BeautifulSoup, s: str, this_id: str, loc: str) -> T
             "type": "checkbox",
             "x-model": this_id,
             "class": "h-4 w-4 ml-4 rounded border-gray-300 text-indigo-600 focus:ring-indigo-600",
-            "@change": "storeStatuses()",
+            "@change": "storeStatuses($el)",
         },
     )
     input_container.append(input_tag)
@@ -0,0 +1,5 @@
+# Defaults of command line options, which the modules that use them share.
+# This module imports nothing, so building the argument parser stays cheap.
+DEFAULT_DEBOUNCE_MS = 100
+DEFAULT_MAX_WIDTH = 1600
+DEFAULT_QUALITY = 80
@@ -0,0 +1,137 @@
+import hashlib
+from pathlib import Path
+
+from src.parse_cache import ParseCache
+from src.parse_document import (
+    ChecklistParagraphChild,
+    ChecklistSection,
+    ImageParagraphChild,
+    LinkParagraphChild,
+    NumberedList,
+    Paragraph,
+    SectionHeading,
+    Spoiler,
+    TextParagraphChild,
+    UlParagraphChild,
+    UnnumberedList,
+    WalkthroughDocument,
+)
+from src.render_html import (
+    RENDERER_VERSION,
+    RenderedSection,
+    assemble_parts,
+    render_sections,
+)
+
+
+def child_content(child) -> tuple:
+    match child:
+        case TextParagraphChild():
+            return ("text", child.s)
+        case ImageParagraphChild():
+            return ("img", child.image_loc)
+        case UlParagraphChild():
+            return ("ul", tuple(child.items))
+        case LinkParagraphChild():
+            return ("link", child.url)
+        case ChecklistParagraphChild():
+            return (
+                "item",
+                child.tag_name,
+                child.item_id,
+                child.content,
+                child.list_content,
+            )
+    return (type(child).__name__,)
+
+
+def section_key(doc: WalkthroughDocument, csec: ChecklistSection) -> str:
+    # Everything render_checklist_section reads: the section's own content,
+    # the declarations of the tags it uses and the spoiler title.
+    content: list[tuple] = []
+    tags: set[str] = set()
+    for item in csec.items:
+        match item:
+            case SectionHeading():
+                content.append(("heading", item.title))
+            case UnnumberedList():
+                content.append(("ul", tuple(item.items)))
+            case NumberedList():
+                content.append(("ol", tuple(item.items)))
+            case Paragraph() | Spoiler():
+                children = tuple(child_content(child) for child in item.items)
+                content.append((type(item).__name__, children))
+                tags.update(
+                    child.tag_name
+                    for child in item.items
+                    if isinstance(child, ChecklistParagraphChild)
+                )
+    decls = []
+    for tag in sorted(tags):
+        decl = doc.decl_map.get(tag)
+        decls.append((tag, None if decl is None else decl.plural))
+    key = (
+        RENDERER_VERSION,
+        csec.name,
+        doc.default_spoiler_title,
+        tuple(decls),
+        tuple(content),
+    )
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+class FragmentCache:
+    # Rendered checklist sections keyed on section_key, so only sections whose
+    # content changed are rendered again. Fragments are kept in memory, and
+    # when a ParseCache is given, saved to disk under the source path so the
+    # next run of the same walkthrough can reuse them.
+    def __init__(
+        self,
+        disk: ParseCache | None = None,
+        source: Path | None = None,
+        max_workers: int = 1,
+        lazy_rollups: bool = False,
+    ):
+        self.fragments: dict[str, RenderedSection] = {}
+        self.max_workers = max_workers
+        self.lazy_rollups = lazy_rollups
+        self.disk = disk
+        self.disk_key = None
+        if disk is not None and source is not None:
+            h = hashlib.sha256(f"fragments\0{RENDERER_VERSION}\0".encode("utf-8"))
+            h.update(str(source.resolve()).encode("utf-8"))
+            self.disk_key = h.hexdigest()
+        self.loaded = False
+        self.rendered_count = 0
+        self.section_count = 0
+
+    def load(self) -> None:
+        self.loaded = True
+        if self.disk is None or self.disk_key is None:
+            return
+        fragments = self.disk.load(self.disk_key)
+        if isinstance(fragments, dict):
+            self.fragments.update(fragments)
+
+    def render(self, doc: WalkthroughDocument) -> str:
+        return "".join(self.render_parts(doc))
+
+    def render_parts(self, doc: WalkthroughDocument) -> list[str]:
+        if not self.loaded:
+            self.load()
+        keys = [section_key(doc, csec) for csec in doc.checklist_sections]
+        missing: dict[str, ChecklistSection] = {}
+        for key, csec in zip(keys, doc.checklist_sections):
+            if key not in self.fragments:
+                missing.setdefault(key, csec)
+        rendered = render_sections(doc, list(missing.values()), self.max_workers)
+        self.rendered_count = len(rendered)
+        current = {key: self.fragments[key] for key in keys if key in self.fragments}
+        current.update(zip(missing, rendered))
+        sections = [current[key] for key in keys]
+        self.section_count = len(sections)
+        changed = current.keys() != self.fragments.keys()
+        self.fragments = current
+        if changed and self.disk is not None and self.disk_key is not None:
+            self.disk.store(self.disk_key, current)
+        return assemble_parts(doc, sections, self.lazy_rollups)
@@ -0,0 +1,165 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import hashlib
+from io import BytesIO
+from pathlib import Path
+import posixpath
+import re
+
+from PIL import Image, ImageOps
+
+from src.defaults import DEFAULT_MAX_WIDTH, DEFAULT_QUALITY
+from src.parse_cache import ParseCache
+from src.render_html import quote_attr
+
+# Bump when the way images are encoded changes, so cached results from an
+# older version are not reused.
+OPTIMIZER_VERSION = "1"
+
+# How both renderers write a spoiler image
+IMG_TAG = re.compile(
+    r"<img decoding=\"async\" loading=\"lazy\" src=(\"[^\"]*\"|'[^']*')/>"
+)
+
+
+@dataclass
+class ImageOptions:
+    max_width: int = DEFAULT_MAX_WIDTH
+    quality: int = DEFAULT_QUALITY
+
+
+@dataclass
+class OptimizedImage:
+    data: bytes
+    # None when Pillow can't read the image, e.g. for SVG
+    width: int | None = None
+    height: int | None = None
+
+
+@dataclass
+class OptimizeResult:
+    images: dict[str, OptimizedImage] = field(default_factory=dict)
+    encoded_count: int = 0
+    reused_count: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+
+def save_options(image_format: str | None, quality: int) -> dict | None:
+    match image_format:
+        case "JPEG":
+            return {"quality": quality, "optimize": True, "progressive": True}
+        case "PNG":
+            return {"optimize": True}
+        case "WEBP":
+            return {"quality": quality, "method": 6}
+        case _:
+            return None
+
+
+def optimize_image(data: bytes, options: ImageOptions) -> OptimizedImage:
+    # Images Pillow can't read, or that turn out to be corrupt, truncated or
+    # too large to decode safely, are copied as they are.
+    try:
+        return encode_image(data, options)
+    except (OSError, Image.DecompressionBombError):
+        return OptimizedImage(data)
+
+
+def encode_image(data: bytes, options: ImageOptions) -> OptimizedImage:
+    # Images wider than max_width are scaled down, and images in a format
+    # we can re-encode are saved again with the given quality. The original
+    # bytes are kept when that doesn't make the file smaller. Animations and
+    # other formats are copied as they are.
+    with Image.open(BytesIO(data)) as image:
+        image_format = image.format
+        kwargs = save_options(image_format, options.quality)
+        if kwargs is None or getattr(image, "n_frames", 1) > 1:
+            return OptimizedImage(data, image.width, image.height)
+        # Browsers show photos the way their EXIF orientation says, which
+        # re-encoding would lose.
+        upright = ImageOps.exif_transpose(image)
+        resized = upright.width > options.max_width
+        if resized:
+            height = max(1, round(upright.height * options.max_width / upright.width))
+            upright = upright.resize(
+                (options.max_width, height), Image.Resampling.LANCZOS
+            )
+        out = BytesIO()
+        upright.save(out, image_format, **kwargs)
+    if not resized and out.tell() >= len(data):
+        return OptimizedImage(data, upright.width, upright.height)
+    return OptimizedImage(out.getvalue(), upright.width, upright.height)
+
+
+def image_key(digest: str, options: ImageOptions) -> str:
+    key = f"image\0{OPTIMIZER_VERSION}\0{options.max_width}\0{options.quality}\0"
+    return hashlib.sha256(key.encode("utf-8") + digest.encode("utf-8")).hexdigest()
+
+
+def read_source(path: Path) -> tuple[bytes, str]:
+    data = path.read_bytes()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def optimize_images(
+    base_dir: Path,
+    images: list[str],
+    options: ImageOptions,
+    cache: ParseCache | None = None,
+    max_workers: int = 1,
+) -> OptimizeResult:
+    # Results are cached on the hash of the source bytes, so a screenshot is
+    # only encoded again when it or the options change. Images with the same
+    # bytes are encoded once. Pillow releases the GIL while it decodes,
+    # resizes and encodes, so the work runs on a thread pool.
+    result = OptimizeResult()
+    names = list(dict.fromkeys(posixpath.normpath(img) for img in images))
+    with ThreadPoolExecutor(max(1, max_workers)) as executor:
+        sources = list(executor.map(lambda name: read_source(base_dir / name), names))
+        by_digest: dict[str, OptimizedImage] = {}
+        missing: dict[str, bytes] = {}
+        for data, digest in sources:
+            if digest in by_digest or digest in missing:
+                continue
+            cached = None if cache is None else cache.load(image_key(digest, options))
+            if isinstance(cached, OptimizedImage):
+                by_digest[digest] = cached
+                result.reused_count += 1
+            else:
+                missing[digest] = data
+        optimized = executor.map(
+            lambda data: optimize_image(data, options), missing.values()
+        )
+        for digest, image in zip(missing, optimized):
+            by_digest[digest] = image
+            result.encoded_count += 1
+            if cache is not None:
+                cache.store(image_key(digest, options), image)
+    for name, (data, digest) in zip(names, sources):
+        result.images[name] = by_digest[digest]
+        result.bytes_before += len(data)
+        result.bytes_after += len(by_digest[digest].data)
+    return result
+
+
+def add_image_attributes(
+    html: str, images: list[str], optimized: dict[str, OptimizedImage]
+) -> str:
+    sizes = {}
+    for img in images:
+        image = optimized.get(posixpath.normpath(img))
+        if image is not None and image.width is not None:
+            sizes[quote_attr(img)] = (image.width, image.height)
+
+    def add_size(match: re.Match) -> str:
+        src = match.group(1)
+        if src not in sizes:
+            return match.group(0)
+        width, height = sizes[src]
+        return (
+            f'<img decoding="async" height="{height}" loading="lazy" '
+            f'src={src} width="{width}"/>'
+        )
+
+    return IMG_TAG.sub(add_size, html)
@@ -0,0 +1,95 @@
+from collections import Counter
+import io
+from pathlib import Path
+
+from src.parse_document import (
+    Declaration,
+    IncludeResolver,
+    ParsedFragment,
+    WalkthroughDocument,
+    parse_fragment,
+)
+
+BLOCKS = [
+    (R"\begin{ul}", R"\end{ul}"),
+    (R"\begin{ol}", R"\end{ol}"),
+    (R"\begin{spoiler}", R"\end{spoiler}"),
+]
+
+ChunkState = tuple[str, tuple[str, ...], tuple[str, ...], str]
+FragmentKey = tuple[str, tuple[str, ...], tuple[str, ...], str, int]
+
+
+def split_checklist_chunks(input_text: str) -> list[tuple[int, str]]:
+    # Cuts the source after every top-level \checklist line, following the
+    # same block rules as WalkthroughParser so a chunk never ends inside a
+    # spoiler or list. Returns (number of preceding lines, chunk text) pairs.
+    chunks: list[tuple[int, str]] = []
+    current: list[str] = []
+    first_line_no = 0
+    block_ends: list[str] = []
+    for line_no, line in enumerate(input_text.split("\n"), start=1):
+        current.append(line)
+        if block_ends:
+            if line.startswith(block_ends[-1]):
+                block_ends.pop()
+            elif block_ends[-1] == R"\end{spoiler}" and line.startswith(R"\begin{ul}"):
+                block_ends.append(R"\end{ul}")
+        elif line.startswith(R"\checklist"):
+            chunks.append((first_line_no, "\n".join(current)))
+            current = []
+            first_line_no = line_no
+        else:
+            for begin, end in BLOCKS:
+                if line.startswith(begin):
+                    block_ends.append(end)
+    chunks.append((first_line_no, "\n".join(current)))
+    return chunks
+
+
+class IncrementalParser:
+    # Keeps the fragments of the previous parse, one per checklist section.
+    # A chunk of source is only parsed again when its text or the state it
+    # starts from (declared tags, included files, current section name)
+    # changed; otherwise the old fragment is reused and its checklist ids and
+    # diagnostic line numbers are shifted to match what comes before it.
+    def __init__(self, includes: IncludeResolver | None = None) -> None:
+        self.includes = includes or IncludeResolver(Path.cwd())
+        self.fragments: dict[FragmentKey, ParsedFragment] = {}
+        self.reparsed_count = 0
+        self.chunk_count = 0
+
+    def parse(self, input_text: str) -> WalkthroughDocument:
+        doc = WalkthroughDocument()
+        decl_map: dict[str, Declaration] = {}
+        section_name = "No section"
+        offsets: dict[str, int] = {}
+        occurrences: Counter[ChunkState] = Counter()
+        fragments: dict[FragmentKey, ParsedFragment] = {}
+        self.reparsed_count = 0
+        chunks = split_checklist_chunks(input_text)
+        self.includes.prefetch(io.StringIO(input_text))
+        self.chunk_count = len(chunks)
+        for first_line_no, chunk in chunks:
+            included = self.includes.digests(chunk.split("\n"))
+            state = (chunk, tuple(sorted(decl_map)), included, section_name)
+            key = (*state, occurrences[state])
+            occurrences[state] += 1
+            fragment = self.fragments.get(key)
+            if fragment is None:
+                fragment = parse_fragment(
+                    chunk, decl_map, section_name, first_line_no, self.includes
+                )
+                self.reparsed_count += 1
+            fragments[key] = fragment
+            fragment.relocate(offsets, first_line_no)
+            for event in fragment.events:
+                if isinstance(event, Declaration):
+                    decl_map[event.name] = event
+                doc.add_event(event)
+            for tag_name, count in fragment.counters.items():
+                offsets[tag_name] = offsets.get(tag_name, 0) + count
+            section_name = fragment.section_name
+        self.fragments = fragments
+        self.includes.prune()
+        return doc
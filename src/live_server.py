@@ -0,0 +1,152 @@
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from pathlib import Path
+import queue
+import threading
+
+HEARTBEAT_SECONDS = 15
+
+# Patches the pieces the server sends into the page. Alpine notices the new
+# elements and initializes them. When the page has to be reloaded instead,
+# the scroll position is kept across the reload.
+CLIENT_SCRIPT = """<script>
+(() => {
+const scrollKey = 'walkthrough_live_scroll';
+const savedScroll = sessionStorage.getItem(scrollKey);
+if (savedScroll !== null) {
+sessionStorage.removeItem(scrollKey);
+window.addEventListener('load', () => window.scrollTo(0, Number(savedScroll)));
+}
+const events = new EventSource('/events');
+events.addEventListener('patch', event => {
+for (const [index, html] of Object.entries(JSON.parse(event.data))) {
+const fragment = document.querySelector('[data-live-fragment="' + index + '"]');
+if (fragment !== null) {
+fragment.innerHTML = html;
+}
+}
+});
+events.addEventListener('reload', () => {
+sessionStorage.setItem(scrollKey, String(window.scrollY));
+location.reload();
+});
+})();
+</script>"""
+
+
+def make_live_page(parts: list[str]) -> str:
+    out = [parts[0]]
+    for index, part in enumerate(parts[1:-1]):
+        out.append(f'<div data-live-fragment="{index}">{part}</div>')
+    out.append(parts[-1].replace("</body>", CLIENT_SCRIPT + "</body>", 1))
+    return "".join(out)
+
+
+class LivePage:
+    # The page as assemble_parts returns it. publish() compares new parts
+    # with the previous ones and sends every connected browser the pieces
+    # that differ. A change to the head or to the number of pieces (say, a
+    # new section) needs a full reload, since the store script depends on
+    # every checklist item.
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.parts: list[str] = []
+        self.page = b""
+        self.clients: list[queue.Queue] = []
+
+    def subscribe(self) -> queue.Queue:
+        client: queue.Queue = queue.Queue()
+        with self.lock:
+            self.clients.append(client)
+        return client
+
+    def unsubscribe(self, client: queue.Queue) -> None:
+        with self.lock:
+            self.clients.remove(client)
+
+    def publish(self, parts: list[str], reload: bool = False) -> int | None:
+        # Returns the number of pieces sent, or None for a reload
+        with self.lock:
+            old = self.parts
+            self.parts = parts
+            self.page = make_live_page(parts).encode("utf-8")
+            if not old:
+                return 0
+            if reload or len(old) != len(parts) or old[0] != parts[0]:
+                event = ("reload", "{}")
+                changed = None
+            else:
+                patch = {
+                    str(index - 1): parts[index]
+                    for index in range(1, len(parts) - 1)
+                    if parts[index] != old[index]
+                }
+                if not patch:
+                    return 0
+                event = ("patch", json.dumps(patch, ensure_ascii=False))
+                changed = len(patch)
+            for client in self.clients:
+                client.put(event)
+            return changed
+
+    def client_count(self) -> int:
+        with self.lock:
+            return len(self.clients)
+
+
+class LiveHandler(SimpleHTTPRequestHandler):
+    # Serves the page at /, the update stream at /events, and any other file
+    # from the walkthrough's folder, for the images.
+    def __init__(self, *args, page: LivePage, **kwargs):
+        self.page = page
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        if path in ("/", "/index.html"):
+            with self.page.lock:
+                body = self.page.page
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/events":
+            self.stream_events()
+        else:
+            super().do_GET()
+
+    def stream_events(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        client = self.page.subscribe()
+        try:
+            while True:
+                try:
+                    event, data = client.get(timeout=HEARTBEAT_SECONDS)
+                    message = f"event: {event}\ndata: {data}\n\n"
+                except queue.Empty:
+                    message = ": ping\n\n"
+                self.wfile.write(message.encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.page.unsubscribe(client)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def make_live_server(
+    page: LivePage, folder: Path, port: int, host: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    handler = partial(LiveHandler, page=page, directory=os.fspath(folder))
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
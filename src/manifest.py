@@ -0,0 +1,114 @@
+from dataclasses import asdict, dataclass
+import filecmp
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from src.parse_document import WalkthroughDocument, find_included_paths
+
+TOOL_DIR = Path(__file__).resolve().parent.parent
+
+
+def file_digest(path: Path) -> str | None:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def tool_version() -> str:
+    # The compiler's own source, so any change to it counts as a new version
+    h = hashlib.sha256()
+    for path in [TOOL_DIR / "walkthrough.py", *sorted(TOOL_DIR.glob("src/*.py"))]:
+        h.update(path.name.encode("utf-8") + b"\0" + path.read_bytes())
+    return h.hexdigest()
+
+
+def input_paths(infile: Path, doc: WalkthroughDocument) -> list[Path]:
+    paths = [infile, *find_included_paths(infile)]
+    paths.extend(infile.parent / img for img in doc.images)
+    return paths
+
+
+# What an output was built from: the tool, the options that shape the output,
+# and the hash of every input file. If all of them still match and the output
+# is the file that was written, building again would give the same bytes.
+@dataclass
+class BuildManifest:
+    tool: str
+    settings: dict
+    inputs: dict[str, str | None]
+    output: str | None
+
+
+class ManifestStore:
+    # Manifests live in the cache folder, one per output path
+    def __init__(self, cache_dir: Path) -> None:
+        self.manifest_dir = cache_dir / "manifests"
+
+    def manifest_path(self, outfile: Path) -> Path:
+        key = hashlib.sha256(str(outfile.resolve()).encode("utf-8")).hexdigest()
+        return self.manifest_dir / f"{key}.json"
+
+    def load(self, outfile: Path) -> BuildManifest | None:
+        try:
+            data = json.loads(self.manifest_path(outfile).read_text(encoding="utf-8"))
+            return BuildManifest(**data)
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def store(self, outfile: Path, manifest: BuildManifest) -> None:
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(asdict(manifest), indent=1, sort_keys=True)
+        write_if_changed(self.manifest_path(outfile), data.encode("utf-8"))
+
+    def is_up_to_date(self, outfile: Path, settings: dict) -> bool:
+        manifest = self.load(outfile)
+        if manifest is None or manifest.settings != settings:
+            return False
+        if manifest.output is None or file_digest(outfile) != manifest.output:
+            return False
+        if manifest.tool != tool_version():
+            return False
+        return all(
+            file_digest(Path(path)) == digest
+            for path, digest in manifest.inputs.items()
+        )
+
+    def record(self, outfile: Path, settings: dict, inputs: list[Path]) -> None:
+        manifest = BuildManifest(
+            tool_version(),
+            settings,
+            {str(path.resolve()): file_digest(path) for path in inputs},
+            file_digest(outfile),
+        )
+        self.store(outfile, manifest)
+
+
+def temporary_path(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+
+def replace_if_changed(tmp: Path, path: Path) -> bool:
+    # Moves tmp over path in one step, so nobody sees a half-written file,
+    # unless path already has the same content; then tmp is removed and
+    # path keeps its modification time.
+    try:
+        if path.is_file() and filecmp.cmp(tmp, path, shallow=False):
+            return False
+        os.replace(tmp, path)
+        return True
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    tmp = temporary_path(path)
+    tmp.write_bytes(data)
+    return replace_if_changed(tmp, path)
@@ -0,0 +1,50 @@
+from pathlib import Path
+import tempfile
+import tracemalloc
+
+from src.compose_html import build_html_tree, serialize_html
+from src.package import write_package
+from src.parse_document import parse_document
+from src.render_html import render_html_from_doc
+from src.stages import TOP_SITES, StageMemory, StageRecorder
+
+
+def measure_memory(
+    infile: Path, renderer: str = "string", sites: int = TOP_SITES
+) -> dict[str, StageMemory]:
+    # Builds a walkthrough the way build does, without any cache, and
+    # returns the memory of each stage: read (the source text), parse (the
+    # document tree), build tree and serialize for the bs4 renderer or render
+    # for the string renderer, and package. For checking memory budgets:
+    #
+    #     memory = measure_memory(Path("guide.txt"), renderer="bs4")
+    #     assert memory["build tree"].peak_bytes < 500 * 2**20
+    was_tracing = tracemalloc.is_tracing()
+    stages = StageRecorder(trace_memory=True, sites=sites)
+    try:
+        with stages.stage("read"):
+            text = infile.read_text(encoding="utf-8")
+        with stages.stage("parse"):
+            doc = parse_document(text, infile.parent)
+        if renderer == "bs4":
+            with stages.stage("build tree"):
+                tree = build_html_tree(doc)
+            with stages.stage("serialize"):
+                html = serialize_html(tree)
+                del tree
+        else:
+            with stages.stage("render"):
+                html = render_html_from_doc(doc)
+        with tempfile.TemporaryDirectory() as folder:
+            with stages.stage("package"):
+                write_package(
+                    Path(folder) / f"{infile.stem}.zip",
+                    f"{infile.stem}.html",
+                    html,
+                    infile.parent,
+                    doc.images,
+                )
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return stages.memory
@@ -0,0 +1,91 @@
+from collections import Counter
+import re
+
+# Classes the renderer emits that Tailwind does not define. @apply rejects
+# unknown classes, so these stay on the element.
+NOT_TAILWIND = {"text-md"}
+
+# Text never contains a raw "<" or ">" and attribute values never contain "<",
+# so these patterns can't match inside user content.
+CLASS_IN_TAG = re.compile(r'(<[^<>]*? class=")([^"]*)"')
+CLASS_ATTR = re.compile(r' class="([^"]*)"')
+SCRIPT = re.compile(r"<script>(.*?)</script>", re.S)
+# Indentation between the tags of the static snippets
+SNIPPET_WHITESPACE = re.compile(r">\s*\n\s*<")
+SPACES_BEFORE_TAG = re.compile(r"  +<")
+PARAGRAPH_START = re.compile(r"(<p(?: [^<>]*)?>) +")
+
+
+def compact_script(script: str) -> str:
+    lines = (line.strip() for line in script.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def toggled_classes(body: str) -> set[str]:
+    toggled = set()
+    start = body.find(":class=")
+    while start != -1:
+        tag = body[body.rfind("<", 0, start) : body.find(">", start)]
+        match = CLASS_ATTR.search(tag)
+        if match is not None:
+            toggled.add(match.group(1))
+        start = body.find(":class=", start + 1)
+    return toggled
+
+
+def short_class_names(body: str) -> dict[str, str]:
+    # Class lists used more than once get a short name. Tags whose classes
+    # Alpine toggles through :class keep theirs, since a class applied through
+    # the short name could not be removed again. The counts may include text
+    # that merely looks like a class attribute; they only pick the names.
+    counts = Counter(CLASS_ATTR.findall(body))
+    for value in toggled_classes(body):
+        counts.pop(value, None)
+    names = {}
+    for value, count in counts.most_common():
+        name = f"c{len(names)}"
+        applied = tailwind_classes(value)
+        rule_length = len(f".{name}{{@apply {applied}}}")
+        if not applied or count * (len(value) - len(name)) <= rule_length:
+            continue
+        names[value] = name
+    return names
+
+
+def tailwind_classes(value: str) -> str:
+    return " ".join(c for c in value.split() if c not in NOT_TAILWIND)
+
+
+def make_class_style(names: dict[str, str]) -> str:
+    rules = []
+    for value, name in names.items():
+        rules.append(f".{name}{{@apply {tailwind_classes(value)}}}")
+    return (
+        '<style type="text/tailwindcss">@layer components{'
+        + "".join(rules)
+        + "}</style>"
+    )
+
+
+def minify_html(html: str) -> str:
+    head, body_tag, body = html.partition("<body")
+    head = SCRIPT.sub(lambda m: f"<script>{compact_script(m.group(1))}</script>", head)
+    body = SNIPPET_WHITESPACE.sub("><", body_tag + body)
+    body = SPACES_BEFORE_TAG.sub(" <", body)
+    body = PARAGRAPH_START.sub(r"\1", body)
+    names = short_class_names(body)
+    if not names:
+        return head + body
+
+    replacements = {}
+    for value, name in names.items():
+        kept = [c for c in value.split() if c in NOT_TAILWIND]
+        replacements[value] = " ".join([name] + kept)
+
+    def shorten(match: re.Match) -> str:
+        value = match.group(2)
+        return f'{match.group(1)}{replacements.get(value, value)}"'
+
+    body = CLASS_IN_TAG.sub(shorten, body)
+    head = head.replace("</head>", make_class_style(names) + "</head>", 1)
+    return head + body
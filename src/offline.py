@@ -0,0 +1,272 @@
+import hashlib
+from pathlib import Path
+import re
+
+# Offline pages can't run the Tailwind CDN compiler or fetch Alpine, so the
+# stylesheet is generated here from the classes the page actually uses and
+# Alpine is inlined from the copy in src/vendor.
+
+ALPINE_VERSION = "3.14.1"
+VENDOR_DIR = Path(__file__).parent / "vendor"
+# sha256 of the vendored dist/cdn.min.js, checked before it is inlined.
+# Update both together when ALPINE_VERSION changes.
+ALPINE_SHA256 = "358d9afbb1ab5befa2f48061a30776e5bcd7707f410a606ba985f98bc3b1c034"
+
+TAILWIND_SCRIPT = '<script src="https://cdn.tailwindcss.com"></script>'
+ALPINE_SCRIPT = '<script defer="defer" src="https://unpkg.com/alpinejs"></script>'
+TAILWIND_CONFIG = re.compile(r'tailwind\.config = \{\s*darkMode: "class"\s*\};\s*')
+TAILWIND_STYLE = re.compile(r'<style type="text/tailwindcss">(.*?)</style>', re.S)
+APPLY_RULE = re.compile(r"\.([\w-]+)\{@apply ([^}]*)\}")
+CLASS_IN_TAG = re.compile(r'<[^<>]*? class="([^"]*)"')
+TOGGLED_CLASSES = re.compile(r':class="([^"]*)"')
+TOGGLED_KEY = re.compile(r"'([^']+)'\s*:")
+
+# Classes that carry no style of their own: "dark" switches the dark: variants
+# on, and text-md is not a Tailwind class.
+UNSTYLED = {"dark", "text-md"}
+
+# The parts of Tailwind's preflight the page relies on.
+PREFLIGHT = (
+    "*,::before,::after{box-sizing:border-box;border-width:0;border-style:solid;"
+    "border-color:#e5e7eb;--tw-translate-x:0;--tw-translate-y:0;"
+    "--tw-ring-inset: ;--tw-ring-offset-width:0px;--tw-ring-offset-color:#fff;"
+    "--tw-ring-color:rgb(59 130 246/.5);--tw-ring-offset-shadow:0 0 #0000;"
+    "--tw-ring-shadow:0 0 #0000;--tw-shadow:0 0 #0000}"
+    "html{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4;"
+    "font-family:ui-sans-serif,system-ui,sans-serif,"
+    '"Apple Color Emoji","Segoe UI Emoji","Segoe UI Symbol","Noto Color Emoji"}'
+    "body{margin:0;line-height:inherit}"
+    "h1,h2,h3{font-size:inherit;font-weight:inherit}"
+    "a{color:inherit;text-decoration:inherit}"
+    "h1,h2,h3,p{margin:0}"
+    "ol,ul{list-style:none;margin:0;padding:0}"
+    "button,input{font-family:inherit;font-size:100%;font-weight:inherit;"
+    "line-height:inherit;color:inherit;margin:0;padding:0}"
+    "button{text-transform:none;background-color:transparent;"
+    "background-image:none;cursor:pointer}"
+    "img,svg{display:block;vertical-align:middle}"
+    "img{max-width:100%;height:auto}"
+    "[hidden]{display:none}"
+)
+
+TRANSLATE = "transform:translate(var(--tw-translate-x),var(--tw-translate-y))"
+RING = (
+    "--tw-ring-offset-shadow:var(--tw-ring-inset) 0 0 0 "
+    "var(--tw-ring-offset-width) var(--tw-ring-offset-color);"
+    "--tw-ring-shadow:var(--tw-ring-inset) 0 0 0 "
+    "calc({}px + var(--tw-ring-offset-width)) var(--tw-ring-color);"
+    "box-shadow:var(--tw-ring-offset-shadow),var(--tw-ring-shadow),"
+    "var(--tw-shadow,0 0 #0000)"
+)
+TRANSITION_TIMING = (
+    "transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms"
+)
+
+# Tailwind v3 utilities the renderer uses, in Tailwind's cascade order.
+UTILITIES = {
+    "pointer-events-none": "pointer-events:none",
+    "relative": "position:relative",
+    "mx-auto": "margin-left:auto;margin-right:auto",
+    "my-2": "margin-top:.5rem;margin-bottom:.5rem",
+    "mb-2": "margin-bottom:.5rem",
+    "ml-2": "margin-left:.5rem",
+    "ml-3": "margin-left:.75rem",
+    "ml-4": "margin-left:1rem",
+    "ml-6": "margin-left:1.5rem",
+    "mt-2": "margin-top:.5rem",
+    "mt-4": "margin-top:1rem",
+    "mt-6": "margin-top:1.5rem",
+    "mt-8": "margin-top:2rem",
+    "block": "display:block",
+    "inline-block": "display:inline-block",
+    "flex": "display:flex",
+    "inline-flex": "display:inline-flex",
+    "hidden": "display:none",
+    "h-4": "height:1rem",
+    "h-5": "height:1.25rem",
+    "h-6": "height:1.5rem",
+    "w-4": "width:1rem",
+    "w-5": "width:1.25rem",
+    "w-6": "width:1.5rem",
+    "w-11": "width:2.75rem",
+    "max-w-7xl": "max-width:80rem",
+    "flex-shrink-0": "flex-shrink:0",
+    "translate-x-0": f"--tw-translate-x:0px;{TRANSLATE}",
+    "translate-x-5": f"--tw-translate-x:1.25rem;{TRANSLATE}",
+    "transform": TRANSLATE,
+    "cursor-pointer": "cursor:pointer",
+    "list-decimal": "list-style-type:decimal",
+    "list-disc": "list-style-type:disc",
+    "items-start": "align-items:flex-start",
+    "items-center": "align-items:center",
+    "space-y-2": "margin-top:.5rem",
+    "space-y-8": "margin-top:2rem",
+    "rounded": "border-radius:.25rem",
+    "rounded-full": "border-radius:9999px",
+    "border-2": "border-width:2px",
+    "border-b": "border-bottom-width:1px",
+    "border-t": "border-top-width:1px",
+    "border-gray-300": "border-color:rgb(209 213 219)",
+    "border-transparent": "border-color:transparent",
+    "bg-gray-100": "background-color:rgb(243 244 246)",
+    "bg-gray-200": "background-color:rgb(229 231 235)",
+    "bg-gray-600": "background-color:rgb(75 85 99)",
+    "bg-indigo-600": "background-color:rgb(79 70 229)",
+    "bg-white": "background-color:rgb(255 255 255)",
+    "pb-4": "padding-bottom:1rem",
+    "pt-4": "padding-top:1rem",
+    "px-6": "padding-left:1.5rem;padding-right:1.5rem",
+    "px-8": "padding-left:2rem;padding-right:2rem",
+    "text-left": "text-align:left",
+    "text-sm": "font-size:.875rem;line-height:1.25rem",
+    "text-base": "font-size:1rem;line-height:1.5rem",
+    "text-lg": "font-size:1.125rem;line-height:1.75rem",
+    "text-xl": "font-size:1.25rem;line-height:1.75rem",
+    "text-2xl": "font-size:1.5rem;line-height:2rem",
+    "text-3xl": "font-size:1.875rem;line-height:2.25rem",
+    "text-5xl": "font-size:3rem;line-height:1",
+    "font-normal": "font-weight:400",
+    "font-medium": "font-weight:500",
+    "font-semibold": "font-weight:600",
+    "font-bold": "font-weight:700",
+    "leading-6": "line-height:1.5rem",
+    "leading-7": "line-height:1.75rem",
+    "tracking-tight": "letter-spacing:-.025em",
+    "text-indigo-600": "color:rgb(79 70 229)",
+    "text-white": "color:rgb(255 255 255)",
+    "underline": "text-decoration-line:underline",
+    "shadow": (
+        "--tw-shadow:0 1px 3px 0 rgb(0 0 0/.1),0 1px 2px -1px rgb(0 0 0/.1);"
+        "box-shadow:var(--tw-ring-offset-shadow,0 0 #0000),"
+        "var(--tw-ring-shadow,0 0 #0000),var(--tw-shadow)"
+    ),
+    "outline-none": "outline:2px solid transparent;outline-offset:2px",
+    "ring-0": RING.format(0),
+    "ring-2": RING.format(2),
+    "ring-indigo-600": "--tw-ring-color:rgb(79 70 229)",
+    "ring-offset-2": "--tw-ring-offset-width:2px",
+    "transition": (
+        "transition-property:color,background-color,border-color,"
+        "text-decoration-color,fill,stroke,opacity,box-shadow,transform,filter,"
+        f"backdrop-filter;{TRANSITION_TIMING}"
+    ),
+    "transition-colors": (
+        "transition-property:color,background-color,border-color,"
+        f"text-decoration-color,fill,stroke;{TRANSITION_TIMING}"
+    ),
+    "duration-200": "transition-duration:200ms",
+    "ease-in-out": "transition-timing-function:cubic-bezier(.4,0,.2,1)",
+}
+UTILITY_ORDER = {name: i for i, name in enumerate(UTILITIES)}
+
+# Utilities that style the children rather than the element itself
+CHILD_SELECTORS = {
+    "space-y-2": " > :not([hidden]) ~ :not([hidden])",
+    "space-y-8": " > :not([hidden]) ~ :not([hidden])",
+}
+
+# Variant prefix -> (selector template, media query), in cascade order
+VARIANTS: dict[str | None, tuple[str, str | None]] = {
+    None: ("{}", None),
+    "hover": ("{}:hover", None),
+    "focus": ("{}:focus", None),
+    "dark": (".dark {}", None),
+    "sm": ("{}", "(min-width:640px)"),
+    "lg": ("{}", "(min-width:1024px)"),
+}
+
+
+def css_escape(class_name: str) -> str:
+    return re.sub(r"([^\w-])", r"\\\1", class_name)
+
+
+def split_variant(class_name: str) -> tuple[str | None, str]:
+    variant, _, base = class_name.rpartition(":")
+    return variant or None, base
+
+
+def is_known(class_name: str) -> bool:
+    variant, base = split_variant(class_name)
+    return variant in VARIANTS and base in UTILITIES
+
+
+def utility_order(class_name: str) -> int:
+    return UTILITY_ORDER.get(split_variant(class_name)[1], len(UTILITY_ORDER))
+
+
+def collect_classes(html: str) -> set[str]:
+    classes: set[str] = set()
+    for value in CLASS_IN_TAG.findall(html):
+        classes.update(value.split())
+    for value in TOGGLED_CLASSES.findall(html):
+        classes.update(TOGGLED_KEY.findall(value))
+    return classes
+
+
+def make_stylesheet(
+    classes: set[str], short_names: dict[str, list[str]]
+) -> tuple[str, list[str]]:
+    # Returns the stylesheet and the classes it has no definition for.
+    rules: dict[str | None, list[str]] = {variant: [] for variant in VARIANTS}
+
+    def add_rules(selector: str, applied: list[str]) -> None:
+        declarations: dict[tuple[str | None, str], list[str]] = {}
+        for class_name in sorted(applied, key=utility_order):
+            variant, base = split_variant(class_name)
+            key = (variant, CHILD_SELECTORS.get(base, ""))
+            declarations.setdefault(key, []).append(UTILITIES[base])
+        for (variant, child), decls in declarations.items():
+            template = VARIANTS[variant][0]
+            rules[variant].append(
+                f"{template.format(selector)}{child}{{{';'.join(decls)}}}"
+            )
+
+    missing = set()
+    for name, applied in short_names.items():
+        known = [c for c in applied if is_known(c)]
+        missing.update(c for c in applied if not is_known(c) and c not in UNSTYLED)
+        add_rules(f".{css_escape(name)}", known)
+    for class_name in sorted(classes - short_names.keys(), key=utility_order):
+        if is_known(class_name):
+            add_rules(f".{css_escape(class_name)}", [class_name])
+        elif class_name not in UNSTYLED:
+            missing.add(class_name)
+
+    css = [PREFLIGHT]
+    for variant, (_, media) in VARIANTS.items():
+        if media is None:
+            css += rules[variant]
+        elif rules[variant]:
+            css.append(f"@media {media}{{{''.join(rules[variant])}}}")
+    return "".join(css), sorted(missing)
+
+
+def make_offline_html(html: str, alpine: str) -> tuple[str, list[str]]:
+    # Returns the page with the stylesheet and Alpine inlined, and the classes
+    # that could not be styled.
+    short_names: dict[str, list[str]] = {}
+    for block in TAILWIND_STYLE.findall(html):
+        for name, applied in APPLY_RULE.findall(block):
+            short_names[name] = applied.split()
+    html = TAILWIND_STYLE.sub("", html)
+    css, missing = make_stylesheet(collect_classes(html), short_names)
+    html = html.replace(TAILWIND_SCRIPT, f"<style>{css}</style>", 1)
+    html = TAILWIND_CONFIG.sub("", html, count=1)
+    # Inline scripts run immediately, so Alpine goes at the end of the body,
+    # after the store script has set up the data it binds to.
+    html = html.replace(ALPINE_SCRIPT, "", 1)
+    head, _, tail = html.rpartition("</body>")
+    return f"{head}<script>{alpine}</script></body>{tail}", missing
+
+
+def alpine_path(vendor_dir: Path = VENDOR_DIR) -> Path:
+    return vendor_dir / f"alpinejs-{ALPINE_VERSION}.min.js"
+
+
+def load_alpine(vendor_dir: Path = VENDOR_DIR) -> str:
+    # Raises OSError if the file is missing or is not the pinned one
+    data = alpine_path(vendor_dir).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest != ALPINE_SHA256:
+        raise OSError(f"checksum {digest} does not match {ALPINE_SHA256}")
+    return data.decode("utf-8")
@@ -0,0 +1,135 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import hashlib
+from pathlib import Path
+import posixpath
+import re
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+from src.render_html import quote_attr
+
+# Formats that are compressed already. Deflating them again costs time and
+# saves next to nothing, so they are stored as they are.
+COMPRESSED_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif"}
+
+# Every entry gets the same timestamp and permissions, and the entries are
+# written in a fixed order, so the same inputs always give the same archive.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_FILE_MODE = 0o644 << 16
+HTML_CHUNK_SIZE = 1 << 20
+
+IMG_SRC = re.compile(r"(<img [^<>]*?src=)(\"[^\"]*\"|'[^']*')")
+
+
+@dataclass
+class PackagedImage:
+    name: str
+    data: bytes
+    digest: str
+
+
+@dataclass
+class PackageResult:
+    html_size: int
+    image_count: int
+    # Image paths that were left out because another path has the same bytes
+    duplicates: dict[str, str]
+
+
+def make_zip_info(name: str, compress_type: int) -> ZipInfo:
+    info = ZipInfo(name, ZIP_DATE_TIME)
+    info.compress_type = compress_type
+    info.external_attr = ZIP_FILE_MODE
+    info.create_system = 3
+    return info
+
+
+def image_compress_type(name: str) -> int:
+    if posixpath.splitext(name)[1].lower() in COMPRESSED_SUFFIXES:
+        return ZIP_STORED
+    return ZIP_DEFLATED
+
+
+def read_image(
+    base_dir: Path, name: str, image_data: dict[str, bytes]
+) -> PackagedImage:
+    data = image_data.get(name)
+    if data is None:
+        data = (base_dir / name).read_bytes()
+    return PackagedImage(name, data, hashlib.sha256(data).hexdigest())
+
+
+def unique_image_names(images: list[str]) -> list[str]:
+    return list(dict.fromkeys(posixpath.normpath(img) for img in images))
+
+
+def rewrite_image_sources(html: str, renames: dict[str, str]) -> str:
+    if not renames:
+        return html
+    quoted = {quote_attr(old): quote_attr(new) for old, new in renames.items()}
+
+    def rewrite(match: re.Match) -> str:
+        value = match.group(2)
+        return match.group(1) + quoted.get(value, value)
+
+    return IMG_SRC.sub(rewrite, html)
+
+
+def read_images(
+    base_dir: Path,
+    images: list[str],
+    max_workers: int,
+    image_data: dict[str, bytes],
+) -> tuple[list[PackagedImage], dict[str, str]]:
+    # Images are read and hashed on a thread pool; hashlib and file reads
+    # release the GIL. An image whose bytes match one referenced earlier in
+    # the document is dropped, and the page points at the earlier one instead.
+    names = unique_image_names(images)
+    with ThreadPoolExecutor(max(1, max_workers)) as executor:
+        read = list(
+            executor.map(lambda name: read_image(base_dir, name, image_data), names)
+        )
+    kept: list[PackagedImage] = []
+    first_by_digest: dict[str, str] = {}
+    duplicates: dict[str, str] = {}
+    for image in read:
+        first = first_by_digest.setdefault(image.digest, image.name)
+        if first == image.name:
+            kept.append(image)
+        else:
+            duplicates[image.name] = first
+    kept.sort(key=lambda image: image.name)
+    return kept, duplicates
+
+
+def write_package(
+    outfile: Path,
+    html_name: str,
+    html: str,
+    base_dir: Path,
+    images: list[str],
+    max_workers: int = 4,
+    image_data: dict[str, bytes] | None = None,
+) -> PackageResult:
+    # image_data replaces the bytes of images, by normalized path, e.g. with
+    # their optimized versions.
+    kept, duplicates = read_images(base_dir, images, max_workers, image_data or {})
+    renames = {
+        img: duplicates[posixpath.normpath(img)]
+        for img in images
+        if posixpath.normpath(img) in duplicates
+    }
+    html = rewrite_image_sources(html, renames)
+    html_size = 0
+    with ZipFile(outfile, "w") as zfile:
+        # The page is encoded and deflated a chunk at a time, straight into
+        # the archive.
+        with zfile.open(make_zip_info(html_name, ZIP_DEFLATED), "w") as entry:
+            for start in range(0, len(html), HTML_CHUNK_SIZE):
+                chunk = html[start : start + HTML_CHUNK_SIZE].encode("utf-8")
+                html_size += len(chunk)
+                entry.write(chunk)
+        for image in kept:
+            info = make_zip_info(image.name, image_compress_type(image.name))
+            zfile.writestr(info, image.data)
+    return PackageResult(html_size, len(kept), duplicates)
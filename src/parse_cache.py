@@ -0,0 +1,117 @@
+import hashlib
+import os
+from pathlib import Path
+import pickle
+import time
+from typing import Any, Callable
+
+from src.parse_document import (
+    PARSER_VERSION,
+    WalkthroughDocument,
+    find_included_paths,
+    parse_file,
+)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Temporary files older than this were left by a store that crashed
+STALE_TMP_SECONDS = 60 * 60
+
+
+def default_cache_dir() -> Path:
+    if "WALKTHROUGH_CACHE_DIR" in os.environ:
+        return Path(os.environ["WALKTHROUGH_CACHE_DIR"])
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "walkthrough"
+
+
+class ParseCache:
+    # Parsed documents pickled to disk, keyed on the parser version and the
+    # bytes of the source file and every file it includes. When the folder
+    # grows past max_bytes, the least recently used entries are removed.
+    # The same folder also holds the renderer's section fragments.
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key_for(self, path: Path) -> str:
+        h = hashlib.sha256(PARSER_VERSION.encode("utf-8"))
+        h.update(path.read_bytes())
+        for included in find_included_paths(path):
+            h.update(b"\0" + str(included).encode("utf-8"))
+            if included.is_file():
+                h.update(b"\0" + included.read_bytes())
+        return h.hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pickle"
+
+    def load(self, key: str) -> Any:
+        entry = self.entry_path(key)
+        try:
+            data = entry.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            doc = pickle.loads(data)
+        except Exception:
+            entry.unlink(missing_ok=True)
+            return None
+        # Another process may have evicted the entry since it was read
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return doc
+
+    def store(self, key: str, doc: object) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = self.entry_path(key)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(tmp, entry)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+        stale = time.time() - STALE_TMP_SECONDS
+        for entry in os.scandir(self.cache_dir):
+            # Entries can disappear while this runs, when another process
+            # evicts them at the same time
+            try:
+                if entry.name.endswith(".pickle"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+                elif entry.name.endswith(".tmp") and entry.stat().st_mtime < stale:
+                    Path(entry.path).unlink(missing_ok=True)
+            except OSError:
+                pass
+        entries.sort()
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            Path(entry_path).unlink(missing_ok=True)
+            total -= size
+
+    def get_or_parse(
+        self,
+        path: Path,
+        parse: Callable[[Path], WalkthroughDocument] = parse_file,
+    ) -> WalkthroughDocument:
+        key = self.key_for(path)
+        doc = self.load(key)
+        if doc is None:
+            doc = parse(path)
+            self.store(key, doc)
+        return doc
+
+
+def load_document(
+    path: Path,
+    cache: ParseCache | None,
+    parse: Callable[[Path], WalkthroughDocument] = parse_file,
+) -> WalkthroughDocument:
+    if cache is None:
+        return parse(path)
+    return cache.get_or_parse(path, parse)
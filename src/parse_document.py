@@ -1,6 +1,19 @@
 from dataclasses import dataclass
 from enum import Enum
+import hashlib
+import io
+from os import PathLike
+from pathlib import Path
+import pickle
 import re
+import sys
+from typing import Iterable, Iterator, TextIO
+
+LINK_COMMAND = R"\link"
+
+# Bump whenever the parser or the node classes change, so cached parses made
+# by an older version are not reused.
+PARSER_VERSION = "3"
 
 
 class ParagraphChildType(Enum):
@@ -12,37 +25,51 @@ class ParagraphChildType(Enum):
     UNNUMBEREDLIST = 5
 
 
+# The node classes use __slots__ and keep their type tag on the class, since
+# large guides hold hundreds of thousands of them.
 class ParagraphChild:
-    part_type: ParagraphChildType
+    __slots__ = ()
+    part_type: ParagraphChildType = ParagraphChildType.NONE
 
 
 class TextParagraphChild(ParagraphChild):
+    __slots__ = ("s",)
+    part_type = ParagraphChildType.TEXT
+
     def __init__(self, s: str) -> None:
         self.s = s
-        self.part_type = ParagraphChildType.TEXT
 
     def __repr__(self) -> str:
         return f"Text ({self.s})"
 
 
 class ImageParagraphChild(ParagraphChild):
+    __slots__ = ("image_loc",)
+    part_type = ParagraphChildType.IMAGE
+
     def __init__(self, image_loc: str) -> None:
-        self.part_type = ParagraphChildType.IMAGE
         self.image_loc = image_loc
 
+    def __repr__(self) -> str:
+        return f"Image ({self.image_loc})"
+
 
 class UlParagraphChild(ParagraphChild):
+    __slots__ = ("items",)
+    part_type = ParagraphChildType.UNNUMBEREDLIST
+
     def __init__(self, items: list[str]) -> None:
-        self.part_type = ParagraphChildType.UNNUMBEREDLIST
         self.items = items
 
 
 class ChecklistParagraphChild(ParagraphChild):
+    __slots__ = ("content", "list_content", "tag_name", "item_id")
+    part_type = ParagraphChildType.CHECK_ITEM
+
     def __init__(self, content: str, list_content: str, tag_name: str, item_id) -> None:
         self.content = content
         self.list_content = list_content
-        self.tag_name = tag_name
-        self.part_type = ParagraphChildType.CHECK_ITEM
+        self.tag_name = sys.intern(tag_name)
         self.item_id = item_id
 
     def __repr__(self) -> str:
@@ -50,9 +77,14 @@ class ChecklistParagraphChild(ParagraphChild):
 
 
 class LinkParagraphChild(ParagraphChild):
+    __slots__ = ("url",)
+    part_type = ParagraphChildType.LINK
+
     def __init__(self, url: str) -> None:
         self.url = url
-        self.part_type = ParagraphChildType.LINK
+
+    def __repr__(self) -> str:
+        return f"Link ({self.url})"
 
 
 class DocumentItemType(Enum):
@@ -64,17 +96,18 @@ class DocumentItemType(Enum):
 
 
 class DocumentItem:
+    __slots__ = ()
     item_type: DocumentItemType
 
 
 class SectionHeading(DocumentItem):
+    __slots__ = ("title", "short_name")
+    item_type = DocumentItemType.SECTIONHEADING
 
     short_name: str | None
 
     def __init__(self, title: str, short_name: str | None) -> None:
         self.title = title
-        self.short_name = None
-        self.item_type = DocumentItemType.SECTIONHEADING
         self.short_name = short_name
 
     def __repr__(self) -> str:
@@ -82,10 +115,12 @@ class SectionHeading(DocumentItem):
 
 
 class Paragraph(DocumentItem):
+    __slots__ = ("items",)
+    item_type = DocumentItemType.PARAGRAPH
+
     items: list[ParagraphChild]
 
     def __init__(self) -> None:
-        self.item_type = DocumentItemType.PARAGRAPH
         self.items = []
 
     def __repr__(self) -> str:
@@ -93,33 +128,39 @@ class Paragraph(DocumentItem):
 
 
 class UnnumberedList(DocumentItem):
+    __slots__ = ("items",)
+    item_type = DocumentItemType.UNNUMBEREDLIST
+
     items: list[str]
 
     def __init__(self) -> None:
         self.items = []
-        self.item_type = DocumentItemType.UNNUMBEREDLIST
 
     def __repr__(self) -> str:
         return f"Unnumbered list: [{', '.join(self.items)}]"
 
 
 class NumberedList(DocumentItem):
+    __slots__ = ("items",)
+    item_type = DocumentItemType.NUMBEREDLIST
+
     items: list[str]
 
     def __init__(self) -> None:
         self.items = []
-        self.item_type = DocumentItemType.NUMBEREDLIST
 
     def __repr__(self) -> str:
         return f"Numbered list: [{', '.join(self.items)}]"
 
 
 class Spoiler(DocumentItem):
+    __slots__ = ("items",)
+    item_type = DocumentItemType.SPOILER
+
     items: list[ParagraphChild]
 
     def __init__(self) -> None:
         self.items = []
-        self.item_type = DocumentItemType.SPOILER
 
     def __repr__(self) -> str:
         return f"Spoiler: [{', '.join(str(i) for i in self.items)}]"
@@ -144,12 +185,31 @@ class WalkthroughDocument:
         self.checklist_sections = [ChecklistSection()]
         self.decl_map: dict[str, Declaration] = {}
         self.images: list[str] = []
+        self.diagnostics: list[Diagnostic] = []
         self.game_short_name = "untitled"
         self.default_spoiler_title: str = "Click to show solution"
 
     def start_new_checklist_section(self):
         self.checklist_sections.append(ChecklistSection())
 
+    def add_event(self, event: "DocumentEvent") -> None:
+        match event:
+            case DocumentSetting():
+                setattr(self, event.name, event.value)
+            case Declaration():
+                self.decl_map[event.name] = event
+            case ChecklistBoundary():
+                self.checklist_sections[-1].name = event.name
+                self.start_new_checklist_section()
+            case Diagnostic():
+                self.diagnostics.append(event)
+            case _:
+                if isinstance(event, Spoiler):
+                    for child in event.items:
+                        if isinstance(child, ImageParagraphChild):
+                            self.images.append(child.image_loc)
+                self.checklist_sections[-1].append_line_item(event)
+
 
 @dataclass
 class Declaration:
@@ -158,52 +218,122 @@ class Declaration:
     plural: str
 
 
-class WalkthroughParser:
+@dataclass
+class DocumentSetting:
+    name: str
+    value: str
+
 
-    lines: list[str]
+@dataclass
+class ChecklistBoundary:
+    name: str
 
-    def __init__(self, doc: str) -> None:
-        self.input_text = doc
+
+ERROR = "error"
+WARNING = "warning"
+
+
+@dataclass
+class Diagnostic:
+    line_no: int
+    message: str
+    severity: str = ERROR
+    source: str | None = None
+
+    def __str__(self) -> str:
+        where = f"line {self.line_no}"
+        if self.source is not None:
+            where += f" of {self.source}"
+        prefix = "Warning: " if self.severity == WARNING else ""
+        return f"{prefix}{self.message} on {where}"
+
+
+DocumentEvent = (
+    DocumentItem | Declaration | DocumentSetting | ChecklistBoundary | Diagnostic
+)
+
+
+class WalkthroughParser:
+    def __init__(
+        self,
+        doc: str | Iterable[str],
+        includes: "IncludeResolver | None" = None,
+        source: str | None = None,
+        image_dir: Path | None = None,
+    ) -> None:
+        if isinstance(doc, str):
+            doc = io.StringIO(doc)
+        self.lines = iter(doc)
+        self.includes = includes
+        self.source = source
+        # When set, \img references are checked against this folder
+        self.image_dir = image_dir
+        self.diagnostics: list[Diagnostic] = []
         self.line_no = 0
         self.checklist_counters: dict[str, int] = {}
         self.current_section_name = "No section"
-        self.images: list[str] = []
+        self.decl_map: dict[str, Declaration] = {}
+
+    def next_line(self) -> str | None:
+        line = next(self.lines, None)
+        if line is None:
+            return None
+        self.line_no += 1
+        return normalize_text(line.removesuffix("\n"))
+
+    def report(
+        self, message: str, severity: str = ERROR, line_no: int | None = None
+    ) -> None:
+        if line_no is None:
+            line_no = self.line_no
+        self.diagnostics.append(Diagnostic(line_no, message, severity, self.source))
 
     def parse(self) -> WalkthroughDocument:
-        doc = WalkthroughDocument()
-        self.lines = self.input_text.split("\n")
-        while self.line_no < len(self.lines):
-            line = self.lines[self.line_no]
-            self.line_no += 1
+        return collect_document(self.events())
+
+    def events(self) -> Iterator[DocumentEvent]:
+        # Diagnostics are emitted in the stream just before the event of the
+        # block that produced them.
+        for event in self.read_events():
+            yield from self.diagnostics
+            self.diagnostics.clear()
+            yield event
+        yield from self.diagnostics
+        self.diagnostics.clear()
+
+    def read_events(self) -> Iterator[DocumentEvent]:
+        while (line := self.next_line()) is not None:
             if line.strip() == "":  # skip blank lines
                 continue
             if line.startswith(R"\game_short_name"):
                 game_short_name = read_between_braces(line)
                 if game_short_name is None:
-                    print(f"Invalid game_short_name on line {self.line_no}")
+                    self.report("Invalid game_short_name")
                 else:
-                    doc.game_short_name = game_short_name
+                    yield DocumentSetting("game_short_name", game_short_name)
                 continue
             if line.startswith(R"\version"):
                 version = read_between_braces(line)
                 if version is None:
-                    print(f"Invalid version on line {self.line_no}")
+                    self.report("Invalid version")
                 else:
-                    doc.version = version
+                    yield DocumentSetting("version", version)
                 continue
             if line.startswith(R"\title"):
                 title = read_between_braces(line)
                 if title is None:
-                    print(f"Invalid title on line {self.line_no}")
+                    self.report("Invalid title")
                 else:
-                    doc.title = title
+                    yield DocumentSetting("title", title)
                 continue
             if line.startswith(R"\defaultspoilertitle"):
                 default_spoiler_title = read_between_braces(line)
                 if default_spoiler_title is None:
-                    print(f"Invalid default spoiler title on line {self.line_no}")
+                    self.report("Invalid default spoiler title")
                 else:
-                    doc.default_spoiler_title = default_spoiler_title
+                    yield DocumentSetting(
+                        "default_spoiler_title", default_spoiler_title
+                    )
                 continue
             if line.startswith(R"\section"):
                 section_title = read_between_braces(line)
@@ -212,113 +342,139 @@ class WalkthroughParser:
                 if foo[1] != "":
                     section_short_name = read_between_braces(foo[1] + "}")
                 if section_title is None:
-                    print(f"Invalid section on line {self.line_no}")
+                    self.report("Invalid section")
                 else:
-                    item = SectionHeading(section_title, section_short_name)
                     self.current_section_name = section_short_name or section_title
-                    doc.checklist_sections[-1].append_line_item(item)
+                    yield SectionHeading(section_title, section_short_name)
                 continue
             if line.startswith(R"\declare"):
                 decl = self.parse_declaration(line)
                 if decl is not None:
-                    doc.decl_map[decl.name] = decl
+                    self.decl_map[decl.name] = decl
+                    yield decl
                 continue
             if line.startswith(R"\checklist"):
-                doc.checklist_sections[-1].name = self.current_section_name
-                doc.start_new_checklist_section()
+                yield ChecklistBoundary(self.current_section_name)
+                continue
+            if line.startswith(R"\input"):
+                yield from self.read_input(line)
                 continue
             if line.startswith(R"\begin{ul}"):
                 ul = self.read_ul()
-                doc.checklist_sections[-1].append_line_item(ul)
+                if ul is not None:
+                    yield ul
                 continue
             if line.startswith(R"\begin{ol}"):
-                ul = self.read_ol()
-                doc.checklist_sections[-1].append_line_item(ul)
+                ol = self.read_ol()
+                if ol is not None:
+                    yield ol
                 continue
             if line.startswith(R"\begin{spoiler}"):
                 spoiler = self.read_spoiler()
                 if spoiler is not None:
-                    doc.checklist_sections[-1].append_line_item(spoiler)
+                    yield spoiler
                 continue
             # parse a normal line item
-            p = self.parse_line(line, doc.decl_map)
+            p = self.parse_line(line, self.decl_map)
             if p is not None:
-                doc.checklist_sections[-1].append_line_item(p)
-        doc.images = self.images
-        return doc
+                yield p
+
+    def read_input(self, line: str) -> Iterator[DocumentEvent]:
+        name = read_between_braces(line)
+        if name is None:
+            self.report("Invalid input")
+            return
+        if self.includes is None:
+            self.report(f"Cannot input {name} from an included file")
+            return
+        fragment = self.includes.load(name, self.decl_map)
+        if fragment is None:
+            self.report(f"Included file {name} does not exist")
+            return
+        # Splice the file in as if its lines were written here
+        fragment.relocate(self.checklist_counters)
+        for event in fragment.events:
+            match event:
+                case Declaration():
+                    self.decl_map[event.name] = event
+                case SectionHeading():
+                    self.current_section_name = event.short_name or event.title
+                case ChecklistBoundary():
+                    event = ChecklistBoundary(self.current_section_name)
+            yield event
+        for tag_name, count in fragment.counters.items():
+            self.checklist_counters[tag_name] = (
+                self.checklist_counters.get(tag_name, 0) + count
+            )
 
     def read_spoiler(self) -> Spoiler | None:
         item = Spoiler()
-        line = self.lines[self.line_no]
         started = self.line_no
-        while not line.startswith(R"\end{spoiler}"):
+        while (line := self.next_line()) is not None:
+            if line.startswith(R"\end{spoiler}"):
+                return item
             if line.startswith("\\begin{ul}"):
-                self.line_no += 1
                 ul = self.read_ul()
+                if ul is None:
+                    return None
                 item.items.append(UlParagraphChild(ul.items))
             elif R"\img" in line:
                 image_loc = read_between_braces(line)
                 if image_loc is None:
-                    print(f"On line {self.line_no}, could not parse img tag")
+                    self.report("Could not parse img tag")
                 else:
                     item.items.append(ImageParagraphChild(image_loc))
-                    self.images.append(image_loc)
+                    if (
+                        self.image_dir is not None
+                        and not (self.image_dir / image_loc).exists()
+                    ):
+                        self.report(f"Referenced image {image_loc} does not exist")
             elif line.strip() != "":
                 item.items.append(TextParagraphChild(line))
-            self.line_no += 1
-            if self.line_no == len(self.lines):
-                print(
-                    f"Error: Spoiler started on line {started} has no terminating \\end{{spoiler}}"
-                )
-                return None
-            line = self.lines[self.line_no]
-        self.line_no += 1  # skip past the ending tag
-        return item
+        self.report(R"Spoiler has no terminating \end{spoiler}", line_no=started)
+        return None
 
-    def read_ul(self) -> UnnumberedList:
+    def read_ul(self) -> UnnumberedList | None:
+        items = self.read_list_items("ul")
+        if items is None:
+            return None
         item = UnnumberedList()
-        line = self.lines[self.line_no]
-        while not line.startswith(R"\end{ul}"):
-            if line.strip() == "":
-                self.line_no += 1
-                line = self.lines[self.line_no]
-                continue
-            if not line.strip().startswith(R"\item"):
-                print(f"Warning: on line {self.line_no}, while parsing ul, no item")
-            else:
-                item.items.append(line.split(R"\item")[1])
-            self.line_no += 1
-            line = self.lines[self.line_no]
-        self.line_no += 1  # skip past the ending tag
+        item.items = items
         return item
 
-    def read_ol(self) -> NumberedList:
+    def read_ol(self) -> NumberedList | None:
+        items = self.read_list_items("ol")
+        if items is None:
+            return None
         item = NumberedList()
-        line = self.lines[self.line_no]
-        while not line.startswith(R"\end{ol}"):
+        item.items = items
+        return item
+
+    def read_list_items(self, list_name: str) -> list[str] | None:
+        items: list[str] = []
+        started = self.line_no
+        while (line := self.next_line()) is not None:
+            if line.startswith(f"\\end{{{list_name}}}"):
+                return items
             if line.strip() == "":
-                self.line_no += 1
-                line = self.lines[self.line_no]
                 continue
             if not line.strip().startswith(R"\item"):
-                print(f"Warning: on line {self.line_no}, while parsing ol, no item")
+                self.report(f"No item while parsing {list_name}", WARNING)
             else:
-                item.items.append(line.split(R"\item")[1])
-            self.line_no += 1
-            line = self.lines[self.line_no]
-        self.line_no += 1  # skip past the ending tag
-        return item
+                items.append(line.split(R"\item")[1])
+        self.report(f"List has no terminating \\end{{{list_name}}}", line_no=started)
+        return None
 
     def parse_declaration(self, line: str) -> Declaration | None:
         parts = []
         remainder = line
         for _ in range(3):
             if "{" not in remainder:
-                print(f"Malformed declaration on line {self.line_no}")
+                self.report("Malformed declaration")
                 return None
             _, remainder = remainder.split("{", 1)
             if "}" not in remainder:
-                print(f"Malformed declaration on line {self.line_no}")
+                self.report("Malformed declaration")
                 return None
             name, remainder = remainder.split("}", 1)
             parts.append(name)
@@ -328,45 +484,40 @@ class WalkthroughParser:
         self, line: str, decl_map: dict[str, Declaration]
     ) -> Paragraph | None:
         ret = Paragraph()
-        line = line.strip()
-        remainder = line
-
-        while next_token := get_next_token(remainder):
-            if next_token == "[":
-                part, remainder = remainder.split("[", maxsplit=1)
-                ret.items.append(TextParagraphChild(part.strip()))
-                if "]" not in remainder:
-                    print(f"Unclosed checklist item on line {self.line_no}")
-                    return None
-                part, remainder = remainder.split("]", maxsplit=1)
-                lp = self.parse_checklist_item(part)
-                if lp is None:
-                    return None
-                if lp.tag_name not in decl_map:
-                    print(f"Unknown tag type {lp.tag_name} on line {self.line_no}")
-                    return None
-                if remainder.startswith("."):
-                    lp.content += "."
-                    remainder = remainder[1:]
-                ret.items.append(lp)
-            else:
-                part, remainder = remainder.split(R"\link", maxsplit=1)
-                ret.items.append(TextParagraphChild(part.strip()))
-                url = read_between_braces(remainder)
-                if url is None:
-                    print(f"Could not parse link on line {self.line_no}")
-                    break
-                else:
-                    _, remainder = remainder.split("}", maxsplit=1)
-                    ret.items.append(LinkParagraphChild(url))
-        remainder = remainder.strip()
-        if remainder != "":
-            ret.items.append(TextParagraphChild(remainder.strip()))
-        return ret
-
-    def parse_checklist_item(self, s: str) -> ChecklistParagraphChild | None:
+        # After the first error the paragraph is dropped, but the rest of the
+        # line is still checked so every problem gets reported at once.
+        failed = False
+        for token in InlineLexer(line.strip()):
+            match token.token_type:
+                case InlineTokenType.TEXT:
+                    ret.items.append(TextParagraphChild(token.value))
+                case InlineTokenType.CHECK_ITEM if failed:
+                    parts = self.split_checklist_item(token.value)
+                    if parts is not None and parts[0] not in decl_map:
+                        self.report(f"Unknown tag type {parts[0]}")
+                case InlineTokenType.CHECK_ITEM:
+                    lp = self.parse_checklist_item(token.value)
+                    if lp is None:
+                        failed = True
+                    elif lp.tag_name not in decl_map:
+                        self.report(f"Unknown tag type {lp.tag_name}")
+                        failed = True
+                    else:
+                        if token.trailing_period:
+                            lp.content += "."
+                        ret.items.append(lp)
+                case InlineTokenType.LINK:
+                    ret.items.append(LinkParagraphChild(token.value))
+                case InlineTokenType.UNCLOSED_CHECK_ITEM:
+                    self.report("Unclosed checklist item")
+                    failed = True
+                case InlineTokenType.INVALID_LINK:
+                    self.report("Could not parse link")
+        return None if failed else ret
+
+    def split_checklist_item(self, s: str) -> tuple[str, str, str] | None:
         if "|" not in s:
-            print(f"Invalid collectible {s} on line {self.line_no}")
+            self.report(f"Invalid collectible {s}")
             return None
         tag_name, content = s.split("|", 1)
         tag_name = tag_name.strip()
@@ -376,22 +527,105 @@ class WalkthroughParser:
             content, list_content = content.split("|", 1)
         else:
             list_content = content
+        return tag_name, content, list_content
+
+    def parse_checklist_item(self, s: str) -> ChecklistParagraphChild | None:
+        parts = self.split_checklist_item(s)
+        if parts is None:
+            return None
+        tag_name, content, list_content = parts
         count = self.checklist_counters.setdefault(tag_name, 0) + 1
         this_id = f"{tag_name}{count}"
         self.checklist_counters[tag_name] += 1
         return ChecklistParagraphChild(content, list_content, tag_name, this_id)
 
 
-def get_next_token(s: str) -> str | None:
-    if "[" in s:
-        bracket_loc = s.index("[")
-        if R"\link" in s:
-            link_loc = s.index(R"\link")
-            return "[" if bracket_loc < link_loc else R"\link"
-        return "["
-    if R"\link" in s:
-        return R"\link"
-    return None
+class InlineTokenType(Enum):
+    TEXT = 1
+    CHECK_ITEM = 2
+    LINK = 3
+    UNCLOSED_CHECK_ITEM = 4
+    INVALID_LINK = 5
+
+
+@dataclass
+class InlineToken:
+    token_type: InlineTokenType
+    value: str
+    trailing_period: bool = False
+
+
+# Splits a paragraph line into tokens in a single forward pass. The location
+# of the next occurrence of each delimiter is remembered, so the cost stays
+# linear in the line length no matter how many items the line holds.
+class InlineLexer:
+
+    def __init__(self, line: str) -> None:
+        self.line = line
+        self.pos = 0
+        self._found: dict[str, tuple[int, int]] = {}
+
+    def find(self, s: str, start: int | None = None) -> int:
+        if start is None:
+            start = self.pos
+        if s in self._found:
+            searched_from, loc = self._found[s]
+            if searched_from <= start and (loc == -1 or loc >= start):
+                return loc
+        loc = self.line.find(s, start)
+        self._found[s] = (start, loc)
+        return loc
+
+    def find_braced(self) -> tuple[int, int] | None:
+        # Same match as read_between_braces: the first "{" that has a "}" at
+        # least one character after it.
+        open_loc = self.find("{")
+        if open_loc == -1:
+            return None
+        close_loc = self.find("}", open_loc + 2)
+        if close_loc == -1:
+            return None
+        return open_loc, close_loc
+
+    def __iter__(self) -> Iterator[InlineToken]:
+        line = self.line
+        while True:
+            bracket_loc = self.find("[")
+            link_loc = self.find(LINK_COMMAND)
+            if bracket_loc == -1 and link_loc == -1:
+                break
+            if bracket_loc != -1 and (link_loc == -1 or bracket_loc < link_loc):
+                yield InlineToken(
+                    InlineTokenType.TEXT, line[self.pos : bracket_loc].strip()
+                )
+                self.pos = bracket_loc + 1
+                close_loc = self.find("]")
+                if close_loc == -1:
+                    yield InlineToken(
+                        InlineTokenType.UNCLOSED_CHECK_ITEM, line[self.pos :]
+                    )
+                    return
+                content = line[self.pos : close_loc]
+                self.pos = close_loc + 1
+                trailing_period = line.startswith(".", self.pos)
+                if trailing_period:
+                    self.pos += 1
+                yield InlineToken(InlineTokenType.CHECK_ITEM, content, trailing_period)
+            else:
+                yield InlineToken(
+                    InlineTokenType.TEXT, line[self.pos : link_loc].strip()
+                )
+                self.pos = link_loc + len(LINK_COMMAND)
+                braced = self.find_braced()
+                if braced is None:
+                    yield InlineToken(InlineTokenType.INVALID_LINK, line[self.pos :])
+                    break
+                open_loc, close_loc = braced
+                yield InlineToken(InlineTokenType.LINK, line[open_loc + 1 : close_loc])
+                self.pos = self.find("}") + 1
+        remainder = line[self.pos :].strip()
+        if remainder != "":
+            yield InlineToken(InlineTokenType.TEXT, remainder)
 
 
 def read_between_braces(line: str) -> str | None:
@@ -420,15 +654,229 @@ def normalize_text(text: str) -> str:
     return text
 
 
-def parse_document(input_text: str) -> WalkthroughDocument:
-    p = WalkthroughParser(normalize_text(input_text))
-    doc = p.parse()
-    # print(doc.version)
-    # print(doc.title)
-    # i = 0
-    # for check_sec in doc.checklist_sections:
-    #     i += 1
-    #     print(f"---checklist section {i}---")
-    #     for x in check_sec.items:
-    #         print(x)
+class ParsedFragment:
+    # Events parsed from part of a document with checklist counters starting
+    # at zero, so the fragment can be spliced in anywhere by shifting its ids
+    # and the line numbers of its own diagnostics.
+    def __init__(
+        self,
+        events: list[DocumentEvent],
+        counters: dict[str, int],
+        section_name: str,
+        first_line_no: int = 0,
+    ) -> None:
+        self.events = events
+        self.counters = counters
+        self.section_name = section_name
+        self.first_line_no = first_line_no
+        self.offsets: dict[str, int] = {}
+        self.checklist_items: list[tuple[ChecklistParagraphChild, int]] = []
+        # Diagnostics from included files count lines in those files
+        self.diagnostics: list[Diagnostic] = []
+        for event in events:
+            if isinstance(event, Diagnostic) and event.source is None:
+                self.diagnostics.append(event)
+            elif isinstance(event, Paragraph):
+                for child in event.items:
+                    if isinstance(child, ChecklistParagraphChild):
+                        number = int(child.item_id[len(child.tag_name) :])
+                        self.checklist_items.append((child, number))
+
+    def relocate(
+        self, offsets: dict[str, int], first_line_no: int | None = None
+    ) -> None:
+        if first_line_no is not None and first_line_no != self.first_line_no:
+            for diagnostic in self.diagnostics:
+                diagnostic.line_no += first_line_no - self.first_line_no
+            self.first_line_no = first_line_no
+        if offsets == self.offsets:
+            return
+        for child, number in self.checklist_items:
+            child.item_id = f"{child.tag_name}{offsets.get(child.tag_name, 0) + number}"
+        self.offsets = dict(offsets)
+
+
+def parse_fragment(
+    lines: str | Iterable[str],
+    decl_map: dict[str, Declaration],
+    current_section_name: str = "No section",
+    first_line_no: int = 0,
+    includes: "IncludeResolver | None" = None,
+    source: str | None = None,
+    image_dir: Path | None = None,
+) -> ParsedFragment:
+    parser = WalkthroughParser(lines, includes, source, image_dir)
+    parser.decl_map = dict(decl_map)
+    parser.current_section_name = current_section_name
+    parser.line_no = first_line_no
+    events = list(parser.events())
+    return ParsedFragment(
+        events, parser.checklist_counters, parser.current_section_name, first_line_no
+    )
+
+
+IncludeKey = tuple[str, tuple[str, ...]]
+
+
+def read_include(path: Path) -> tuple[str, str]:
+    text = path.read_text(encoding="utf-8")
+    return text, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def parse_include(
+    path: Path, decl_map: dict[str, Declaration], name: str, image_dir: Path | None
+) -> tuple[IncludeKey, bytes]:
+    text, digest = read_include(path)
+    fragment = parse_fragment(text, decl_map, source=name, image_dir=image_dir)
+    return (digest, tuple(sorted(decl_map))), pickle.dumps(fragment)
+
+
+class IncludeResolver:
+    # Parses files pulled in with \input. Each file is parsed on its own and
+    # the result is cached under its content hash and the tags declared before
+    # it, the only outside state that affects parsing it. Results are stored
+    # pickled so every splice gets fresh nodes whose ids can be shifted.
+    def __init__(
+        self,
+        base_dir: Path,
+        max_workers: int | None = None,
+        image_dir: Path | None = None,
+    ) -> None:
+        self.base_dir = base_dir
+        self.max_workers = max_workers
+        self.image_dir = image_dir
+        self.fragments: dict[IncludeKey, bytes] = {}
+        self.used: set[IncludeKey] = set()
+        self.paths: set[Path] = set()
+        self.parsed_count = 0
+
+    def load(
+        self, name: str, decl_map: dict[str, Declaration]
+    ) -> ParsedFragment | None:
+        path = self.base_dir / name
+        if not path.is_file():
+            return None
+        text, digest = read_include(path)
+        key = (digest, tuple(sorted(decl_map)))
+        data = self.fragments.get(key)
+        if data is None:
+            fragment = parse_fragment(
+                text, decl_map, source=name, image_dir=self.image_dir
+            )
+            data = pickle.dumps(fragment)
+            self.fragments[key] = data
+            self.parsed_count += 1
+        self.used.add(key)
+        self.paths.add(path.resolve())
+        return pickle.loads(data)
+
+    def digests(self, lines: Iterable[str]) -> tuple[str, ...]:
+        digests = []
+        for line in lines:
+            if line.startswith(R"\input"):
+                name = read_between_braces(line)
+                path = self.base_dir / name if name is not None else None
+                if path is not None and path.is_file():
+                    digests.append(read_include(path)[1])
+        return tuple(digests)
+
+    def prefetch(self, lines: Iterable[str]) -> None:
+        # Parses every uncached included file up front in a process pool.
+        # Each file is parsed assuming the tags declared before its \input
+        # line; if that guess turns out wrong, load() simply misses the cache
+        # and parses it again with the right declarations.
+        self.used = set()
+        self.paths = set()
+        decl_map: dict[str, Declaration] = {}
+        jobs: list[tuple[Path, dict[str, Declaration], str, Path | None]] = []
+        for line in lines:
+            if line.startswith(R"\declare"):
+                name = read_between_braces(line)
+                if name is not None:
+                    decl_map[name] = Declaration(name, name, name)
+            elif line.startswith(R"\input"):
+                name = read_between_braces(line)
+                if name is None or not (self.base_dir / name).is_file():
+                    continue
+                path = self.base_dir / name
+                self.paths.add(path.resolve())
+                text, digest = read_include(path)
+                key = (digest, tuple(sorted(decl_map)))
+                self.used.add(key)
+                if key not in self.fragments:
+                    jobs.append((path, dict(decl_map), name, self.image_dir))
+                for included_line in text.split("\n"):
+                    if included_line.startswith(R"\declare"):
+                        name = read_between_braces(included_line)
+                        if name is not None:
+                            decl_map[name] = Declaration(name, name, name)
+        if len(jobs) < 2:
+            return
+        # Imported here, since most files have no includes to parse in
+        # parallel and multiprocessing is slow to import
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(self.max_workers) as executor:
+            futures = [executor.submit(parse_include, *job) for job in jobs]
+            for future in futures:
+                key, data = future.result()
+                self.fragments[key] = data
+                self.parsed_count += 1
+
+    def prune(self) -> None:
+        self.fragments = {k: v for k, v in self.fragments.items() if k in self.used}
+
+
+def find_included_paths(path: Path) -> list[Path]:
+    included = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(R"\input"):
+                name = read_between_braces(line)
+                if name is not None:
+                    included.append(path.parent / name)
+    return included
+
+
+def collect_document(events: Iterable[DocumentEvent]) -> WalkthroughDocument:
+    doc = WalkthroughDocument()
+    for event in events:
+        doc.add_event(event)
+    return doc
+
+
+def iter_document(
+    source: str | PathLike[str] | TextIO, includes: IncludeResolver | None = None
+) -> Iterator[DocumentEvent]:
+    if isinstance(source, (str, PathLike)):
+        if includes is None:
+            includes = IncludeResolver(Path(source).parent)
+        with open(source, encoding="utf-8") as f:
+            parser = WalkthroughParser(f, includes, image_dir=includes.image_dir)
+            yield from parser.events()
+    else:
+        if includes is None:
+            includes = IncludeResolver(Path.cwd())
+        parser = WalkthroughParser(source, includes, image_dir=includes.image_dir)
+        yield from parser.events()
+
+
+def parse_file(
+    path: str | PathLike[str], includes: IncludeResolver | None = None
+) -> WalkthroughDocument:
+    if includes is None:
+        includes = IncludeResolver(Path(path).parent)
+    with open(path, encoding="utf-8") as f:
+        includes.prefetch(f)
+    doc = collect_document(iter_document(path, includes))
+    includes.prune()
     return doc
+
+
+def parse_document(
+    input_text: str, base_dir: str | PathLike[str] | None = None
+) -> WalkthroughDocument:
+    includes = IncludeResolver(Path(base_dir) if base_dir is not None else Path.cwd())
+    if R"\input" in input_text:
+        includes.prefetch(io.StringIO(input_text))
+    return collect_document(WalkthroughParser(input_text, includes).events())
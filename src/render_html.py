@@ -0,0 +1,750 @@
+from collections import Counter
+from dataclasses import dataclass, field
+import hashlib
+import json
+import re
+
+from src.parse_document import (
+    ChecklistParagraphChild,
+    ChecklistSection,
+    ImageParagraphChild,
+    Paragraph,
+    SectionHeading,
+    Spoiler,
+    TextParagraphChild,
+    UlParagraphChild,
+    UnnumberedList,
+    WalkthroughDocument,
+    LinkParagraphChild,
+    NumberedList,
+)
+
+# Renders a document by writing escaped HTML straight into a list of strings.
+# The output matches what compose_html builds through the bs4 object model
+# byte for byte, so the markup below follows bs4's serialization: attributes
+# in alphabetical order, void tags closed with "/>", and the static snippets
+# exactly as bs4 prints them after parsing.
+
+
+@dataclass
+class ChecklistItem:
+    content: str
+    item_id: str
+
+
+# Bump when the markup of a rendered section changes, so cached fragments
+# from an older version are not reused.
+RENDERER_VERSION = "4"
+
+
+# Everything a checklist section contributes to the page. Sections are
+# rendered independently of each other and stitched together afterwards.
+# Section anchors are numbered across the whole document, so the numbers are
+# left out of the markup: heading i's number goes between html_parts[i] and
+# html_parts[i + 1]. That way a fragment can be reused wherever it ends up.
+@dataclass
+class RenderedSection:
+    name: str
+    html_parts: list[str] = field(default_factory=list)
+    headings: list[tuple[str, str]] = field(default_factory=list)
+    item_ids: list[str] = field(default_factory=list)
+    item_labels: list[tuple[str, str]] = field(default_factory=list)
+    checklist_items: dict[str, list[ChecklistItem]] = field(default_factory=dict)
+
+    def html(self, section_count: int) -> str:
+        if len(self.html_parts) == 1:
+            return self.html_parts[0]
+        out = [self.html_parts[0]]
+        for number, part in enumerate(self.html_parts[1:], section_count + 1):
+            out.append(str(number))
+            out.append(part)
+        return "".join(out)
+
+    def toc_entries(self, section_count: int) -> list[tuple[str, str]]:
+        return [
+            (f"section{number}_{nice_name}", title)
+            for number, (nice_name, title) in enumerate(
+                self.headings, section_count + 1
+            )
+        ]
+
+
+def generate_safe_html_tag_name(string: str) -> str:
+    tag_name = string.replace(" ", "_")
+    tag_name = re.sub(r"[^a-zA-Z0-9_]", "", tag_name.lower())
+    return tag_name
+
+
+def escape_text(s: str) -> str:
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def quote_attr(s: str) -> str:
+    s = escape_text(s)
+    if '"' in s:
+        if "'" in s:
+            return '"' + s.replace('"', "&quot;") + '"'
+        return "'" + s + "'"
+    return '"' + s + '"'
+
+
+DARK_MODE_CONTROLS = """
+<div class="flex items-center">
+<button :class="{ 'bg-indigo-600': darkMode, 'bg-gray-200': !darkMode }" @click="darkMode = !darkMode" aria-checked="false" aria-labelledby="annual-billing-label" class="relative inline-flex h-6 w-11 flex-shrink-0 cursor-pointer rounded-full border-2 border-transparent transition-colors duration-200 ease-in-out focus:outline-none focus:ring-2 focus:ring-indigo-600 focus:ring-offset-2" role="switch" type="button">
+<span :class="{ 'translate-x-5' : darkMode, 'translate-x-0': !darkMode }" aria-hidden="true" class="pointer-events-none inline-block h-5 w-5 transform rounded-full bg-white shadow ring-0 transition duration-200 ease-in-out"></span>
+</button>
+<span class="ml-3 text-sm">
+<span class="font-medium">Dark Mode</span>
+</span>
+</div>
+"""
+
+COLLAPSIBLE_ICONS = """
+<span class="flex items-center">
+<svg aria-hidden="true" class="h-6 w-6" fill="none" stroke="currentColor" stroke-width="1.5" viewbox="0 0 24 24" x-bind:class="{ 'hidden': open }">
+<path d="M12 6v12m6-6H6" stroke-linecap="round" stroke-linejoin="round"></path>
+</svg>
+<svg aria-hidden="true" class="hidden h-6 w-6" fill="none" stroke="currentColor" stroke-width="1.5" viewbox="0 0 24 24" x-bind:class="{ 'hidden': !open }">
+<path d="M18 12H6" stroke-linecap="round" stroke-linejoin="round"></path>
+</svg>
+</span>
+"""
+
+HTML_OPEN = (
+    "<html x-bind:class=\"{ 'dark': darkMode }\" "
+    "x-data=\"{ darkMode: localStorage.getItem('dark') === 'true'}\" "
+    "x-init=\"$watch('darkMode', val => localStorage.setItem('dark', val))\">"
+)
+
+HEAD_SCRIPTS = (
+    '<script src="https://cdn.tailwindcss.com"></script>'
+    '<script defer="defer" src="https://unpkg.com/alpinejs"></script>'
+)
+
+BODY_OPEN = (
+    '<body class="bg-gray-100 dark:bg-gray-600">'
+    '<div class="mx-auto max-w-7xl px-6 lg:px-8 dark:text-white" '
+    'id="main_container" x-data="checklistItems">'
+)
+
+
+# A checklist item's storage key is a hash of its tag, its text, and the
+# number of items with the same tag and text before it. The item ids count
+# the items of a tag in document order, so they point at other items once an
+# item is inserted or removed; the keys stay with their items.
+def make_item_keys(item_labels: list[tuple[str, str]]) -> list[str]:
+    seen: Counter[tuple[str, str]] = Counter()
+    keys = []
+    for tag_name, content in item_labels:
+        occurrence = seen[(tag_name, content)]
+        seen[(tag_name, content)] += 1
+        key = f"{tag_name}\0{content}\0{occurrence}".encode("utf-8")
+        keys.append(hashlib.sha256(key).hexdigest()[:12])
+    return keys
+
+
+# Checked statuses are stored as a base64 bitset in which bit i belongs to
+# itemIds[i]. The item keys the bitset was written for are stored next to
+# it, so when the items change (usually with a new \version), the bits of
+# the items that survive are carried over to their new positions.
+def make_store_script_text(
+    doc: WalkthroughDocument,
+    item_ids: list[str],
+    item_labels: list[tuple[str, str]],
+    counter_groups: dict[str, dict[str, list[str]]],
+) -> str:
+    store_script_text = """tailwind.config = {
+        darkMode: "class"
+      };\n"""
+    store_script_text += f'const currentVersion = "{doc.version}";'
+    store_script_text += f"\n    const itemIds = {json.dumps(item_ids)};"
+    store_script_text += (
+        f"\n    const itemKeys = {json.dumps(make_item_keys(item_labels))};"
+    )
+    store_script_text += """
+    const storedVersion = localStorage.getItem("game_short_name_checked_storage_version");
+    console.log("stored version:", storedVersion);
+    const checklistItems = {};
+    const itemIndexes = {};
+    itemIds.forEach((id, index) => {
+    checklistItems[id] = false;
+    itemIndexes[id] = index;
+    });
+    const checkedBits = new Uint8Array((itemIds.length + 7) >> 3);
+    const currentKeys = itemKeys.join(" ");
+
+    function setChecked(id, checked) {
+    const index = itemIndexes[id];
+    checklistItems[id] = checked;
+    if (checked) {
+    checkedBits[index >> 3] |= 1 << (index & 7);
+    }
+    else {
+    checkedBits[index >> 3] &= ~(1 << (index & 7));
+    }
+    }
+
+    function saveStatuses() {
+    let binary = "";
+    for (const byte of checkedBits) {
+    binary += String.fromCharCode(byte);
+    }
+    localStorage.setItem('game_short_name_checked_bits', btoa(binary));
+    }
+
+    function loadBits(storedBits, storedItems, indexes) {
+    const binary = atob(storedBits);
+    storedItems.split(" ").forEach((item, index) => {
+    if (item in indexes && binary.charCodeAt(index >> 3) & (1 << (index & 7))) {
+    setChecked(itemIds[indexes[item]], true);
+    }
+    });
+    }
+
+    let storedKeys = localStorage.getItem('game_short_name_checked_keys');
+    const storedIds = localStorage.getItem('game_short_name_checked_ids');
+    const storedBits = localStorage.getItem('game_short_name_checked_bits');
+    const legacyStatuses = localStorage.getItem('game_short_name_checked_statuses');
+    const sameVersion = storedVersion === currentVersion;
+    try {
+    if (storedBits !== null && storedKeys !== null) {
+    const keyIndexes = {};
+    itemKeys.forEach((key, index) => {
+    keyIndexes[key] = index;
+    });
+    loadBits(storedBits, storedKeys, keyIndexes);
+    console.log("Loaded from storage.")
+    }
+    // Older pages stored ids or a JSON object, which only match the items of
+    // the same version
+    else if (storedBits !== null && storedIds !== null && sameVersion) {
+    loadBits(storedBits, storedIds, itemIndexes);
+    console.log("Converted stored statuses.")
+    }
+    else if (legacyStatuses !== null && sameVersion) {
+    for (const [id, checked] of Object.entries(JSON.parse(legacyStatuses))) {
+    if (checked && id in itemIndexes) {
+    setChecked(id, true);
+    }
+    }
+    console.log("Converted stored statuses.")
+    }
+    }
+    catch (error) {
+    console.log("Could not read stored statuses:", error);
+    storedKeys = null;
+    }
+    if (!sameVersion) {
+    localStorage.setItem('game_short_name_checked_storage_version', currentVersion);
+    }
+    if (storedKeys !== currentKeys || storedBits === null) {
+    localStorage.removeItem('game_short_name_checked_statuses');
+    localStorage.removeItem('game_short_name_checked_ids');
+    localStorage.setItem('game_short_name_checked_keys', currentKeys);
+    saveStatuses();
+    console.log("Initialized storage");
+    }
+""".replace("game_short_name", doc.game_short_name)
+    store_script_text += f"    const counterGroups = {json.dumps(counter_groups)};"
+    store_script_text += """
+    const itemCounters = {};
+    const counters = { sections: {}, types: {} };
+    for (const [type, groups] of Object.entries(counterGroups)) {
+    counters.types[type] = 0;
+    for (const [key, ids] of Object.entries(groups)) {
+    counters.sections[key] = 0;
+    for (const id of ids) {
+    itemCounters[id] = [type, key];
+    if (checklistItems[id]) {
+    counters.sections[key]++;
+    counters.types[type]++;
+    }
+    }
+    }
+    }
+    document.addEventListener('alpine:init', () => {
+    Alpine.store('counters', counters);
+    });
+
+    function storeStatuses(el, id) {
+    id = id || (el && el.getAttribute('x-model'));
+    if (id in itemCounters) {
+    const [type, key] = itemCounters[id];
+    const delta = checklistItems[id] ? 1 : -1;
+    const store = Alpine.store('counters');
+    store.sections[key] += delta;
+    store.types[type] += delta;
+    }
+    if (id in itemIndexes) {
+    setChecked(id, checklistItems[id]);
+    }
+    saveStatuses();
+    }""".replace("game_short_name", doc.game_short_name)
+    return store_script_text
+
+
+# Checked counts are kept in an Alpine store that the store script updates
+# when a checkbox changes. Each end-of-section and by-section header counts
+# one group, keyed on the group's first item id, and each rollup header
+# counts every item of its type.
+def make_counter_groups(
+    all_checklist_items: list[tuple[str, dict[str, list[ChecklistItem]]]],
+) -> dict[str, dict[str, list[str]]]:
+    counter_groups: dict[str, dict[str, list[str]]] = {}
+    for _, section_checklist_items in all_checklist_items:
+        for item_type, items in section_checklist_items.items():
+            counter_groups.setdefault(item_type, {})[items[0].item_id] = [
+                ci.item_id for ci in items
+            ]
+    return counter_groups
+
+
+# In lazy rollup mode the lists under "All collectibles by section" and "All
+# collectibles by type" are left out of the page, apart from their headers.
+# Alpine builds a list from a JSON index of each item's section and label the
+# first time the reader opens it. The item ids of a list come from the
+# counter groups.
+def make_rollup_script_text(
+    all_checklist_items: list[tuple[str, dict[str, list[ChecklistItem]]]],
+) -> str:
+    rollup_sections = []
+    rollup_labels = {}
+    for section_index, (name, section_checklist_items) in enumerate(
+        all_checklist_items
+    ):
+        rollup_sections.append(name)
+        for items in section_checklist_items.values():
+            for ci in items:
+                rollup_labels[ci.item_id] = [section_index, ci.content]
+    # "<" is escaped so no label can close the script element
+    sections_json = json.dumps(rollup_sections, ensure_ascii=False)
+    sections_json = sections_json.replace("<", "\\u003c")
+    labels_json = json.dumps(rollup_labels, ensure_ascii=False)
+    labels_json = labels_json.replace("<", "\\u003c")
+    rollup_script_text = f"const rollupSections = {sections_json};"
+    rollup_script_text += f"\n    const rollupLabels = {labels_json};"
+    rollup_script_text += """
+    const rollupLists = { sections: {}, types: {} };
+    function rollupItem(id, prefixed) {
+    const [section, label] = rollupLabels[id];
+    return { id: id, label: prefixed ? rollupSections[section] + ": " + label : label };
+    }
+    function rollupSectionList(key) {
+    if (!(key in rollupLists.sections)) {
+    const ids = counterGroups[itemCounters[key][0]][key];
+    rollupLists.sections[key] = ids.map(id => rollupItem(id, false));
+    }
+    return rollupLists.sections[key];
+    }
+    function rollupTypeList(type) {
+    if (!(type in rollupLists.types)) {
+    const ids = Object.values(counterGroups[type]).flat();
+    rollupLists.types[type] = ids.map(id => rollupItem(id, true));
+    }
+    return rollupLists.types[type];
+    }"""
+    return rollup_script_text
+
+
+def section_counter(items: list[ChecklistItem]) -> str:
+    return f"$store.counters.sections['{items[0].item_id}']"
+
+
+def type_counter(item_type: str) -> str:
+    return f"$store.counters.types['{item_type}']"
+
+
+def render_html_from_doc(
+    doc: WalkthroughDocument, max_workers: int = 1, lazy_rollups: bool = False
+) -> str:
+    sections = render_sections(doc, doc.checklist_sections, max_workers)
+    return assemble_html(doc, sections, lazy_rollups)
+
+
+def render_sections(
+    doc: WalkthroughDocument, sections: list[ChecklistSection], max_workers: int = 1
+) -> list[RenderedSection]:
+    if max_workers <= 1 or len(sections) < 2:
+        return [render_checklist_section(doc, csec) for csec in sections]
+    # The document goes to the workers once, when they start (on platforms
+    # that fork, without being pickled at all), and the tasks are just section
+    # indexes. map() hands the results back in document order.
+    chunksize = max(1, len(sections) // (max_workers * 4))
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(
+        max_workers, initializer=start_render_worker, initargs=(doc, sections)
+    ) as executor:
+        return list(
+            executor.map(render_in_worker, range(len(sections)), chunksize=chunksize)
+        )
+
+
+worker_sections: tuple[WalkthroughDocument, list[ChecklistSection]] | None = None
+
+
+def start_render_worker(
+    doc: WalkthroughDocument, sections: list[ChecklistSection]
+) -> None:
+    global worker_sections
+    worker_sections = (doc, sections)
+
+
+def render_in_worker(index: int) -> RenderedSection:
+    assert worker_sections is not None
+    doc, sections = worker_sections
+    return render_checklist_section(doc, sections[index])
+
+
+def render_checklist_section(
+    doc: WalkthroughDocument, csec: ChecklistSection
+) -> RenderedSection:
+    rendered = RenderedSection(csec.name)
+    checklist_items = rendered.checklist_items
+    out: list[str] = []
+    for section_item in csec.items:
+        match section_item:
+            case SectionHeading():
+                section_nice_name = generate_safe_html_tag_name(section_item.title)
+                out.append('<h2 class="mt-8 text-2xl font-bold tracking-tight">')
+                out.append(f'{escape_text(section_item.title)}<a name="section')
+                rendered.html_parts.append("".join(out))
+                out.clear()
+                out.append(f'_{section_nice_name}"></a>')
+                write_go_to_top_link(out)
+                out.append("</h2>")
+                rendered.headings.append((section_nice_name, section_item.title))
+            case UnnumberedList():
+                write_list(out, "ul", "list-disc ml-6 mt-4", section_item.items)
+            case NumberedList():
+                write_list(out, "ol", "list-decimal ml-6 mt-4", section_item.items)
+            case Spoiler():
+                out.append('<div x-data="{ open: false }">')
+                out.append(
+                    '<button @click="open = !open" class="flex items-start text-left" type="button">'
+                )
+                out.append(COLLAPSIBLE_ICONS)
+                out.append('<span class="text-base font-semibold leading-7">')
+                out.append(escape_text(doc.default_spoiler_title))
+                out.append('</span></button><div x-show="open"><div>')
+                for se in section_item.items:
+                    match se:
+                        case TextParagraphChild():
+                            out.append(f"<p>{escape_text(se.s)}</p>")
+                        case ImageParagraphChild():
+                            out.append(
+                                '<img decoding="async" loading="lazy" '
+                                f"src={quote_attr(se.image_loc)}/>"
+                            )
+                        case UlParagraphChild():
+                            write_list(out, "ul", "list-disc ml-6 mt-4", se.items)
+                out.append("</div></div></div>")
+            case Paragraph():
+                out.append('<p class="mt-4">')
+                for paragraph_child in section_item.items:
+                    out.append(" ")
+                    match paragraph_child:
+                        case TextParagraphChild():
+                            out.append(escape_text(paragraph_child.s))
+                        case LinkParagraphChild():
+                            url = paragraph_child.url
+                            out.append(
+                                f'<a class="hover:underline" href={quote_attr(url)}>'
+                                f"{escape_text(url)}</a>"
+                            )
+                        case ChecklistParagraphChild():
+                            if paragraph_child.tag_name not in doc.decl_map:
+                                print(f"Invalid collectible {paragraph_child.tag_name}")
+                                continue
+                            item_id = paragraph_child.item_id
+                            out.append(
+                                ' <input @change="storeStatuses($el)" '
+                                'class="h-4 w-4 rounded focus:ring-indigo-600" '
+                                f"id={quote_attr(item_id + '_in_paragraph')} "
+                                f'type="checkbox" x-model={quote_attr(item_id)}/> '
+                                f"<label for={quote_attr(item_id)}>"
+                                f"{escape_text(paragraph_child.content)}</label> "
+                            )
+                            rendered.item_ids.append(item_id)
+                            rendered.item_labels.append(
+                                (paragraph_child.tag_name, paragraph_child.content)
+                            )
+                            checklist_items.setdefault(
+                                paragraph_child.tag_name, []
+                            ).append(
+                                ChecklistItem(paragraph_child.list_content, item_id)
+                            )
+                out.append("</p>")
+    if checklist_items:
+        out.append(
+            '<h3 class="text-base border-t pt-4 font-semibold leading-6 mb-2 mt-6 text-xl">'
+            "Checklist</h3>"
+        )
+        write_checklist_container(out, doc, checklist_items, "end_of_section")
+    rendered.html_parts.append("".join(out))
+    return rendered
+
+
+def assemble_html(
+    doc: WalkthroughDocument,
+    sections: list[RenderedSection],
+    lazy_rollups: bool = False,
+) -> str:
+    return "".join(assemble_parts(doc, sections, lazy_rollups))
+
+
+# The page in pieces: everything up to the table of contents, the table of
+# contents, each checklist section, the collectible rollups, and the closing
+# tags. The live reload server swaps the pieces in between separately.
+def assemble_parts(
+    doc: WalkthroughDocument,
+    sections: list[RenderedSection],
+    lazy_rollups: bool = False,
+) -> list[str]:
+    parts: list[str] = []
+    item_ids = [item_id for section in sections for item_id in section.item_ids]
+    item_labels = [label for section in sections for label in section.item_labels]
+    all_checklist_items = [
+        (section.name, section.checklist_items)
+        for section in sections
+        if section.checklist_items
+    ]
+    all_collectibles_by_type = get_collectibles_by_type(all_checklist_items)
+
+    out: list[str] = [HTML_OPEN, '<head><meta charset="utf-8"/>']
+    out.append(f"<title>{escape_text(doc.title)}</title>")
+    out.append(HEAD_SCRIPTS)
+    counter_groups = make_counter_groups(all_checklist_items)
+    out.append(
+        "<script>"
+        + make_store_script_text(doc, item_ids, item_labels, counter_groups)
+        + "</script>"
+    )
+    if lazy_rollups:
+        out.append(f"<script>{make_rollup_script_text(all_checklist_items)}</script>")
+    out.append("</head>")
+    out.append(BODY_OPEN)
+    out.append(
+        '<h1 class="my-2 text-5xl font-bold tracking-tight sm:text-5xl">'
+        f"{escape_text(doc.title)}</h1>"
+    )
+    out.append(DARK_MODE_CONTROLS)
+    parts.append("".join(out))
+
+    # Table of contents
+    out = []
+    out.append(
+        '<div><h2 class="text-3xl font-bold mt-4">Table of Contents</h2>'
+        '<ul class="space-y-2 ml-4"><li><div class="mt-2">'
+        '<h3 class="ml-2 font-bold text-2xl">Walkthrough</h3>'
+        '<ul class="space-y-2 ml-4"><a name="top_of_toc"></a>'
+    )
+    section_count = 0
+    for section in sections:
+        for anchor_name, title in section.toc_entries(section_count):
+            write_toc_item(out, anchor_name, title)
+        section_count += len(section.headings)
+    out.append("</ul></div></li>")
+    write_toc_item(
+        out,
+        "collectibles_by_section",
+        "All collectibles by section",
+        additional_class="text-2xl font-bold",
+    )
+    out.append(
+        '<li><a class="hover:underline text-2xl font-bold" '
+        'href="#all_collectibles_by_type">All collectibles by type</a>'
+        '<div><ul class="ml-4">'
+    )
+    for item_type in all_collectibles_by_type:
+        write_toc_item(
+            out, f"all_items_list_{item_type}", doc.decl_map[item_type].plural
+        )
+    out.append("</ul></div></li></ul></div>")
+    parts.append("".join(out))
+
+    section_count = 0
+    for section in sections:
+        parts.append(section.html(section_count))
+        section_count += len(section.headings)
+
+    out = []
+    write_section_heading(out, "All collectibles by section", "collectibles_by_section")
+    for checklist_item_section_name, section_checklist_items in all_checklist_items:
+        out.append(
+            '<h3 class="text-base font-semibold leading-6 mb-2 mt-6 text-xl">'
+            f"{escape_text(checklist_item_section_name)}</h3>"
+        )
+        if lazy_rollups:
+            write_lazy_checklist_container(out, doc, section_checklist_items)
+        else:
+            write_checklist_container(out, doc, section_checklist_items, "by_section")
+
+    write_section_heading(out, "All collectibles by type", "all_collectibles_by_type")
+    for item_type, items_of_that_type in all_collectibles_by_type.items():
+        out.append(f"<a name={quote_attr(f'all_items_list_{item_type}')}></a>")
+        write_rollup_checklist_container(
+            out,
+            item_type,
+            doc.decl_map[item_type].plural,
+            items_of_that_type,
+            lazy_rollups,
+        )
+
+    parts.append("".join(out))
+    parts.append("</div></body></html>")
+    return parts
+
+
+def get_collectibles_by_type(
+    all_checklist_items: list[tuple[str, dict[str, list[ChecklistItem]]]],
+) -> dict[str, list[tuple[str, ChecklistItem]]]:
+    all_collectibles_by_type: dict[str, list[tuple[str, ChecklistItem]]] = {}
+    for checklist_item_section_name, foo_checklist_items in all_checklist_items:
+        for item_type, item_list in foo_checklist_items.items():
+            for item in item_list:
+                all_collectibles_by_type.setdefault(item_type, []).append(
+                    (checklist_item_section_name, item)
+                )
+
+    return all_collectibles_by_type
+
+
+def write_list(out: list[str], tag: str, css_class: str, items: list[str]):
+    out.append(f'<{tag} class="{css_class}">')
+    for actual_list_item in items:
+        out.append(f'<li class="mb-2">{escape_text(actual_list_item)}</li>')
+    out.append(f"</{tag}>")
+
+
+def write_toc_item(
+    out: list[str],
+    anchor_name: str,
+    title_in_toc: str,
+    additional_class: str | None = None,
+):
+    c = "hover:underline"
+    if additional_class:
+        c += " " + additional_class
+    out.append(
+        f"<li><a class={quote_attr(c)} href={quote_attr('#' + anchor_name)}>"
+        f"{escape_text(title_in_toc)}</a></li>"
+    )
+
+
+def write_section_heading(out: list[str], title: str, anchor_name: str):
+    out.append(
+        '<h2 class="mt-8 text-2xl font-bold tracking-tight">'
+        f"{escape_text(title)}<a name={quote_attr(anchor_name)}></a>"
+    )
+    write_go_to_top_link(out)
+    out.append("</h2>")
+
+
+def write_go_to_top_link(out: list[str], span_class: str = "text-lg font-normal"):
+    out.append(
+        f' <span class="{span_class}"><a href="#top_of_toc">(Go to top)</a></span>'
+    )
+
+
+def write_checklist_header(
+    out: list[str], plural: str, counter: str, count: int, lazy: bool = False
+):
+    out.append('<li x-data="{ open: false }">' if lazy else "<li>")
+    out.append(
+        '<h3 class="text-base font-semibold leading-6 mb-2">'
+        f"{escape_text(plural)} (<span x-text={quote_attr(counter)}></span>"
+        f"/{count})"
+    )
+
+
+def write_checklist_container(
+    out: list[str],
+    doc: WalkthroughDocument,
+    checklist_items: dict[str, list[ChecklistItem]],
+    loc: str,
+):
+    out.append('<div class="border-b pb-4"><ul class="mt-8 space-y-8">')
+    for tag_name, tags in checklist_items.items():
+        write_checklist_header(
+            out, doc.decl_map[tag_name].plural, section_counter(tags), len(tags)
+        )
+        out.append("</h3><ul>")
+        for ci in tags:
+            out.append("<li>")
+            write_checklist_tag(out, ci.content, ci.item_id, loc)
+            out.append("</li>")
+        out.append("</ul></li>")
+    out.append("</ul></div>")
+
+
+def write_lazy_checklist_container(
+    out: list[str],
+    doc: WalkthroughDocument,
+    checklist_items: dict[str, list[ChecklistItem]],
+):
+    out.append('<div class="border-b pb-4"><ul class="mt-8 space-y-8">')
+    for tag_name, tags in checklist_items.items():
+        write_checklist_header(
+            out, doc.decl_map[tag_name].plural, section_counter(tags), len(tags), True
+        )
+        write_lazy_checklist(
+            out, f"rollupSectionList('{tags[0].item_id}')", "by_section"
+        )
+    out.append("</ul></div>")
+
+
+def write_rollup_checklist_container(
+    out: list[str],
+    item_type: str,
+    item_name_plural: str,
+    checklist_items: list[tuple[str, ChecklistItem]],
+    lazy: bool = False,
+):
+    out.append('<div><ul class="mt-8 space-y-8">')
+    write_checklist_header(
+        out, item_name_plural, type_counter(item_type), len(checklist_items), lazy
+    )
+    write_go_to_top_link(out, "text-md font-normal")
+    if lazy:
+        write_lazy_checklist(out, f"rollupTypeList('{item_type}')", "rollup")
+        out.append("</ul></div>")
+        return
+    out.append("</h3><ul>")
+    for prefix, ci in checklist_items:
+        out.append("<li>")
+        write_checklist_tag(out, f"{prefix}: {ci.content}", ci.item_id, "rollup")
+        out.append("</li>")
+    out.append("</ul></li></ul></div>")
+
+
+# Closes the header opened by write_checklist_header with a show/hide button
+# and the list, which Alpine renders from list_expression once it is opened.
+def write_lazy_checklist(out: list[str], list_expression: str, loc: str):
+    out.append(
+        ' <button class="text-md font-normal hover:underline" @click="open = !open" '
+        "x-text=\"open ? '(Hide)' : '(Show)'\"></button></h3>"
+        '<template x-if="open"><ul>'
+        f'<template :key="item.id" x-for="item in {list_expression}">'
+        '<li><div class="relative flex items-start"><div class="flex h-6 items-center">'
+        '<input :checked="$data[item.id]" '
+        f":id=\"item.id + '{loc}'\" "
+        '@change="$data[item.id] = $el.checked; storeStatuses($el, item.id)" '
+        'class="h-4 w-4 ml-4 rounded border-gray-300 text-indigo-600 focus:ring-indigo-600" '
+        'type="checkbox"/>'
+        '</div><div class="ml-3 text-md leading-6">'
+        '<label :for="item.id" class="font-medium" x-text="item.label"></label>'
+        "</div></div></li></template></ul></template></li>"
+    )
+
+
+def write_checklist_tag(out: list[str], s: str, this_id: str, loc: str):
+    out.append(
+        '<div class="relative flex items-start"><div class="flex h-6 items-center">'
+        '<input @change="storeStatuses($el)" '
+        'class="h-4 w-4 ml-4 rounded border-gray-300 text-indigo-600 focus:ring-indigo-600" '
+        f'id={quote_attr(this_id + loc)} type="checkbox" x-model={quote_attr(this_id)}/>'
+        '</div><div class="ml-3 text-md leading-6">'
+        f'<label class="font-medium" for={quote_attr(this_id)}>{escape_text(s)}</label>'
+        "</div></div>"
+    )
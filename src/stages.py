@@ -0,0 +1,177 @@
+import cProfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+import gc
+import time
+import tracemalloc
+from typing import Iterator
+
+from src.parse_document import (
+    ChecklistParagraphChild,
+    Paragraph,
+    SectionHeading,
+    WalkthroughDocument,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+TOP_SITES = 5
+MIN_SITE_BYTES = 1024
+# Allocations made by tracemalloc itself and by imports are left out
+IGNORED_FILES = {tracemalloc.__file__, "<frozen importlib._bootstrap>"}
+
+
+@dataclass
+class AllocationSite:
+    location: str
+    size_bytes: int
+    blocks: int
+
+
+@dataclass
+class StageMemory:
+    # Peak is the most memory traced at any point during the stage, retained
+    # what was still reachable when it ended. Both count everything traced,
+    # not just the stage's own allocations; change is what the stage added.
+    peak_bytes: int
+    retained_bytes: int
+    change_bytes: int
+    # Where the memory the stage added was allocated, largest first
+    top_sites: list[AllocationSite]
+
+
+def short_location(frame: tracemalloc.Frame) -> str:
+    path = Path(frame.filename)
+    if path.is_relative_to(ROOT):
+        path = path.relative_to(ROOT)
+    return f"{path}:{frame.lineno}"
+
+
+def top_sites(
+    after: tracemalloc.Snapshot, before: tracemalloc.Snapshot, limit: int
+) -> list[AllocationSite]:
+    sites = [
+        AllocationSite(
+            short_location(stat.traceback[0]), stat.size_diff, stat.count_diff
+        )
+        for stat in after.compare_to(before, "lineno")
+        if stat.size_diff >= MIN_SITE_BYTES
+        and stat.traceback[0].filename not in IGNORED_FILES
+    ]
+    sites.sort(key=lambda site: site.size_bytes, reverse=True)
+    return sites[:limit]
+
+
+class StageRecorder:
+    # Adds up the wall-clock time of each named stage of one build, in the
+    # order the stages first ran, along with counts of what was built. With
+    # trace_memory, it also records the memory of each stage with
+    # tracemalloc, which it starts if needed. Tracing slows everything down,
+    # so the times are only comparable with other traced runs.
+    def __init__(self, trace_memory: bool = False, sites: int = TOP_SITES) -> None:
+        self.started = time.perf_counter()
+        self.seconds: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self.memory: dict[str, StageMemory] = {}
+        self.trace_memory = trace_memory
+        self.sites = sites
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if self.trace_memory:
+            # Collecting first means garbage from earlier stages doesn't
+            # count, and that freed reference cycles, such as the
+            # BeautifulSoup tree, don't linger into the next stage.
+            gc.collect()
+            before = tracemalloc.take_snapshot()
+            retained_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                gc.collect()
+                retained = tracemalloc.get_traced_memory()[0]
+                sites = top_sites(tracemalloc.take_snapshot(), before, self.sites)
+                memory = StageMemory(peak, retained, retained - retained_before, sites)
+                if name in self.memory:
+                    memory.peak_bytes = max(
+                        memory.peak_bytes, self.memory[name].peak_bytes
+                    )
+                self.memory[name] = memory
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = value
+
+    def format_report(self) -> str:
+        total = time.perf_counter() - self.started
+        rows = list(self.seconds.items())
+        other = total - sum(self.seconds.values())
+        if other > 0:
+            rows.append(("other", other))
+        width = max([len("total"), *(len(name) for name, _ in rows)])
+        lines = [f"{'stage':<{width}}  {'seconds':>8}  {'share':>5}"]
+        for name, seconds in rows:
+            share = seconds / total if total else 0
+            lines.append(f"{name:<{width}}  {seconds:>8.3f}  {share:>5.0%}")
+        lines.append(f"{'total':<{width}}  {total:>8.3f}")
+        if self.counts:
+            lines.append(", ".join(f"{v} {name}" for name, v in self.counts.items()))
+        return "\n".join(lines)
+
+    def format_memory_report(self) -> str:
+        width = max([len("stage"), *(len(name) for name in self.memory)])
+        lines = [
+            f"{'stage':<{width}}  {'peak MB':>8}  {'retained MB':>11}  {'change MB':>9}"
+        ]
+        for name, memory in self.memory.items():
+            lines.append(
+                f"{name:<{width}}  {memory.peak_bytes / 2**20:>8.1f}  "
+                f"{memory.retained_bytes / 2**20:>11.1f}  "
+                f"{memory.change_bytes / 2**20:>+9.1f}"
+            )
+        for name, memory in self.memory.items():
+            if memory.top_sites:
+                lines.append(f"Largest allocations kept by {name}:")
+            for site in memory.top_sites:
+                lines.append(
+                    f"  {site.size_bytes / 1024:>9,.0f} KB  {site.location} "
+                    f"({site.blocks} blocks)"
+                )
+        return "\n".join(lines)
+
+
+def count_document(doc: WalkthroughDocument, stages: StageRecorder) -> None:
+    sections = paragraphs = collectibles = 0
+    for checklist_section in doc.checklist_sections:
+        for item in checklist_section.items:
+            if isinstance(item, SectionHeading):
+                sections += 1
+            elif isinstance(item, Paragraph):
+                paragraphs += 1
+                for child in item.items:
+                    if isinstance(child, ChecklistParagraphChild):
+                        collectibles += 1
+    stages.count("sections", sections)
+    stages.count("paragraphs", paragraphs)
+    stages.count("collectibles", collectibles)
+
+
+@contextmanager
+def profiling(profiler: cProfile.Profile | None) -> Iterator[None]:
+    # cProfile only sees the thread that enables it, so each build enables
+    # it on the thread the build runs on.
+    if profiler is None:
+        yield
+        return
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
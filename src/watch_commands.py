@@ -0,0 +1,184 @@
+import argparse
+import cProfile
+from pathlib import Path
+import threading
+from typing import Callable, Iterable
+
+from src.build_commands import (
+    make_parse_cache,
+    print_diagnostics,
+    print_profile,
+    render_bs4,
+    report_write,
+)
+from src.fragment_cache import FragmentCache
+from src.incremental import IncrementalParser
+from src.manifest import input_paths, write_if_changed
+from src.parse_cache import ParseCache, load_document
+from src.parse_document import IncludeResolver, WalkthroughDocument, parse_file
+from src.stages import StageRecorder, count_document, profiling
+from src.watcher import InputWatcher, Rebuilder
+
+# The watch and serve commands. The web server is imported only by serve.
+
+
+def parse_for_watch(
+    infile: Path, includes: IncludeResolver, incremental: IncrementalParser | None
+) -> WalkthroughDocument:
+    if incremental is None:
+        return parse_file(infile, includes)
+    doc = incremental.parse(infile.read_text(encoding="utf-8"))
+    print(
+        f"Re-parsed {incremental.reparsed_count} of {incremental.chunk_count} checklist sections."
+    )
+    return doc
+
+
+def render_for_watch(
+    doc: WalkthroughDocument, fragments: FragmentCache | None, stages: StageRecorder
+) -> str:
+    if fragments is None:
+        return render_bs4(doc, stages)
+    with stages.stage("render"):
+        html = fragments.render(doc)
+    print(
+        f"Re-rendered {fragments.rendered_count} of {fragments.section_count} checklist sections."
+    )
+    return html
+
+
+def document_cache(
+    cache: ParseCache | None, incremental: IncrementalParser | None
+) -> ParseCache | None:
+    # The incremental parser keeps the document in memory, and it has to
+    # parse the whole file once to know its sections, so pickling every
+    # save to disk, or loading the first one from there, gains nothing.
+    return cache if incremental is None else None
+
+
+def file_stamps(paths: Iterable[Path]) -> dict[Path, tuple[int, int] | None]:
+    stamps = {}
+    for path in paths:
+        try:
+            stat = path.stat()
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+def run_watch(args: argparse.Namespace, profiler: cProfile.Profile | None) -> int:
+    infile = Path(args.infile)
+    if not infile.exists():
+        print(f"Cannot find file {infile}")
+        return 1
+    if args.outfile is not None:
+        outfile = Path(args.outfile)
+    else:
+        outfile = infile.parent / f"{infile.stem}.html"
+    cache = make_parse_cache(args.no_cache)
+    includes = IncludeResolver(infile.parent)
+    incremental = None if args.no_incremental else IncrementalParser(includes)
+    doc_cache = document_cache(cache, incremental)
+
+    def parse(path: Path) -> WalkthroughDocument:
+        return parse_for_watch(path, includes, incremental)
+
+    fragments = None
+    if args.renderer == "string":
+        fragments = FragmentCache(cache, infile, args.jobs, args.lazy_rollups)
+
+    def rebuild(checkpoint: Callable[[], None]) -> set[Path]:
+        stages = StageRecorder(args.memory_report)
+        with profiling(profiler):
+            with stages.stage("parse"):
+                doc = load_document(infile, doc_cache, parse)
+            print_diagnostics(doc)
+            checkpoint()
+            html = render_for_watch(doc, fragments, stages)
+            checkpoint()
+            with stages.stage("write"):
+                data = html.encode("utf-8")
+                report_write(outfile, write_if_changed(outfile, data))
+        if args.profile:
+            count_document(doc, stages)
+            print_profile(stages, len(data))
+        if args.memory_report:
+            print(stages.format_memory_report())
+        return set(input_paths(infile, doc))
+
+    watcher = InputWatcher(rebuild(lambda: None), args.debounce)
+    rebuilder = Rebuilder(rebuild, watcher.update)
+    rebuilder.start()
+    print(f"Watching {infile}. Press Ctrl+C to stop.")
+    try:
+        for changed_at in watcher.changes():
+            rebuilder.request(changed_at)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rebuilder.stop()
+    return 0
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    from src.live_server import LivePage, make_live_server
+
+    infile = Path(args.infile)
+    if not infile.exists():
+        print(f"Cannot find file {infile}")
+        return 1
+    cache = make_parse_cache(args.no_cache)
+    includes = IncludeResolver(infile.parent)
+    incremental = None if args.no_incremental else IncrementalParser(includes)
+    doc_cache = document_cache(cache, incremental)
+    fragments = FragmentCache(cache, infile, args.jobs, args.lazy_rollups)
+    page = LivePage()
+    image_stamps: dict[Path, tuple[int, int] | None] = {}
+
+    def serve_build(checkpoint: Callable[[], None]) -> set[Path]:
+        doc = load_document(
+            infile, doc_cache, lambda p: parse_for_watch(p, includes, incremental)
+        )
+        print_diagnostics(doc)
+        checkpoint()
+        parts = fragments.render_parts(doc)
+        print(
+            f"Re-rendered {fragments.rendered_count} of {fragments.section_count} checklist sections."
+        )
+        checkpoint()
+        # The page doesn't change when an image does, but it has to be
+        # loaded again to show it.
+        stamps = file_stamps(infile.parent / img for img in doc.images)
+        images_changed = bool(image_stamps) and stamps != image_stamps
+        image_stamps.clear()
+        image_stamps.update(stamps)
+        sent = page.publish(parts, reload=images_changed)
+        if page.client_count():
+            if sent is None:
+                print("Reloading the page.")
+            else:
+                print(f"Sent {sent} changed parts of the page.")
+        return set(input_paths(infile, doc))
+
+    try:
+        server = make_live_server(page, infile.parent, args.port)
+    except OSError as e:
+        print(f"Cannot serve on port {args.port}: {e}")
+        return 1
+    watcher = InputWatcher(serve_build(lambda: None), args.debounce)
+    rebuilder = Rebuilder(serve_build, watcher.update)
+    rebuilder.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    print(f"Serving {infile} at http://{host}:{port}/. Press Ctrl+C to stop.")
+    try:
+        for changed_at in watcher.changes():
+            rebuilder.request(changed_at)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rebuilder.stop()
+        server.shutdown()
+        server.server_close()
+    return 0
@@ -0,0 +1,131 @@
+from datetime import datetime
+from pathlib import Path
+import threading
+import time
+from typing import Callable
+
+from watchfiles import Change, watch
+
+from src.defaults import DEFAULT_DEBOUNCE_MS
+
+
+class BuildSuperseded(Exception):
+    pass
+
+
+# A build gets a checkpoint function to call between its stages. It raises
+# BuildSuperseded once a newer change has come in, so the stale build stops
+# before writing anything. The build returns the files to watch next.
+Build = Callable[[Callable[[], None]], set[Path]]
+
+
+class Rebuilder:
+    # Runs builds on a background thread so the watch loop never blocks. A
+    # burst of requests while a build runs results in one more build, of the
+    # newest state. Latency is measured from the oldest change the finished
+    # build includes.
+    def __init__(self, build: Build, on_watched: Callable[[set[Path]], None]):
+        self.build = build
+        self.on_watched = on_watched
+        self.condition = threading.Condition()
+        self.changed_at: float | None = None
+        self.generation = 0
+        self.stopped = False
+        self.building = False
+        self.build_count = 0
+        self.superseded_count = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        with self.condition:
+            self.stopped = True
+            self.generation += 1
+            self.condition.notify()
+        self.thread.join()
+
+    def request(self, changed_at: float) -> None:
+        with self.condition:
+            if self.changed_at is None or changed_at < self.changed_at:
+                self.changed_at = changed_at
+            self.generation += 1
+            self.condition.notify()
+
+    def idle(self) -> bool:
+        with self.condition:
+            return self.changed_at is None and not self.building
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while self.changed_at is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                changed_at, generation = self.changed_at, self.generation
+                self.changed_at = None
+                self.building = True
+
+            def checkpoint() -> None:
+                if self.generation != generation:
+                    raise BuildSuperseded
+
+            print(f"[{datetime.now()}] Recompiling.")
+            start = time.perf_counter()
+            try:
+                watched = self.build(checkpoint)
+            except BuildSuperseded:
+                self.superseded_count += 1
+                print("A newer change came in, starting over.")
+                self.request(changed_at)
+                continue
+            except Exception as e:
+                print(f"Build failed: {e}")
+            else:
+                self.build_count += 1
+                end = time.perf_counter()
+                print(
+                    f"Rebuilt in {end - start:.3f}s, "
+                    f"{end - changed_at:.3f}s after the change."
+                )
+                self.on_watched(watched)
+            finally:
+                with self.condition:
+                    self.building = False
+
+
+class InputWatcher:
+    # Watches just the given files. Their folders are watched without
+    # recursing, since editors often save by replacing the file, and events
+    # for other files in them are filtered out. When the folders to watch
+    # change, the watch is restarted.
+    def __init__(self, files: set[Path], debounce_ms: int = DEFAULT_DEBOUNCE_MS):
+        self.debounce_ms = debounce_ms
+        self.files: frozenset[Path] = frozenset()
+        self.restart = threading.Event()
+        self.folders: set[Path] = set()
+        self.update(files)
+
+    def update(self, files: set[Path]) -> None:
+        self.files = frozenset(f.resolve() for f in files)
+        folders = {f.parent for f in self.files if f.parent.is_dir()}
+        if folders != self.folders:
+            self.folders = folders
+            self.restart.set()
+
+    def accepts(self, change: Change, path: str) -> bool:
+        return change != Change.deleted and Path(path).resolve() in self.files
+
+    def changes(self):
+        while True:
+            self.restart.clear()
+            for _ in watch(
+                *sorted(self.folders),
+                watch_filter=self.accepts,
+                step=self.debounce_ms,
+                stop_event=self.restart,
+                recursive=False,
+            ):
+                yield time.perf_counter()
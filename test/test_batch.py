@@ -0,0 +1,76 @@
+import os
+from pathlib import Path
+
+from src.batch import (
+    FAILED,
+    OK,
+    BatchResult,
+    expand_inputs,
+    format_status_table,
+    run_batch,
+)
+
+
+def test_expand_inputs_skips_included_files(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_text("\\title{A}\n\\input{part.txt}\n")
+    (tmp_path / "part.txt").write_text("Included\n")
+    (tmp_path / "sub" / "b.txt").write_text("\\title{B}\n")
+    (tmp_path / "notes.md").write_text("")
+    assert expand_inputs([str(tmp_path)]) == [
+        tmp_path / "a.txt",
+        tmp_path / "sub" / "b.txt",
+    ]
+    assert expand_inputs([str(tmp_path / "*.txt"), str(tmp_path / "a.txt")]) == [
+        tmp_path / "a.txt",
+        tmp_path / "part.txt",
+    ]
+    missing = str(tmp_path / "nothing*.txt")
+    assert expand_inputs([missing]) == [Path(missing)]
+
+
+def check_name(options, infile: Path) -> str:
+    print(f"Checking {infile}")
+    if infile.stem == "bad":
+        raise ValueError(f"{infile} is bad")
+    return options
+
+
+def crash_on_name(options, infile: Path) -> str:
+    if infile.stem == "crash":
+        os._exit(1)
+    return options
+
+
+def test_run_batch_reports_each_file(tmp_path):
+    infiles = [Path("one.txt"), Path("bad.txt"), Path("two.txt")]
+    for workers in (1, 2):
+        results = run_batch(check_name, OK, infiles, workers)
+        assert [result.infile for result in results] == infiles
+        assert [result.status for result in results] == [OK, FAILED, OK]
+        assert results[0].output == "Checking one.txt\n"
+        assert results[1].detail() == "ValueError: bad.txt is bad"
+
+
+def test_run_batch_survives_a_dead_worker():
+    infiles = [Path("one.txt"), Path("crash.txt"), Path("two.txt")]
+    results = run_batch(crash_on_name, OK, infiles, 2)
+    assert [result.infile for result in results] == infiles
+    assert results[1].status == FAILED
+    assert results[1].detail().startswith("BrokenProcessPool: ")
+    assert "3 files" in format_status_table(results)
+
+
+def test_format_status_table():
+    table = format_status_table(
+        [
+            BatchResult(Path("guide.txt"), OK, 1.5, "Compiling\n"),
+            BatchResult(Path("other.txt"), FAILED, 0.25, "Cannot find file\n\n"),
+        ]
+    )
+    assert table.splitlines() == [
+        "file       status      seconds",
+        "guide.txt  ok             1.50",
+        "other.txt  failed         0.25  Cannot find file",
+        "2 files: 1 ok, 0 up to date, 1 failed",
+    ]
@@ -0,0 +1,67 @@
+import tracemalloc
+
+from bench.generate import generate_guide, shape_for, write_guide
+from bench.suite import find_regressions, measure_guide, peak_memory
+from src.parse_document import ChecklistParagraphChild, Spoiler, parse_document
+
+
+def test_generated_guide_has_the_requested_shape():
+    shape = shape_for(1000, types=8, spoilers=2, links=2)
+    assert shape.sections == 10
+    doc = parse_document(generate_guide(shape))
+    assert doc.diagnostics == []
+    assert len(doc.decl_map) == 8
+    items = [
+        child
+        for section in doc.checklist_sections
+        for paragraph in section.items
+        for child in getattr(paragraph, "items", [])
+        if isinstance(child, ChecklistParagraphChild)
+    ]
+    assert len(items) == 1000
+    spoilers = [
+        paragraph
+        for section in doc.checklist_sections
+        for paragraph in section.items
+        if isinstance(paragraph, Spoiler)
+    ]
+    assert len(spoilers) == len(doc.images) == 20
+
+
+def test_measure_guide_reports_time_and_memory(tmp_path):
+    infile = write_guide(tmp_path, shape_for(100))
+    results = measure_guide(infile, ["parse", "package"], 1)
+    assert list(results) == ["parse", "package"]
+    for result in results.values():
+        assert result["seconds"] > 0
+        assert result["peak_bytes"] > 0
+
+
+def test_find_regressions_applies_the_threshold():
+    baseline = {"1000": {"parse": {"seconds": 1.0, "peak_bytes": 1000}}}
+
+    def current(seconds, peak_bytes):
+        return {"1000": {"parse": {"seconds": seconds, "peak_bytes": peak_bytes}}}
+
+    assert find_regressions(baseline, current(1.1, 1100), 0.2) == []
+    assert find_regressions(baseline, current(0.5, 500), 0.2) == []
+    assert len(find_regressions(baseline, current(1.3, 1000), 0.2)) == 1
+    assert len(find_regressions(baseline, current(1.3, 1300), 0.2)) == 2
+    # Stages and sizes missing from the baseline are not compared
+    assert find_regressions({}, current(9.0, 9000), 0.2) == []
+    # Tiny times are noise
+    tiny = {"1000": {"parse": {"seconds": 0.001, "peak_bytes": 1000}}}
+    assert find_regressions(tiny, current(0.002, 1000), 0.2) == []
+
+
+def test_peak_memory_keeps_the_callers_trace():
+    assert 1_000_000 <= peak_memory(lambda: bytearray(1_000_000)) < 1_100_000
+    tracemalloc.start()
+    try:
+        kept = bytearray(2_000_000)
+        assert 1_000_000 <= peak_memory(lambda: bytearray(1_000_000)) < 1_100_000
+        assert tracemalloc.is_tracing()
+        del kept
+    finally:
+        tracemalloc.stop()
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,64 @@
+import argparse
+import zipfile
+
+import pytest
+
+from src import package
+from src.build_commands import OK, build_file, output_settings
+from src.offline import load_alpine
+
+
+def make_args(**options) -> argparse.Namespace:
+    defaults = dict(
+        subparser_name="build",
+        infiles=["guide.txt"],
+        outfile=None,
+        no_cache=True,
+        jobs=1,
+        renderer="string",
+        lazy_rollups=False,
+        minify=False,
+        offline=False,
+        optimize_images=False,
+        max_image_width=1600,
+        image_quality=80,
+        profile=False,
+        profile_output=None,
+        memory_report=False,
+    )
+    return argparse.Namespace(**{**defaults, **options})
+
+
+def test_reporting_options_are_not_output_settings():
+    plain = output_settings(make_args())
+    assert output_settings(make_args(profile=True, memory_report=True)) == plain
+    assert output_settings(make_args(profile_output="out.prof", jobs=4)) == plain
+    assert output_settings(make_args(minify=True)) != plain
+
+
+def test_failed_package_leaves_no_temporary_file(tmp_path, monkeypatch):
+    infile = tmp_path / "guide.txt"
+    infile.write_text("\\title{Guide}\n", encoding="utf-8")
+
+    def write_package(path, *args, **kwargs):
+        path.write_bytes(b"half a zip")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(package, "write_package", write_package)
+    with pytest.raises(OSError):
+        build_file(make_args(), infile)
+    assert [p.name for p in tmp_path.iterdir()] == ["guide.txt"]
+
+
+def test_offline_build_inlines_vendored_alpine(tmp_path):
+    infile = tmp_path / "guide.txt"
+    infile.write_text(
+        "\\declare{map}{Map}{Maps}\n\\title{Guide}\nFind the [map|Map].\n",
+        encoding="utf-8",
+    )
+    assert build_file(make_args(offline=True), infile) == OK
+    with zipfile.ZipFile(tmp_path / "guide.zip") as archive:
+        html = archive.read("guide.html").decode("utf-8")
+    assert f"<script>{load_alpine()}</script></body>" in html
+    assert "unpkg.com" not in html
+    assert "cdn.tailwindcss.com" not in html
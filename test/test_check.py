@@ -0,0 +1,42 @@
+from src.check import check_file, format_diagnostic, has_errors
+
+GUIDE = r"""\declare{map}{Map}{Maps}
+\section{Intro}
+
+A [key|Key] and an [map|Unclosed map
+
+\begin{ul}
+Not an item
+\end{ul}
+
+\input{chapter.txt}
+
+\begin{spoiler}
+\img{present.png}
+\img{missing.png}
+"""
+
+
+def test_reports_every_problem_with_line_numbers(tmp_path):
+    guide = tmp_path / "guide.txt"
+    guide.write_text(GUIDE, encoding="utf-8")
+    (tmp_path / "chapter.txt").write_text("\n[door|Door]\n", encoding="utf-8")
+    (tmp_path / "present.png").write_bytes(b"")
+    diagnostics = check_file(guide)
+    assert [format_diagnostic(guide, d) for d in diagnostics] == [
+        f"{guide}:4: error: Unknown tag type key",
+        f"{guide}:4: error: Unclosed checklist item",
+        f"{guide}:7: warning: No item while parsing ul",
+        f"{tmp_path / 'chapter.txt'}:2: error: Unknown tag type door",
+        f"{guide}:14: error: Referenced image missing.png does not exist",
+        f"{guide}:12: error: Spoiler has no terminating \\end{{spoiler}}",
+    ]
+    assert has_errors(diagnostics)
+
+
+def test_clean_file_has_no_errors(tmp_path):
+    guide = tmp_path / "guide.txt"
+    guide.write_text("\\begin{ul}\nText\n\\end{ul}\n", encoding="utf-8")
+    diagnostics = check_file(guide)
+    assert [d.severity for d in diagnostics] == ["warning"]
+    assert not has_errors(diagnostics)
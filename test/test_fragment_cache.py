@@ -0,0 +1,59 @@
+from src.fragment_cache import FragmentCache
+from src.parse_cache import ParseCache
+from src.parse_document import parse_document
+from src.render_html import render_html_from_doc
+
+HEADER = "\\declare{map}{Map}{Maps}\n\\declare{key}{Key}{Keys}\n\\title{Fragments}\n"
+SECTIONS = [
+    "\\section{One}\nFind the [map|First map].\n\\checklist\n",
+    "\\section{Two}\nFind the [key|Key].\n\\checklist\n",
+    "\\section{Three}\nNothing here.\n",
+]
+
+
+def render(cache: FragmentCache, header: str, sections: list[str]) -> str:
+    doc = parse_document(header + "".join(sections))
+    html = cache.render(doc)
+    assert html == render_html_from_doc(doc)
+    return html
+
+
+def test_only_changed_sections_are_rendered():
+    cache = FragmentCache()
+    render(cache, HEADER, SECTIONS)
+    assert (cache.rendered_count, cache.section_count) == (3, 3)
+    render(cache, HEADER, SECTIONS)
+    assert cache.rendered_count == 0
+    changed = [SECTIONS[0], SECTIONS[1].replace("Key", "Gold key"), SECTIONS[2]]
+    render(cache, HEADER, changed)
+    assert cache.rendered_count == 1
+
+
+def test_moved_sections_are_renumbered():
+    cache = FragmentCache()
+    render(cache, HEADER, SECTIONS)
+    extra_heading = SECTIONS[0].replace("\\checklist", "\\section{One and a half}")
+    html = render(cache, HEADER, [extra_heading] + SECTIONS[1:])
+    assert cache.rendered_count == 1
+    assert 'name="section4_three"' in html
+
+
+def test_declaration_change_rerenders_sections_using_it():
+    cache = FragmentCache()
+    render(cache, HEADER, SECTIONS)
+    render(cache, HEADER.replace("{Keys}", "{Skeleton Keys}"), SECTIONS)
+    assert cache.rendered_count == 1
+    render(cache, "\\defaultspoilertitle{Reveal}\n" + HEADER, SECTIONS)
+    assert cache.rendered_count == 3
+
+
+def test_fragments_persist_on_disk(tmp_path):
+    source = tmp_path / "guide.txt"
+    disk = ParseCache(tmp_path / "cache")
+    render(FragmentCache(disk, source), HEADER, SECTIONS)
+    cache = FragmentCache(disk, source)
+    render(cache, HEADER, SECTIONS)
+    assert cache.rendered_count == 0
+    other = FragmentCache(disk, tmp_path / "other.txt")
+    render(other, HEADER, SECTIONS)
+    assert other.rendered_count == 3
@@ -0,0 +1,76 @@
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+from src.images import (
+    ImageOptions,
+    add_image_attributes,
+    optimize_image,
+    optimize_images,
+)
+from src.parse_cache import ParseCache
+from src.parse_document import parse_document
+from src.render_html import render_html_from_doc
+
+
+def make_image(path: Path, size: tuple[int, int], image_format: str) -> None:
+    Image.new("RGB", size, (200, 100, 50)).save(path, image_format, quality=98)
+
+
+def test_wide_images_are_scaled_down(tmp_path):
+    make_image(tmp_path / "wide.jpg", (400, 100), "JPEG")
+    data = (tmp_path / "wide.jpg").read_bytes()
+    image = optimize_image(data, ImageOptions(max_width=200, quality=70))
+    assert (image.width, image.height) == (200, 50)
+    with Image.open(BytesIO(image.data)) as reopened:
+        assert reopened.size == (200, 50)
+        assert reopened.format == "JPEG"
+
+
+def test_small_images_keep_their_bytes_unless_smaller(tmp_path):
+    make_image(tmp_path / "small.png", (10, 10), "PNG")
+    data = (tmp_path / "small.png").read_bytes()
+    image = optimize_image(data, ImageOptions())
+    assert (image.width, image.height) == (10, 10)
+    assert len(image.data) <= len(data)
+    svg = b"<svg xmlns='http://www.w3.org/2000/svg'></svg>"
+    assert optimize_image(svg, ImageOptions()).data == svg
+
+
+def test_results_are_cached_on_source_bytes(tmp_path):
+    make_image(tmp_path / "a.jpg", (300, 200), "JPEG")
+    (tmp_path / "b.jpg").write_bytes((tmp_path / "a.jpg").read_bytes())
+    cache = ParseCache(tmp_path / "cache")
+    options = ImageOptions(max_width=150)
+    first = optimize_images(tmp_path, ["a.jpg", "b.jpg", "./a.jpg"], options, cache, 2)
+    assert (first.encoded_count, first.reused_count) == (1, 0)
+    assert list(first.images) == ["a.jpg", "b.jpg"]
+    second = optimize_images(tmp_path, ["b.jpg"], options, cache)
+    assert (second.encoded_count, second.reused_count) == (0, 1)
+    assert second.images["b.jpg"] == first.images["a.jpg"]
+    other = optimize_images(tmp_path, ["b.jpg"], ImageOptions(max_width=100), cache)
+    assert other.encoded_count == 1
+
+
+def test_sizes_are_written_into_the_page(tmp_path):
+    make_image(tmp_path / "shot.png", (1000, 500), "PNG")
+    guide = "\\title{Images}\n\\section{One}\n\\begin{spoiler}\n\\img{./shot.png}\n\\end{spoiler}\n"
+    doc = parse_document(guide)
+    html = render_html_from_doc(doc)
+    assert '<img decoding="async" loading="lazy" src="./shot.png"/>' in html
+    result = optimize_images(tmp_path, doc.images, ImageOptions(max_width=800))
+    html = add_image_attributes(html, doc.images, result.images)
+    assert (
+        '<img decoding="async" height="400" loading="lazy" src="./shot.png" width="800"/>'
+        in html
+    )
+
+
+def test_broken_images_are_copied(tmp_path, monkeypatch):
+    make_image(tmp_path / "photo.jpg", (400, 300), "JPEG")
+    data = (tmp_path / "photo.jpg").read_bytes()
+    truncated = data[: len(data) // 2]
+    assert optimize_image(truncated, ImageOptions()).data == truncated
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    assert optimize_image(data, ImageOptions(max_width=200)).data == data
@@ -0,0 +1,121 @@
+from src.compose_html import make_html_from_doc
+from src.incremental import IncrementalParser
+from src.parse_document import IncludeResolver, parse_document, parse_file
+
+MAIN = r"""\version{1}
+\declare{map}{Map}{Maps}
+\title{Test Game}
+
+\section{Intro}
+
+Find the [map|First Map].
+
+\input{chapter1.txt}
+
+Back in the main file: [map|Main Map] and [box|Main Box].
+
+\input{chapter2.txt}
+
+\input{chapter1.txt}
+
+\checklist
+"""
+
+CHAPTERS = {
+    "chapter1.txt": r"""\checklist
+
+\section{Chapter 1}{Ch1}
+
+Grab the [map|Chapter Map].
+""",
+    "chapter2.txt": r"""\declare{box}{Lunch Box}{Lunch Boxes}
+
+\section{Chapter 2}
+
+A [box|Box] and a [map|Map].
+
+[nope|Unknown] [map|Dropped]
+
+\checklist
+""",
+}
+
+
+def write_guide(tmp_path):
+    main = tmp_path / "guide.txt"
+    main.write_text(MAIN, encoding="utf-8")
+    for name, text in CHAPTERS.items():
+        (tmp_path / name).write_text(text, encoding="utf-8")
+    return main
+
+
+def concatenated() -> str:
+    text = MAIN
+    for name, chapter in CHAPTERS.items():
+        text = text.replace(f"\\input{{{name}}}\n", chapter)
+    return text
+
+
+def render(doc) -> str:
+    return make_html_from_doc(doc)
+
+
+def test_included_files_match_concatenation(tmp_path):
+    main = write_guide(tmp_path)
+    expected = parse_document(concatenated())
+    assert render(parse_file(main)) == render(expected)
+    with_base = parse_document(MAIN, base_dir=tmp_path)
+    assert render(with_base) == render(expected)
+
+
+def test_ids_are_global(tmp_path):
+    doc = parse_file(write_guide(tmp_path))
+    ids = [
+        child.item_id
+        for section in doc.checklist_sections
+        for item in section.items
+        for child in getattr(item, "items", [])
+        if hasattr(child, "item_id")
+    ]
+    assert ids == ["map1", "map2", "box2", "map4", "map5"]
+
+
+def test_unchanged_files_are_not_parsed_again(tmp_path):
+    main = write_guide(tmp_path)
+    includes = IncludeResolver(tmp_path)
+    parse_file(main, includes)
+    # chapter1 is parsed twice since box is only declared the second time
+    assert includes.parsed_count == 3
+    parse_file(main, includes)
+    assert includes.parsed_count == 3
+    (tmp_path / "chapter2.txt").write_text(
+        CHAPTERS["chapter2.txt"].replace("A [box", "Another [box"), encoding="utf-8"
+    )
+    parse_file(main, includes)
+    assert includes.parsed_count == 4
+
+
+def test_process_pool_gives_same_result(tmp_path):
+    main = write_guide(tmp_path)
+    includes = IncludeResolver(tmp_path, max_workers=2)
+    assert render(parse_file(main, includes)) == render(parse_document(concatenated()))
+    assert includes.parsed_count == 3
+
+
+def test_incremental_parse_sees_included_changes(tmp_path):
+    main = write_guide(tmp_path)
+    parser = IncrementalParser(IncludeResolver(tmp_path))
+    parser.parse(MAIN)
+    changed = CHAPTERS["chapter1.txt"].replace("Grab the", "Take the [map|New]")
+    (tmp_path / "chapter1.txt").write_text(changed, encoding="utf-8")
+    expected = concatenated().replace("Grab the", "Take the [map|New]")
+    assert render(parser.parse(MAIN)) == render(parse_document(expected))
+    assert parser.reparsed_count == 1
+    assert render(parse_file(main)) == render(parser.parse(MAIN))
+
+
+def test_missing_include_is_reported(tmp_path):
+    doc = parse_document("\\input{missing.txt}\n", base_dir=tmp_path)
+    assert [str(d) for d in doc.diagnostics] == [
+        "Included file missing.txt does not exist on line 1"
+    ]
@@ -0,0 +1,95 @@
+from src.compose_html import make_html_from_doc
+from src.incremental import IncrementalParser, split_checklist_chunks
+from src.parse_document import parse_document
+
+GUIDE = r"""\version{1}
+\declare{map}{Map}{Maps}
+\declare{box}{Lunch Box}{Lunch Boxes}
+\title{Test Game}
+
+\section{Chapter 1}{Ch1}
+
+Find the [map|Lake Map] and a [box|Box|Box by the lake].
+
+\begin{spoiler}
+\checklist
+\img{solution.png}
+\end{spoiler}
+
+\checklist
+
+\section{Chapter 2}
+
+Grab the [box|Second Box]. Then the [map|Forest Map].
+
+\checklist
+
+More text with a [map|Cave Map] and \link{https://example.com}.
+
+\checklist
+"""
+
+EDITS = [
+    ("Grab the", "Grab teh"),
+    ("Find the [map|Lake Map]", "Find the [map|Lake Map] [map|Extra Map]"),
+    ("[box|Second Box]. ", ""),
+    ("\\section{Chapter 2}\n", ""),
+    ("\\declare{box}{Lunch Box}{Lunch Boxes}\n", ""),
+    (
+        "\\declare{map}{Map}{Maps}\n",
+        "\\declare{map}{Map}{Maps}\n\\declare{box}{B}{Bs}\n",
+    ),
+    ("\\checklist\n\nMore text", "More text"),
+    ("More text", "\\checklist\nMore text"),
+]
+
+
+def render(doc) -> str:
+    return make_html_from_doc(doc) + repr(doc.images)
+
+
+def test_chunks_stop_outside_blocks():
+    chunks = split_checklist_chunks(GUIDE)
+    assert len(chunks) == 4
+    assert chunks[0][1].endswith("\\end{spoiler}\n\n\\checklist")
+    assert [first for first, _ in chunks] == [0, 15, 21, 25]
+
+
+def test_matches_full_parse_after_each_edit():
+    parser = IncrementalParser()
+    text = GUIDE
+    assert render(parser.parse(text)) == render(parse_document(text))
+    for old, new in EDITS:
+        assert old in text
+        text = text.replace(old, new, 1)
+        assert render(parser.parse(text)) == render(parse_document(text))
+
+
+def test_typo_fix_reparses_one_section():
+    parser = IncrementalParser()
+    parser.parse(GUIDE)
+    assert parser.reparsed_count == 4
+    parser.parse(GUIDE.replace("Grab the", "Grab teh"))
+    assert parser.reparsed_count == 1
+
+
+def test_inserted_item_renumbers_later_sections():
+    parser = IncrementalParser()
+    parser.parse(GUIDE)
+    doc = parser.parse(GUIDE.replace("[map|Lake Map]", "[map|Lake Map] [map|X]"))
+    assert parser.reparsed_count == 1
+    last = doc.checklist_sections[2].items[0]
+    assert [c.item_id for c in last.items if hasattr(c, "item_id")] == ["map4"]
+
+
+def test_reused_section_reports_shifted_line_numbers():
+    text = GUIDE.replace("[map|Forest Map]", "[nope|Forest Map]")
+    parser = IncrementalParser()
+    parser.parse(text)
+    text = text.replace("\\title{Test Game}\n", "\\title{Test Game}\n\n\n\n")
+    doc = parser.parse(text)
+    assert parser.reparsed_count == 1
+    assert [str(d) for d in doc.diagnostics] == [
+        str(d) for d in parse_document(text).diagnostics
+    ]
+    assert doc.diagnostics[0].line_no == 22
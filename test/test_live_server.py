@@ -0,0 +1,61 @@
+import json
+import threading
+import urllib.request
+
+from src.fragment_cache import FragmentCache
+from src.live_server import LivePage, make_live_server
+from src.parse_document import parse_document
+from src.render_html import render_html_from_doc
+from test.test_render_html import make_tricky_guide
+
+
+def test_live_page_wraps_the_parts_of_the_page():
+    doc = parse_document(make_tricky_guide(3))
+    parts = FragmentCache().render_parts(doc)
+    assert "".join(parts) == render_html_from_doc(doc)
+    page = LivePage()
+    page.publish(parts)
+    html = page.page.decode("utf-8")
+    # The table of contents, three sections and the rollups
+    assert html.count("<div data-live-fragment=") == 5
+    assert f'<div data-live-fragment="1">{parts[2]}</div>' in html
+    assert html.index("new EventSource('/events')") < html.index("</body>")
+
+
+def test_publish_sends_only_changed_parts():
+    guide = make_tricky_guide(3)
+    fragments = FragmentCache()
+    page = LivePage()
+    page.publish(fragments.render_parts(parse_document(guide)))
+    client = page.subscribe()
+
+    edited = guide.replace("Chapter 2", "Chapter Two", 1)
+    assert page.publish(fragments.render_parts(parse_document(edited))) == 3
+    event, data = client.get_nowait()
+    # The table of contents, the renamed section and the rollups
+    assert event == "patch"
+    assert sorted(json.loads(data)) == ["0", "2", "4"]
+    assert "Chapter Two" in json.loads(data)["2"]
+
+    assert page.publish(fragments.render_parts(parse_document(edited))) == 0
+    assert client.empty()
+
+    retitled = edited.replace("\\title{", "\\title{New ", 1)
+    assert page.publish(fragments.render_parts(parse_document(retitled))) is None
+    assert client.get_nowait() == ("reload", "{}")
+
+
+def test_server_serves_page_and_files(tmp_path):
+    (tmp_path / "shot.png").write_bytes(b"png")
+    page = LivePage()
+    page.publish(["<html><body>", "<p>one</p>", "</body></html>"])
+    server = make_live_server(page, tmp_path, 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        html = urllib.request.urlopen(f"{base}/").read().decode("utf-8")
+        assert '<div data-live-fragment="0"><p>one</p></div>' in html
+        assert urllib.request.urlopen(f"{base}/shot.png").read() == b"png"
+    finally:
+        server.shutdown()
+        server.server_close()
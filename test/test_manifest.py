@@ -0,0 +1,38 @@
+import os
+
+from src.manifest import ManifestStore, write_if_changed
+
+
+def test_write_if_changed_keeps_identical_files(tmp_path):
+    out = tmp_path / "page.html"
+    assert write_if_changed(out, b"one")
+    os.utime(out, (0, 0))
+    assert not write_if_changed(out, b"one")
+    assert out.stat().st_mtime == 0
+    assert write_if_changed(out, b"two")
+    assert out.read_bytes() == b"two"
+    assert [p.name for p in tmp_path.iterdir()] == ["page.html"]
+
+
+def test_manifest_tracks_inputs_settings_and_output(tmp_path):
+    source = tmp_path / "guide.txt"
+    image = tmp_path / "shot.png"
+    out = tmp_path / "guide.html"
+    source.write_text("guide")
+    image.write_bytes(b"png")
+    out.write_text("page")
+    store = ManifestStore(tmp_path / "cache")
+    settings = {"minify": False}
+    assert not store.is_up_to_date(out, settings)
+
+    store.record(out, settings, [source, image])
+    assert store.is_up_to_date(out, settings)
+    assert not store.is_up_to_date(out, {"minify": True})
+
+    image.write_bytes(b"new png")
+    assert not store.is_up_to_date(out, settings)
+    store.record(out, settings, [source, image])
+    out.write_text("edited by hand")
+    assert not store.is_up_to_date(out, settings)
+    out.unlink()
+    assert not store.is_up_to_date(out, settings)
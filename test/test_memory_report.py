@@ -0,0 +1,47 @@
+import tracemalloc
+
+from src.memory_report import measure_memory
+from src.parse_document import parse_document
+from src.stages import StageRecorder
+from test.test_render_html import make_tricky_guide
+
+
+def test_stage_recorder_traces_memory():
+    stages = StageRecorder(trace_memory=True)
+    try:
+        with stages.stage("allocate"):
+            kept = [bytearray(1000) for _ in range(100)]
+            bytearray(1_000_000)
+        with stages.stage("free"):
+            kept.clear()
+        report = stages.format_memory_report()
+    finally:
+        tracemalloc.stop()
+    allocate = stages.memory["allocate"]
+    assert allocate.peak_bytes >= allocate.retained_bytes + 1_000_000
+    assert allocate.change_bytes >= 100_000
+    assert allocate.top_sites[0].location.startswith("test/test_memory_report.py:")
+    assert allocate.top_sites[0].blocks >= 100
+    assert stages.memory["free"].change_bytes <= -100_000
+    assert report.splitlines()[0].endswith("peak MB  retained MB  change MB")
+    assert "Largest allocations kept by allocate:" in report
+
+
+def test_measure_memory_reports_each_stage(tmp_path):
+    guide = make_tricky_guide(4)
+    infile = tmp_path / "guide.txt"
+    infile.write_text(guide, encoding="utf-8")
+    for image in parse_document(guide).images:
+        (tmp_path / image).parent.mkdir(exist_ok=True)
+        (tmp_path / image).write_bytes(b"png")
+
+    memory = measure_memory(infile, renderer="bs4")
+    assert list(memory) == ["read", "parse", "build tree", "serialize", "package"]
+    assert memory["build tree"].change_bytes > memory["parse"].change_bytes > 0
+    # The tree is freed once it is serialized
+    assert memory["serialize"].change_bytes < 0
+    for stage in memory.values():
+        assert stage.peak_bytes >= stage.retained_bytes
+    assert not tracemalloc.is_tracing()
+
+    assert list(measure_memory(infile)) == ["read", "parse", "render", "package"]
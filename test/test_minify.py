@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from src.minify import minify_html
+from src.parse_document import parse_document, parse_file
+from src.render_html import render_html_from_doc
+
+GUIDE = """\\declare{map}{Map}{Maps}
+\\title{Minify}
+\\section{One}
+Find the [map|First map] and the [map|Second map].
+Text that says class="mt-4" is left alone.
+\\begin{spoiler}
+\\img{answer.png}
+\\end{spoiler}
+\\checklist
+"""
+
+
+def visible_text(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style"]):
+        tag.decompose()
+    return "".join(soup.get_text().split())
+
+
+def test_minified_sample_keeps_text_and_shrinks():
+    html = render_html_from_doc(parse_file(Path("data/test.txt")))
+    minified = minify_html(html)
+    assert len(minified) < len(html)
+    assert visible_text(minified) == visible_text(html)
+    assert "\n    " not in minified
+
+
+def test_repeated_class_lists_get_short_names():
+    minified = minify_html(render_html_from_doc(parse_document(GUIDE)))
+    checkbox = (
+        "h-4 w-4 ml-4 rounded border-gray-300 text-indigo-600 focus:ring-indigo-600"
+    )
+    assert f'class="{checkbox}"' not in minified
+    assert f"{{@apply {checkbox}}}" in minified
+    assert '<style type="text/tailwindcss">' in minified
+    # text-md is not a Tailwind class, so it can't be applied
+    assert "@apply ml-3 leading-6}" in minified
+    assert 'text-md"><label' in minified
+    # Alpine toggles "hidden" on the spoiler icons
+    assert 'class="hidden h-6 w-6"' in minified
+    assert 'Text that says class="mt-4" is left alone.' in minified
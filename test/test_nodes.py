@@ -0,0 +1,40 @@
+import pickle
+
+from src.parse_document import (
+    ChecklistParagraphChild,
+    DocumentItemType,
+    ParagraphChildType,
+    SectionHeading,
+    parse_document,
+)
+
+
+def test_nodes_have_no_instance_dict():
+    child = ChecklistParagraphChild("Map", "Map", "map", "map1")
+    heading = SectionHeading("Title", None)
+    assert not hasattr(child, "__dict__")
+    assert not hasattr(heading, "__dict__")
+    assert child.part_type == ParagraphChildType.CHECK_ITEM
+    assert heading.item_type == DocumentItemType.SECTIONHEADING
+
+
+def test_tag_names_are_interned():
+    doc = parse_document(
+        "\\declare{map}{Map}{Maps}\n[map|One] [map|Two]\n[map|Three]\n"
+    )
+    first, second = doc.checklist_sections[0].items
+    tags = [
+        c.tag_name
+        for c in first.items + second.items
+        if c.part_type.name == "CHECK_ITEM"
+    ]
+    assert len(tags) == 3
+    assert all(t is tags[0] for t in tags)
+
+
+def test_document_round_trips_through_pickle():
+    doc = parse_document("\\declare{map}{Map}{Maps}\n\\section{A}\nFind [map|One].\n")
+    copy = pickle.loads(pickle.dumps(doc))
+    assert repr(copy.checklist_sections[0].items) == repr(
+        doc.checklist_sections[0].items
+    )
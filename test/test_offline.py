@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import pytest
+
+from src.compose_html import make_html_from_doc
+from src.minify import minify_html
+from src.offline import ALPINE_VERSION, alpine_path, load_alpine, make_offline_html
+from src.parse_document import parse_document
+from src.render_html import render_html_from_doc
+from test.test_render_html import make_tricky_guide
+
+
+def render() -> str:
+    return render_html_from_doc(parse_document(make_tricky_guide(3)))
+
+
+def test_offline_page_needs_no_network():
+    html, missing = make_offline_html(render(), "/*alpine*/")
+    assert missing == []
+    assert "cdn.tailwindcss.com" not in html
+    assert "unpkg.com" not in html
+    assert "tailwind.config" not in html
+    assert html.endswith("<script>/*alpine*/</script></body></html>")
+
+
+def test_stylesheet_covers_only_emitted_classes():
+    html, _ = make_offline_html(render(), "")
+    assert ".mt-4{margin-top:1rem}" in html
+    assert ".hover\\:underline:hover{text-decoration-line:underline}" in html
+    assert ".dark .dark\\:bg-gray-600{background-color:rgb(75 85 99)}" in html
+    assert "@media (min-width:640px){.sm\\:text-5xl{" in html
+    # Toggled by Alpine through :class
+    assert ".translate-x-5{" in html
+    # Not emitted by the renderer
+    assert ".px-8{" not in html
+
+
+def test_minified_short_names_are_expanded():
+    minified = minify_html(render())
+    html, missing = make_offline_html(minified, "")
+    assert missing == []
+    assert "text/tailwindcss" not in html
+    assert "@apply" not in html
+    assert ".c0{" in html
+
+
+def test_unknown_classes_are_reported():
+    html = render().replace('class="mt-4"', 'class="mt-4 grid"', 1)
+    assert make_offline_html(html, "")[1] == ["grid"]
+
+
+def test_every_renderer_class_has_an_offline_style():
+    guides = [Path("data/test.txt").read_text(encoding="utf-8"), make_tricky_guide(3)]
+    for doc in map(parse_document, guides):
+        for html in (
+            render_html_from_doc(doc),
+            render_html_from_doc(doc, lazy_rollups=True),
+            make_html_from_doc(doc),
+        ):
+            assert make_offline_html(html, "")[1] == []
+            assert make_offline_html(minify_html(html), "")[1] == []
+
+
+def test_vendored_alpine_matches_the_pinned_checksum(tmp_path):
+    alpine = load_alpine()
+    assert f'version:"{ALPINE_VERSION}"' in alpine
+    assert alpine.endswith("Ht.start()});})();\n")
+    alpine_path(tmp_path).write_text(alpine.replace("3.14", "3.15"), encoding="utf-8")
+    with pytest.raises(OSError, match="does not match"):
+        load_alpine(tmp_path)
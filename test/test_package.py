@@ -0,0 +1,44 @@
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from src.package import HTML_CHUNK_SIZE, write_package
+
+HTML = (
+    '<html><body><img src="a.png"/><img src="./a.png"/>'
+    '<img src="copy.png"/><img src="diagram.svg"/><p>café</p>'
+)
+
+
+def make_images(folder: Path) -> None:
+    (folder / "a.png").write_bytes(b"\x89PNG same bytes")
+    (folder / "copy.png").write_bytes(b"\x89PNG same bytes")
+    (folder / "diagram.svg").write_text("<svg>" + " " * 1000 + "</svg>")
+
+
+def test_package_dedups_and_compresses_by_type(tmp_path):
+    make_images(tmp_path)
+    images = ["copy.png", "a.png", "diagram.svg", "./a.png"]
+    html = HTML + "x" * HTML_CHUNK_SIZE + "</body></html>"
+    result = write_package(tmp_path / "out.zip", "guide.html", html, tmp_path, images)
+    assert result.duplicates == {"a.png": "copy.png"}
+    assert result.image_count == 2
+    with ZipFile(tmp_path / "out.zip") as zfile:
+        infos = {info.filename: info for info in zfile.infolist()}
+        assert list(infos) == ["guide.html", "copy.png", "diagram.svg"]
+        assert infos["guide.html"].compress_type == ZIP_DEFLATED
+        assert infos["copy.png"].compress_type == ZIP_STORED
+        assert infos["diagram.svg"].compress_type == ZIP_DEFLATED
+        page = zfile.read("guide.html").decode("utf-8")
+    assert page == html.replace('"a.png"', '"copy.png"').replace(
+        '"./a.png"', '"copy.png"'
+    )
+    assert result.html_size == len(page.encode("utf-8"))
+
+
+def test_package_is_reproducible(tmp_path):
+    make_images(tmp_path)
+    images = ["a.png", "diagram.svg"]
+    write_package(tmp_path / "one.zip", "guide.html", HTML, tmp_path, images)
+    (tmp_path / "a.png").touch()
+    write_package(tmp_path / "two.zip", "guide.html", HTML, tmp_path, images[::-1])
+    assert (tmp_path / "one.zip").read_bytes() == (tmp_path / "two.zip").read_bytes()
@@ -0,0 +1,93 @@
+import os
+
+from src.parse_cache import ParseCache
+from src.parse_document import parse_file
+
+GUIDE = "\\declare{map}{Map}{Maps}\n\\title{Cached}\nFind the [map|Map].\n"
+
+
+class CountingParser:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, path):
+        self.calls += 1
+        return parse_file(path)
+
+
+def test_hit_skips_parsing(tmp_path):
+    source = tmp_path / "guide.txt"
+    source.write_text(GUIDE, encoding="utf-8")
+    cache = ParseCache(tmp_path / "cache")
+    parse = CountingParser()
+    first = cache.get_or_parse(source, parse)
+    second = cache.get_or_parse(source, parse)
+    assert parse.calls == 1
+    assert second.title == first.title == "Cached"
+    assert repr(second.checklist_sections[0].items) == repr(
+        first.checklist_sections[0].items
+    )
+
+
+def test_source_or_included_change_misses(tmp_path):
+    source = tmp_path / "guide.txt"
+    source.write_text(GUIDE + "\\input{chapter.txt}\n", encoding="utf-8")
+    chapter = tmp_path / "chapter.txt"
+    chapter.write_text("Chapter text\n", encoding="utf-8")
+    cache = ParseCache(tmp_path / "cache")
+    parse = CountingParser()
+    cache.get_or_parse(source, parse)
+    chapter.write_text("Changed chapter text\n", encoding="utf-8")
+    cache.get_or_parse(source, parse)
+    source.write_text(GUIDE.replace("Cached", "Changed"), encoding="utf-8")
+    assert cache.get_or_parse(source, parse).title == "Changed"
+    assert parse.calls == 3
+
+
+def test_corrupt_entry_is_ignored(tmp_path):
+    source = tmp_path / "guide.txt"
+    source.write_text(GUIDE, encoding="utf-8")
+    cache = ParseCache(tmp_path / "cache")
+    cache.get_or_parse(source)
+    cache.entry_path(cache.key_for(source)).write_bytes(b"not a pickle")
+    parse = CountingParser()
+    assert cache.get_or_parse(source, parse).title == "Cached"
+    assert parse.calls == 1
+
+
+def test_eviction_keeps_cache_under_limit(tmp_path):
+    cache = ParseCache(tmp_path / "cache", max_bytes=5000)
+    sources = []
+    for i in range(20):
+        source = tmp_path / f"guide{i}.txt"
+        source.write_text(GUIDE + f"Paragraph {i}\n", encoding="utf-8")
+        cache.get_or_parse(source)
+        sources.append(source)
+    entries = list((tmp_path / "cache").glob("*.pickle"))
+    assert 0 < len(entries) < 20
+    assert sum(e.stat().st_size for e in entries) <= 5000
+    assert cache.entry_path(cache.key_for(sources[-1])).exists()
+    assert not cache.entry_path(cache.key_for(sources[0])).exists()
+
+
+def test_eviction_survives_other_processes(tmp_path, monkeypatch):
+    source = tmp_path / "guide.txt"
+    source.write_text(GUIDE, encoding="utf-8")
+    cache = ParseCache(tmp_path / "cache")
+    cache.get_or_parse(source)
+    key = cache.key_for(source)
+    stale = tmp_path / "cache" / f"{key}.123.tmp"
+    stale.write_bytes(b"half a pickle")
+    os.utime(stale, (0, 0))
+    fresh = tmp_path / "cache" / f"{key}.456.tmp"
+    fresh.write_bytes(b"being written")
+    cache.evict()
+    assert not stale.exists()
+    assert fresh.exists()
+
+    # The entry is evicted by another process right after it is read
+    def utime(path, *args):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", utime)
+    assert cache.load(key).title == "Cached"
@@ -0,0 +1,134 @@
+from src.parse_document import (
+    ChecklistParagraphChild,
+    Declaration,
+    InlineLexer,
+    LinkParagraphChild,
+    TextParagraphChild,
+    WalkthroughParser,
+)
+
+DECLS = {
+    "map": Declaration("map", "Map", "Maps"),
+    "lunchbox": Declaration("lunchbox", "Lunch Box", "Lunch Boxes"),
+}
+
+
+def describe(paragraph):
+    if paragraph is None:
+        return None
+    parts = []
+    for child in paragraph.items:
+        match child:
+            case TextParagraphChild():
+                parts.append(("text", child.s))
+            case LinkParagraphChild():
+                parts.append(("link", child.url))
+            case ChecklistParagraphChild():
+                parts.append(("item", child.item_id, child.content, child.list_content))
+    return parts
+
+
+def parse(line: str):
+    return describe(WalkthroughParser("").parse_line(line, DECLS))
+
+
+def parse_with_diagnostics(line: str):
+    parser = WalkthroughParser("")
+    result = describe(parser.parse_line(line, DECLS))
+    return result, [str(d) for d in parser.diagnostics]
+
+
+def test_text_only():
+    assert parse("  Just some text.  ") == [("text", "Just some text.")]
+
+
+def test_checklist_items_and_trailing_period():
+    assert parse("Take the [map|Lake Map]. Then the [lunchbox|Box|By the falls]") == [
+        ("text", "Take the"),
+        ("item", "map1", "Lake Map.", "Lake Map"),
+        ("text", "Then the"),
+        ("item", "lunchbox1", "Box", "By the falls"),
+    ]
+
+
+def test_link():
+    assert parse(r"Report it at \link{https://example.com} please.") == [
+        ("text", "Report it at"),
+        ("link", "https://example.com"),
+        ("text", "please."),
+    ]
+
+
+def test_unclosed_checklist_item():
+    result, messages = parse_with_diagnostics("Take the [map|Lake Map")
+    assert result is None
+    assert messages == ["Unclosed checklist item on line 0"]
+
+
+def test_unknown_tag():
+    result, messages = parse_with_diagnostics("Take the [key|Key]")
+    assert result is None
+    assert messages == ["Unknown tag type key on line 0"]
+
+
+def test_every_error_in_a_line_is_reported():
+    parser = WalkthroughParser("")
+    line = "A [key|Key], [map|Map], [nope] and [door|Door] then [map|Unclosed"
+    assert parser.parse_line(line, DECLS) is None
+    assert [str(d) for d in parser.diagnostics] == [
+        "Unknown tag type key on line 0",
+        "Invalid collectible nope on line 0",
+        "Unknown tag type door on line 0",
+        "Unclosed checklist item on line 0",
+    ]
+    # Items after the first error do not use up ids
+    assert parser.checklist_counters == {"key": 1}
+
+
+def test_invalid_link_keeps_remainder():
+    result, messages = parse_with_diagnostics(r"See \link here")
+    assert result == [("text", "See"), ("text", "here")]
+    assert messages == ["Could not parse link on line 0"]
+
+
+class ScanCountingLine(str):
+    # Counts the characters InlineLexer's str.find calls look at
+    scanned = 0
+
+    def find(self, sub, start=None, end=None):
+        start = 0 if start is None else start
+        loc = str.find(self, sub, start)
+        self.scanned += (len(self) if loc == -1 else loc + len(sub)) - start
+        return loc
+
+
+def scanned_per_char(line: str) -> float:
+    counting = ScanCountingLine(line)
+    list(InlineLexer(counting))
+    return counting.scanned / len(counting)
+
+
+def assert_linear(make_line):
+    # A quadratic lexer scans 8 times as much per character of an 8 times
+    # longer line. A linear one looks at each character about once for each
+    # of the five delimiters ([, ], \link, { and }) at most.
+    small = scanned_per_char(make_line(2_000))
+    large = scanned_per_char(make_line(16_000))
+    assert large < small * 1.01
+    assert large <= 5
+
+
+def test_many_checklist_items_scale_linearly():
+    assert_linear(lambda n: "Find the [map|Map]. " * n)
+
+
+def test_many_links_scale_linearly():
+    assert_linear(lambda n: r"Go to \link{https://example.com} now " * n)
+
+
+def test_mixed_items_and_links_scale_linearly():
+    assert_linear(lambda n: r"[lunchbox|Box|x] \link{u} text " * n)
+
+
+def test_unmatched_braces_scale_linearly():
+    assert_linear(lambda n: r"\link } " * n + "{end}")
@@ -0,0 +1,125 @@
+import json
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from src.compose_html import make_html_from_doc
+from src.parse_document import parse_document, parse_file
+from src.render_html import make_item_keys, quote_attr, render_html_from_doc
+
+
+def make_tricky_guide(sections: int) -> str:
+    lines = [
+        r"\game_short_name{tricky}",
+        r"\version{3}",
+        r"\declare{map}{Map}{Maps & <Charts>}",
+        r"\declare{key}{Key}{Keys}",
+        r'\title{Fish & Chips <Deluxe> "Edition"}',
+        r"\defaultspoilertitle{Show <answer> & more}",
+    ]
+    for s in range(sections):
+        if s % 3 == 0:
+            lines.append(f'\\section{{Chapter {s}: "It\'s" <b>&amp;</b>}}{{Ch {s}}}')
+        else:
+            lines.append(f"\\section{{Chapter {s}}}")
+        lines.append(
+            f"Grab the [map|Map {s} & <stuff>] then the [key|Key \"{s}\"|It's near 'here'] "
+            f'and see \\link{{https://example.com/?a={s}&b="c"}}.'
+        )
+        lines.append("An undeclared [ghost|Nope] drops this paragraph.")
+        lines.append("Plain text with 5 < 6 > 4 and & ampersands.")
+        lines += [r"\begin{ol}", r"\item first & <one>", r"\item second", r"\end{ol}"]
+        lines += [
+            r"\begin{spoiler}",
+            "Look <behind> the 'door' & \"wall\"",
+            f'\\img{{images/stash {s}&"q".png}}',
+            r"\begin{ul}",
+            r"\item a < b",
+            r"\end{ul}",
+            r"\end{spoiler}",
+        ]
+        if s % 2 == 0:
+            lines.append(r"\checklist")
+    return "\n".join(lines)
+
+
+def test_string_renderer_matches_bs4_on_sample():
+    doc = parse_file(Path("data/test.txt"))
+    assert render_html_from_doc(doc) == make_html_from_doc(doc)
+
+
+def test_string_renderer_matches_bs4_on_large_guide():
+    doc = parse_document(make_tricky_guide(60))
+    string_html = render_html_from_doc(doc)
+    bs4_html = make_html_from_doc(doc)
+    assert string_html == bs4_html
+    assert BeautifulSoup(string_html, "html.parser") == BeautifulSoup(
+        bs4_html, "html.parser"
+    )
+
+
+def test_quote_attr_follows_bs4_quoting():
+    assert quote_attr("plain") == '"plain"'
+    assert quote_attr("a&b<c>") == '"a&amp;b&lt;c&gt;"'
+    assert quote_attr('say "hi"') == "'say \"hi\"'"
+    assert quote_attr('it\'s "x"') == '"it\'s &quot;x&quot;"'
+
+
+def test_parallel_rendering_matches_serial():
+    doc = parse_document(make_tricky_guide(12))
+    assert render_html_from_doc(doc, max_workers=2) == render_html_from_doc(doc)
+
+
+def test_headers_bind_to_precomputed_counters():
+    doc = parse_document(make_tricky_guide(4))
+    html = render_html_from_doc(doc)
+    assert ".filter(Boolean)" not in html
+    assert "x-text=\"$store.counters.sections['map1']\"" in html
+    assert "x-text=\"$store.counters.types['key']\"" in html
+    groups = '{"map": {"map1": ["map1"], "map2": ["map2", "map3"], "map4": ["map4"]}'
+    assert f"const counterGroups = {groups}, " in html
+
+
+def test_statuses_are_stored_as_a_bitset_over_item_ids():
+    doc = parse_document(make_tricky_guide(2))
+    html = render_html_from_doc(doc)
+    assert 'const itemIds = ["map1", "key1", "map2", "key2"];' in html
+    assert "': false" not in html
+    assert "JSON.stringify(checklistItems)" not in html
+    assert f"'{doc.game_short_name}_checked_bits'" in html
+
+
+def test_lazy_rollups_are_built_from_an_index():
+    doc = parse_document(make_tricky_guide(20))
+    eager = render_html_from_doc(doc)
+    html = render_html_from_doc(doc, lazy_rollups=True)
+    assert len(html) < len(eager)
+    # Only the paragraph and end-of-section checkboxes are left in the page
+    assert html.count(" x-model=") * 2 == eager.count(" x-model=")
+    assert "x-for=\"item in rollupSectionList('map2')\"" in html
+    assert "x-for=\"item in rollupTypeList('key')\"" in html
+    assert 'const rollupSections = ["Ch 0", "Chapter 2", ' in html
+    assert '"map1": [0, "Map 0 & \\u003cstuff>"]' in html
+    assert 'name="all_items_list_map"' in html
+
+
+def test_item_keys_follow_items_across_edits():
+    before = make_item_keys([("map", "A"), ("map", "B"), ("map", "A")])
+    after = make_item_keys([("map", "New"), ("map", "A"), ("map", "B"), ("map", "A")])
+    assert after[1:] == before
+    assert len(set(before)) == 3
+
+
+def test_storage_is_keyed_on_items_not_ids():
+    doc = parse_document(make_tricky_guide(2))
+    html = render_html_from_doc(doc)
+    labels = [
+        ("map", "Map 0 & <stuff>"),
+        ("key", 'Key "0"'),
+        ("map", "Map 1 & <stuff>"),
+        ("key", 'Key "1"'),
+    ]
+    keys_line = f"const itemKeys = {json.dumps(make_item_keys(labels))};"
+    assert keys_line in html
+    assert keys_line in make_html_from_doc(doc)
+    assert f"'{doc.game_short_name}_checked_keys'" in html
@@ -0,0 +1,49 @@
+import cProfile
+import pstats
+
+from src.parse_document import parse_document
+from src.stages import StageRecorder, count_document, profiling
+from test.test_render_html import make_tricky_guide
+
+
+def test_stage_recorder_adds_up_repeated_stages():
+    stages = StageRecorder()
+    with stages.stage("parse"):
+        pass
+    with stages.stage("render"):
+        pass
+    with stages.stage("parse"):
+        pass
+    assert list(stages.seconds) == ["parse", "render"]
+    stages.count("output bytes", 120)
+    lines = stages.format_report().splitlines()
+    assert lines[0].split() == ["stage", "seconds", "share"]
+    assert [line.split()[0] for line in lines[1:3]] == ["parse", "render"]
+    assert lines[-2].startswith("total")
+    assert lines[-1] == "120 output bytes"
+
+
+def test_count_document():
+    stages = StageRecorder()
+    count_document(parse_document(make_tricky_guide(4)), stages)
+    # Each section keeps a paragraph with two collectibles and one of plain
+    # text; the paragraph with an undeclared collectible is dropped
+    assert stages.counts == {"sections": 4, "paragraphs": 8, "collectibles": 8}
+
+
+def test_profiling_records_only_inside_the_block():
+    def profiled():
+        return sum(range(10))
+
+    def not_profiled():
+        return sum(range(10))
+
+    profiler = cProfile.Profile()
+    with profiling(profiler):
+        profiled()
+    not_profiled()
+    with profiling(None):
+        not_profiled()
+    names = {function for _, _, function in pstats.Stats(profiler).stats}
+    assert "profiled" in names
+    assert "not_profiled" not in names
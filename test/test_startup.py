@@ -0,0 +1,27 @@
+from bench.generate import shape_for, write_guide
+from bench.startup import heavy_modules, import_ms, parse_importtime, run_command
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   _lsprof
+import time:       300 |        400 | cProfile
+import time:        50 |         50 | src.defaults
+"""
+
+
+def test_parse_importtime():
+    imports = parse_importtime(IMPORTTIME)
+    assert [(i.name, i.cumulative_us, i.top_level) for i in imports] == [
+        ("_lsprof", 100, False),
+        ("cProfile", 400, True),
+        ("src.defaults", 50, True),
+    ]
+    assert import_ms(imports) == 0.45
+
+
+def test_commands_import_only_what_they_need(tmp_path):
+    infile = write_guide(tmp_path, shape_for(20))
+    for command in ("init", "check", "compile", "build"):
+        imports = parse_importtime(run_command(command, tmp_path, infile))
+        assert heavy_modules(command, imports) == [], command
+        assert "src.compose_html" not in {i.name for i in imports}, command
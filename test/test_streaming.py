@@ -0,0 +1,90 @@
+import io
+
+from src.parse_document import (
+    ChecklistBoundary,
+    Declaration,
+    DocumentSetting,
+    NumberedList,
+    Paragraph,
+    SectionHeading,
+    Spoiler,
+    UnnumberedList,
+    iter_document,
+    parse_document,
+    parse_file,
+)
+
+SOURCE = r"""\version{2}
+\declare{map}{Map}{Maps}
+\title{Test Game}
+
+\section{Chapter 1}{Ch1}
+
+Find the [map|Lake Map].
+
+\begin{ul}
+\item one
+\end{ul}
+
+\begin{ol}
+\item two
+\end{ol}
+
+\begin{spoiler}
+Solution text
+\img{solution.png}
+\end{spoiler}
+
+\checklist
+"""
+
+
+def test_events_in_document_order():
+    events = list(iter_document(io.StringIO(SOURCE)))
+    assert [type(e) for e in events] == [
+        DocumentSetting,
+        Declaration,
+        DocumentSetting,
+        SectionHeading,
+        Paragraph,
+        UnnumberedList,
+        NumberedList,
+        Spoiler,
+        ChecklistBoundary,
+    ]
+    assert events[-1] == ChecklistBoundary("Ch1")
+
+
+def test_events_are_yielded_as_lines_arrive():
+    consumed = []
+
+    def lines():
+        for line in SOURCE.splitlines(keepends=True):
+            consumed.append(line)
+            yield line
+
+    events = iter_document(lines())
+    assert isinstance(next(events), DocumentSetting)
+    assert len(consumed) == 1
+
+
+def test_parse_file_matches_parse_document(tmp_path):
+    path = tmp_path / "guide.txt"
+    path.write_text(SOURCE, encoding="utf-8")
+    from_file = parse_file(path)
+    from_text = parse_document(SOURCE)
+    assert from_file.version == from_text.version == "2"
+    assert from_file.title == from_text.title == "Test Game"
+    assert from_file.images == from_text.images == ["solution.png"]
+    assert [s.name for s in from_file.checklist_sections] == ["Ch1", "Unnamed section"]
+    assert [repr(i) for i in from_file.checklist_sections[0].items] == [
+        repr(i) for i in from_text.checklist_sections[0].items
+    ]
+
+
+def test_unterminated_list_reports_error():
+    doc = parse_document("\\begin{ul}\n\\item one\n")
+    assert doc.checklist_sections[0].items == []
+    assert [str(d) for d in doc.diagnostics] == [
+        "List has no terminating \\end{ul} on line 1"
+    ]
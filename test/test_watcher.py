@@ -0,0 +1,77 @@
+from pathlib import Path
+import threading
+import time
+
+from watchfiles import Change
+
+from src.watcher import InputWatcher, Rebuilder
+
+
+def wait_until(condition, timeout=5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_newer_change_supersedes_running_build():
+    started = threading.Event()
+    release = threading.Event()
+    finished = []
+
+    def build(checkpoint):
+        version = len(started_versions)
+        started_versions.append(version)
+        started.set()
+        release.wait()
+        checkpoint()
+        finished.append(version)
+        return {Path("guide.txt")}
+
+    started_versions: list[int] = []
+    watched = []
+    rebuilder = Rebuilder(build, watched.append)
+    rebuilder.start()
+    try:
+        rebuilder.request(time.perf_counter())
+        started.wait(5)
+        # Two more saves while the first build runs
+        rebuilder.request(time.perf_counter())
+        rebuilder.request(time.perf_counter())
+        release.set()
+        wait_until(rebuilder.idle)
+    finally:
+        rebuilder.stop()
+    assert finished == [1]
+    assert (rebuilder.build_count, rebuilder.superseded_count) == (1, 1)
+    assert watched == [{Path("guide.txt")}]
+
+
+def test_failed_build_keeps_watching(capsys):
+    def build(checkpoint):
+        raise FileNotFoundError("guide.txt")
+
+    rebuilder = Rebuilder(build, lambda watched: None)
+    rebuilder.start()
+    try:
+        rebuilder.request(time.perf_counter())
+        wait_until(rebuilder.idle)
+    finally:
+        rebuilder.stop()
+    assert "Build failed: guide.txt" in capsys.readouterr().out
+
+
+def test_watcher_only_accepts_its_files(tmp_path):
+    (tmp_path / "img").mkdir()
+    source = tmp_path / "guide.txt"
+    watcher = InputWatcher({source, tmp_path / "img" / "a.png"})
+    assert watcher.folders == {tmp_path.resolve(), (tmp_path / "img").resolve()}
+    assert watcher.accepts(Change.modified, str(source))
+    assert watcher.accepts(Change.added, str(source))
+    assert not watcher.accepts(Change.deleted, str(source))
+    assert not watcher.accepts(Change.modified, str(tmp_path / "other.txt"))
+
+    watcher.restart.clear()
+    watcher.update({source})
+    assert watcher.restart.is_set()
+    assert not watcher.accepts(Change.modified, str(tmp_path / "img" / "a.png"))
@@ -1,12 +1,41 @@
 import argparse
-from datetime import datetime
+import cProfile
 from pathlib import Path
 import sys
-from zipfile import ZipFile
-from watchfiles import Change, watch
 
-from src.parse_document import parse_document
-from src.compose_html import make_html_from_doc
+from src.defaults import DEFAULT_DEBOUNCE_MS, DEFAULT_MAX_WIDTH, DEFAULT_QUALITY
+
+# Each command imports the modules it needs when it runs, so that building
+# the argument parser, init and check don't pay for BeautifulSoup, watchfiles,
+# Pillow or the process pools.
+
+NO_CACHE_HELP = (
+    "Always parse and render from scratch instead of using the on-disk cache"
+)
+RENDERERS = ["string", "bs4"]
+RENDERER_HELP = "HTML renderer to use (default: string)"
+JOBS_HELP = "Number of worker processes used to render checklist sections"
+BATCH_JOBS_HELP = (
+    "Number of worker processes: with several input files, how many files are "
+    "compiled at once, otherwise how many checklist sections are rendered at once"
+)
+LAZY_ROLLUPS_HELP = (
+    "Build the collectible lists at the end of the page in the browser, "
+    "when they are opened (string renderer only)"
+)
+MINIFY_HELP = "Strip whitespace and give repeated class lists short shared names"
+PROFILE_HELP = "Print how long each stage took, with counts of what was built"
+PROFILE_OUTPUT_HELP = "Write cProfile data for the whole run to this file"
+MEMORY_REPORT_HELP = (
+    "Trace memory with tracemalloc and print the peak and retained memory of "
+    "each stage, with the largest allocation sites (slows the build down)"
+)
+OFFLINE_HELP = (
+    "Inline a generated stylesheet and Alpine.js so the page works without a network"
+)
+OPTIMIZE_IMAGES_HELP = (
+    "Scale down and re-encode images, and write their sizes into the page"
+)
 
 
 def main() -> int:
@@ -17,16 +46,111 @@ def main() -> int:
     )
 
     compile_p = subp.add_parser("compile", help="Compile walkthrough")
-    compile_p.add_argument("infile")
+    compile_p.add_argument(
+        "infiles", nargs="+", help="Walkthrough files, folders of them or globs"
+    )
     compile_p.add_argument("-o", "--outfile")
+    compile_p.add_argument("--no-cache", action="store_true", help=NO_CACHE_HELP)
+    compile_p.add_argument(
+        "--renderer", choices=RENDERERS, default="string", help=RENDERER_HELP
+    )
+    compile_p.add_argument("-j", "--jobs", type=int, default=1, help=BATCH_JOBS_HELP)
+    compile_p.add_argument("--minify", action="store_true", help=MINIFY_HELP)
+    compile_p.add_argument(
+        "--lazy-rollups", action="store_true", help=LAZY_ROLLUPS_HELP
+    )
+    compile_p.add_argument("--profile", action="store_true", help=PROFILE_HELP)
+    compile_p.add_argument("--profile-output", help=PROFILE_OUTPUT_HELP)
+    compile_p.add_argument(
+        "--memory-report", action="store_true", help=MEMORY_REPORT_HELP
+    )
     watch_p = subp.add_parser("watch", help="Compile walkthrough with watching")
     watch_p.add_argument("infile")
     watch_p.add_argument("-o", "--outfile")
+    watch_p.add_argument("--no-cache", action="store_true", help=NO_CACHE_HELP)
+    watch_p.add_argument(
+        "--renderer", choices=RENDERERS, default="string", help=RENDERER_HELP
+    )
+    watch_p.add_argument("-j", "--jobs", type=int, default=1, help=JOBS_HELP)
+    watch_p.add_argument("--lazy-rollups", action="store_true", help=LAZY_ROLLUPS_HELP)
+    watch_p.add_argument(
+        "--no-incremental",
+        action="store_true",
+        help="Re-parse the whole file on every change",
+    )
+    watch_p.add_argument(
+        "--debounce",
+        type=int,
+        default=DEFAULT_DEBOUNCE_MS,
+        help="Milliseconds without changes to wait for before rebuilding "
+        f"(default: {DEFAULT_DEBOUNCE_MS})",
+    )
+    watch_p.add_argument("--profile", action="store_true", help=PROFILE_HELP)
+    watch_p.add_argument("--profile-output", help=PROFILE_OUTPUT_HELP)
+    watch_p.add_argument(
+        "--memory-report", action="store_true", help=MEMORY_REPORT_HELP
+    )
     build_p = subp.add_parser(
         "build", help="Build and package walkthrough for distribution"
     )
-    build_p.add_argument("infile")
+    build_p.add_argument(
+        "infiles", nargs="+", help="Walkthrough files, folders of them or globs"
+    )
     build_p.add_argument("-o", "--outfile")
+    build_p.add_argument("--no-cache", action="store_true", help=NO_CACHE_HELP)
+    build_p.add_argument(
+        "--renderer", choices=RENDERERS, default="string", help=RENDERER_HELP
+    )
+    build_p.add_argument("-j", "--jobs", type=int, default=1, help=BATCH_JOBS_HELP)
+    build_p.add_argument("--minify", action="store_true", help=MINIFY_HELP)
+    build_p.add_argument("--offline", action="store_true", help=OFFLINE_HELP)
+    build_p.add_argument(
+        "--optimize-images", action="store_true", help=OPTIMIZE_IMAGES_HELP
+    )
+    build_p.add_argument(
+        "--max-image-width",
+        type=int,
+        default=DEFAULT_MAX_WIDTH,
+        help=f"Width to scale wider images down to (default: {DEFAULT_MAX_WIDTH})",
+    )
+    build_p.add_argument(
+        "--image-quality",
+        type=int,
+        default=DEFAULT_QUALITY,
+        help=f"JPEG and WebP quality, 1-95 (default: {DEFAULT_QUALITY})",
+    )
+    build_p.add_argument("--lazy-rollups", action="store_true", help=LAZY_ROLLUPS_HELP)
+    build_p.add_argument("--profile", action="store_true", help=PROFILE_HELP)
+    build_p.add_argument("--profile-output", help=PROFILE_OUTPUT_HELP)
+    build_p.add_argument(
+        "--memory-report", action="store_true", help=MEMORY_REPORT_HELP
+    )
+    serve_p = subp.add_parser(
+        "serve", help="Serve walkthrough locally and update the page on every change"
+    )
+    serve_p.add_argument("infile")
+    serve_p.add_argument(
+        "--port", type=int, default=8000, help="Port to serve on (default: 8000)"
+    )
+    serve_p.add_argument("--no-cache", action="store_true", help=NO_CACHE_HELP)
+    serve_p.add_argument("-j", "--jobs", type=int, default=1, help=JOBS_HELP)
+    serve_p.add_argument(
+        "--no-incremental",
+        action="store_true",
+        help="Re-parse the whole file on every change",
+    )
+    serve_p.add_argument(
+        "--debounce",
+        type=int,
+        default=DEFAULT_DEBOUNCE_MS,
+        help="Milliseconds without changes to wait for before rebuilding "
+        f"(default: {DEFAULT_DEBOUNCE_MS})",
+    )
+    serve_p.add_argument("--lazy-rollups", action="store_true", help=LAZY_ROLLUPS_HELP)
+    check_p = subp.add_parser(
+        "check", help="Check walkthroughs for errors without compiling"
+    )
+    check_p.add_argument("infiles", nargs="+")
     init_p = subp.add_parser("init", help="start a new walkthrough")
     init_p.add_argument(
         "game_name",
@@ -34,77 +158,65 @@ def main() -> int:
     )
     init_p.add_argument("outfolder")
     args = parser.parse_args()
+    renderer = getattr(args, "renderer", "string")
+    if getattr(args, "lazy_rollups", False) and renderer != "string":
+        print("--lazy-rollups needs the string renderer")
+        return 1
+    profile_output = getattr(args, "profile_output", None)
+    if profile_output is not None and getattr(args, "jobs", 1) > 1:
+        from src.batch import expand_inputs
+
+        # cProfile only sees this process, not the workers that would compile
+        # the files
+        if len(expand_inputs(getattr(args, "infiles", []))) > 1:
+            print("--profile-output with several input files needs -j 1")
+            return 1
+    profiler = cProfile.Profile() if profile_output is not None else None
+    try:
+        return run_command(parser, args, profiler)
+    finally:
+        if profiler is not None:
+            profiler.dump_stats(profile_output)
+            print(f"Wrote profile data to {profile_output}")
+
+
+def run_command(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    profiler: cProfile.Profile | None,
+) -> int:
     match args.subparser_name:
         case "compile":
-            infile = Path(args.infile)
-            if not infile.exists():
-                print(f"Cannot find file {infile}")
-                return 1
-            if args.outfile is not None:
-                outfile = Path(args.outfile)
-            else:
-                outfile = infile.parent / f"{infile.stem}.html"
-            print(f"Compiling {infile} to {outfile}")
-            doc = parse_document(infile.read_text(encoding="utf-8"))
-            outfile.write_text(make_html_from_doc(doc))
-            return 0
+            from src.build_commands import compile_file, run_files
+
+            return run_files(compile_file, args, profiler)
         case "watch":
-            infile = Path(args.infile)
-            if not infile.exists():
-                print(f"Cannot find file {infile}")
-                return 1
-            if args.outfile is not None:
-                outfile = Path(args.outfile)
-            else:
-                outfile = infile.parent / f"{infile.stem}.html"
-            doc = parse_document(infile.read_text(encoding="utf-8"))
-            outfile.write_text(make_html_from_doc(doc))
-            print(f"Watching {infile}. Press Ctrl+C to stop.")
-            try:
-                for changes in watch(infile.parent):
-                    for change, file in changes:
-                        if (
-                            Path(file).resolve() == infile.resolve()
-                            and change == Change.modified
-                        ):
-                            print(f"[{datetime.now()}] Recompiling.")
-                            doc = parse_document(infile.read_text(encoding="utf-8"))
-                            outfile.write_text(make_html_from_doc(doc))
-            except KeyboardInterrupt:
-                pass
-            return 0
+            from src.watch_commands import run_watch
+
+            return run_watch(args, profiler)
         case "build":
-            infile = Path(args.infile)
-            if not infile.exists():
-                print(f"Cannot find file {infile}")
-                return 1
-            if args.outfile is not None:
-                outfile_html = Path(args.outfile)
-            else:
-                outfile_html = infile.parent / f"{infile.stem}.html"
-            preexisting = outfile_html.exists()
-            if args.outfile is not None:
-                outfile_zip = Path(args.outfile)
-            else:
-                outfile_zip = infile.parent / f"{infile.stem}.zip"
-            print(f"Compiling {infile} to {outfile_zip}")
-            doc = parse_document(infile.read_text(encoding="utf-8"))
-            for img in doc.images:
-                if not (infile.parent / img).exists():
-                    print(f"Referenced image {infile.parent / img} does not exist")
-                    return 1
-            outfile_html.write_text(make_html_from_doc(doc))
-            with ZipFile(outfile_zip, "w") as zfile:
-                zfile.write(outfile_html, outfile_html.name)
-                for img in doc.images:
-                    if (infile.parent / img).exists():
-                        zfile.write(infile.parent / img, img)
-                    else:
-                        print(f"Referenced image {infile.parent / img} does not exist")
-                        return 1
-            if not preexisting:
-                outfile_html.unlink()
-            return 0
+            from src.build_commands import build_file, run_files
+
+            return run_files(build_file, args, profiler)
+        case "serve":
+            from src.watch_commands import run_serve
+
+            return run_serve(args)
+        case "check":
+            from src.check import check_file, format_diagnostic, has_errors
+
+            failed = False
+            for name in args.infiles:
+                infile = Path(name)
+                if not infile.exists():
+                    print(f"Cannot find file {infile}")
+                    failed = True
+                    continue
+                diagnostics = check_file(infile)
+                for diagnostic in diagnostics:
+                    print(format_diagnostic(infile, diagnostic))
+                failed = failed or has_errors(diagnostics)
+            return 1 if failed else 0
         case "init":
             game_name: str = args.game_name
             outfolder: str = args.outfolder